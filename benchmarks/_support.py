@@ -0,0 +1,107 @@
+"""Shared helpers for the local benchmarks.
+
+Agents live in hyphenated container folders (``src/agents/<name>/agent.py``),
+so they are loaded by file path under a unique module name. ``MockChatClient``
+stands in for ``AzureOpenAIChatClient`` with configurable latency so that
+benchmarks never touch Azure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import statistics
+import sys
+from collections.abc import AsyncIterable, Callable
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+AGENTS_DIR = REPO_ROOT / "src" / "agents"
+
+
+def load_agent_module(agent_dir: str) -> ModuleType:
+    """Import ``src/agents/<agent_dir>/agent.py`` as ``<agent_dir>_agent``."""
+    folder = AGENTS_DIR / agent_dir
+    module_name = agent_dir.replace("-", "_") + "_agent"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if str(folder) not in sys.path:
+        sys.path.insert(0, str(folder))
+    spec = importlib.util.spec_from_file_location(module_name, folder / "agent.py")
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class MockChatClient:
+    """Duck-typed chat client returning canned text after a fixed latency.
+
+    ``reply`` maps the last user message to the raw model output. Streaming
+    splits the output into ``chunk_size`` character chunks spread evenly over
+    the latency, approximating token-by-token generation.
+    """
+
+    def __init__(
+        self,
+        reply: Callable[[str], str],
+        *,
+        latency: float = 0.5,
+        first_token_latency: float | None = None,
+        chunk_size: int = 4,
+    ) -> None:
+        self._reply = reply
+        self.latency = latency
+        self.first_token_latency = latency / 10 if first_token_latency is None else first_token_latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    @staticmethod
+    def _last_user_text(messages: Any) -> str:
+        if isinstance(messages, str):
+            return messages
+        return messages[-1].text or ""
+
+    async def get_response(self, messages: Any, **kwargs: Any) -> Any:
+        from agent_framework import ChatMessage, ChatResponse, Role
+
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        text = self._reply(self._last_user_text(messages))
+        return ChatResponse(messages=[ChatMessage(role=Role.ASSISTANT, text=text)])
+
+    async def get_streaming_response(self, messages: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        from agent_framework import ChatResponseUpdate, Role
+
+        self.calls += 1
+        text = self._reply(self._last_user_text(messages))
+        chunks = [text[i : i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        await asyncio.sleep(self.first_token_latency)
+        per_chunk = max(self.latency - self.first_token_latency, 0.0) / len(chunks)
+        for chunk in chunks:
+            yield ChatResponseUpdate(role=Role.ASSISTANT, text=chunk)
+            await asyncio.sleep(per_chunk)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(label: str, samples: list[float]) -> str:
+    """One-line latency summary in milliseconds."""
+    if not samples:
+        return f"{label:<28} n=0"
+    return (
+        f"{label:<28} n={len(samples):<5} "
+        f"mean={statistics.fmean(samples) * 1000:8.2f}ms "
+        f"p50={percentile(samples, 50) * 1000:8.2f}ms "
+        f"p95={percentile(samples, 95) * 1000:8.2f}ms"
+    )
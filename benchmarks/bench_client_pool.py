@@ -0,0 +1,142 @@
+"""Token refresh and connection reuse of the shared client pool.
+
+Starts a local stand-in for both the token endpoint and the Azure OpenAI chat
+completions endpoint, then sends ``--requests`` completions through
+``common.azure_clients.ClientPool`` twice:
+
+* ``on-demand`` – tokens are only fetched when the cached one has expired,
+  so the fetch lands on the request path (what a per-agent credential does);
+* ``proactive`` – the pool's background thread refreshes tokens ahead of
+  expiry and the request path never waits for the token endpoint.
+
+Tokens are issued with a short ``--token-lifetime`` so that several refreshes
+happen during the run. Reported metrics come from ``ClientPool.metrics()``.
+
+Usage::
+
+    python benchmarks/bench_client_pool.py [--requests 60] [--token-lifetime 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _support import REPO_ROOT, summarize
+
+sys.path.append(str(REPO_ROOT / "src"))
+
+from azure.core.credentials import AccessToken  # noqa: E402
+
+from common.azure_clients import ClientPool, TokenProvider  # noqa: E402
+
+
+def _start_stand_in(token_lifetime: float, token_delay: float, completion_delay: float) -> ThreadingHTTPServer:
+    issued = 0
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # token endpoint
+            nonlocal issued
+            time.sleep(token_delay)
+            issued += 1
+            self._send({"access_token": f"token-{issued}", "expires_on": time.time() + token_lifetime})
+
+        def do_POST(self) -> None:  # chat completions
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(completion_delay)
+            self._send(
+                {
+                    "id": "chatcmpl-local",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "mock",
+                    "choices": [
+                        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}
+                    ],
+                }
+            )
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LocalTokenCredential:
+    """``TokenCredential`` backed by the stand-in token endpoint."""
+
+    def __init__(self, url: str) -> None:
+        self._url = url
+
+    def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+        with urllib.request.urlopen(self._url) as response:
+            payload = json.loads(response.read())
+        return AccessToken(payload["access_token"], int(payload["expires_on"]))
+
+
+async def _run(pool: ClientPool, requests: int, interval: float) -> list[float]:
+    client = pool.openai_client(deployment_name="mock")
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}])
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.1, help="Pause between requests.")
+    parser.add_argument("--token-lifetime", type=float, default=4.0)
+    parser.add_argument("--token-delay", type=float, default=0.25, help="Stand-in token endpoint latency.")
+    parser.add_argument("--completion-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = _start_stand_in(args.token_lifetime, args.token_delay, args.completion_delay)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = base
+
+    for mode in ("on-demand", "proactive"):
+        credential = LocalTokenCredential(f"{base}/token")
+        # Margins scaled to the short benchmark token lifetime
+        tokens = TokenProvider(
+            credential,
+            refresh_margin=args.token_lifetime / 2,
+            expiry_skew=args.token_lifetime / 10,
+        )
+        pool = ClientPool(credential, token_provider=tokens, http2=False)
+        if mode == "proactive":
+            pool.tokens.start()
+            await asyncio.sleep(args.token_delay * 2)  # warm-up
+        latencies = await _run(pool, args.requests, args.interval)
+        print(summarize(mode, latencies))
+        print(f"{'':<28} {json.dumps({k: round(v, 3) for k, v in pool.metrics().items()})}")
+        await pool.aclose()
+        assert pool.http_client.is_closed and pool.async_http_client.is_closed
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""Hosted agent deployment against a fake ``AIProjectClient``, sequential vs diff-aware.
+
+``FakeProjectClient`` keeps agents in memory and sleeps ``--latency`` per
+connection or agent lookup and ``--create-latency`` per ``create_version``.
+Checks that the engine creates only new or changed agents (image, CPU,
+memory), reports failures per agent and respects ``--max-workers``, then
+times four runs over ``--agents`` agents: the previous sequential loop
+(connection lookup and new version for every agent), a first deployment,
+an unchanged redeploy and a redeploy with one changed image.
+
+Usage::
+
+    python benchmarks/bench_deploy.py [--agents 8] [--max-workers 4] [--create-latency 0.5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from _support import REPO_ROOT
+
+sys.path.append(str(REPO_ROOT / "src"))
+
+from azure.core.exceptions import ResourceNotFoundError  # noqa: E402
+
+import deploy_agents  # noqa: E402
+from deploy_agents import AgentSpec, deploy, desired_agents  # noqa: E402
+
+_ENVIRONMENT = {"AZURE_OPENAI_ENDPOINT": "https://example.openai.azure.com", "OPENAI_API_VERSION": "2024-10-21"}
+
+
+class FakeProjectClient:
+    """In-memory stand-in for ``client.connections`` and ``client.agents``."""
+
+    def __init__(self, latency: float, create_latency: float, fail: frozenset[str] = frozenset()) -> None:
+        self.latency = latency
+        self.create_latency = create_latency
+        self.fail = fail
+        self.deployed: dict[str, SimpleNamespace] = {}
+        self.calls = {"connections.get": 0, "agents.get": 0, "create_version": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.connections = SimpleNamespace(get=self._get_connection)
+        self.agents = SimpleNamespace(get=self._get_agent, create_version=self._create_version)
+
+    def _enter(self, call: str) -> None:
+        with self._lock:
+            self.calls[call] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _get_connection(self, name: str) -> SimpleNamespace:
+        self._enter("connections.get")
+        time.sleep(self.latency)
+        self._leave()
+        return SimpleNamespace(id=f"/connections/{name}")
+
+    def _get_agent(self, name: str) -> SimpleNamespace:
+        self._enter("agents.get")
+        time.sleep(self.latency)
+        self._leave()
+        with self._lock:
+            definition = self.deployed.get(name)
+        if definition is None:
+            raise ResourceNotFoundError(f"Agent {name} not found")
+        return SimpleNamespace(versions=SimpleNamespace(latest=SimpleNamespace(definition=definition)))
+
+    def _create_version(self, agent_name: str, description: str, definition: SimpleNamespace) -> SimpleNamespace:
+        self._enter("create_version")
+        time.sleep(self.create_latency)
+        self._leave()
+        if agent_name in self.fail:
+            raise RuntimeError("quota exceeded")
+        with self._lock:
+            self.deployed[agent_name] = definition
+        return SimpleNamespace(id=f"{agent_name}:{self.calls['create_version']}")
+
+
+def _definition(spec: AgentSpec) -> SimpleNamespace:
+    return SimpleNamespace(
+        image=spec.image, cpu=spec.cpu, memory=spec.memory, environment_variables=dict(spec.environment)
+    )
+
+
+def _images(count: int, tag: str = "v1") -> dict[str, str]:
+    return {f"AGENT_{i:02d}_IMAGE": f"example.azurecr.io/agent-{i:02d}:{tag}" for i in range(count)}
+
+
+def _sequential(client: FakeProjectClient, specs: list[AgentSpec]) -> None:
+    """The previous deploy loop: a connection lookup and a new version per agent."""
+    for spec in specs:
+        client.connections.get("bing")
+        client.agents.create_version(agent_name=spec.name, description="", definition=_definition(spec))
+
+
+def _check() -> None:
+    environ = {**_images(3), "AGENT_01_CPU": "2", "AGENT_MEMORY": "4Gi", "UNRELATED_IMAGE": ""}
+    specs = desired_agents(environ, _ENVIRONMENT)
+    assert [(s.name, s.cpu, s.memory) for s in specs] == [
+        ("agent-00", "1", "4Gi"),
+        ("agent-01", "2", "4Gi"),
+        ("agent-02", "1", "4Gi"),
+    ], specs
+
+    client = FakeProjectClient(0.0, 0.0)
+    actions = [r.action for r in deploy(client, specs, _definition)]
+    assert actions == ["created"] * 3, actions
+    actions = [r.action for r in deploy(client, specs, _definition)]
+    assert actions == ["unchanged"] * 3, actions
+    assert [r.action for r in deploy(client, specs, _definition, force=True)] == ["created"] * 3
+
+    # A new image, CPU or memory value each trigger a new version
+    changed = desired_agents({**environ, "AGENT_00_IMAGE": "example.azurecr.io/agent-00:v2", "AGENT_02_MEMORY": "8Gi"}, _ENVIRONMENT)
+    actions = [r.action for r in deploy(client, changed, _definition)]
+    assert actions == ["created", "unchanged", "created"], actions
+    assert [r.action for r in deploy(client, changed, _definition, dry_run=True)] == ["unchanged"] * 3
+
+    # One failing agent does not stop the others
+    failing = FakeProjectClient(0.0, 0.0, fail=frozenset({"agent-01"}))
+    results = deploy(failing, specs, _definition)
+    assert [r.action for r in results] == ["created", "failed", "created"], results
+    assert "quota exceeded" in results[1].detail
+
+    bounded = FakeProjectClient(0.01, 0.02)
+    deploy(bounded, desired_agents(_images(10), _ENVIRONMENT), _definition, max_workers=3)
+    assert bounded.max_in_flight == 3, bounded.max_in_flight
+    print("checks: diff by image/cpu/memory, force, dry run, per-agent failures, bounded pool ... ok")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per connection or agent lookup.")
+    parser.add_argument("--create-latency", type=float, default=0.5, help="Seconds per create_version.")
+    args = parser.parse_args()
+
+    _check()
+    specs = desired_agents(_images(args.agents), _ENVIRONMENT)
+    print(
+        f"agents={args.agents} max_workers={args.max_workers} "
+        f"lookup={args.latency * 1000:.0f}ms create_version={args.create_latency * 1000:.0f}ms"
+    )
+
+    client = FakeProjectClient(args.latency, args.create_latency)
+    start = time.perf_counter()
+    _sequential(client, specs)
+    print(f"{'sequential (previous)':<24} {time.perf_counter() - start:6.2f}s  calls={client.calls}")
+
+    client = FakeProjectClient(args.latency, args.create_latency)
+    runs = [
+        ("first deployment", specs),
+        ("unchanged redeploy", specs),
+        ("one image changed", desired_agents(_images(args.agents) | {"AGENT_00_IMAGE": "example.azurecr.io/agent-00:v2"}, _ENVIRONMENT)),
+    ]
+    for label, desired in runs:
+        client.calls = dict.fromkeys(client.calls, 0)
+        start = time.perf_counter()
+        client.connections.get("bing")
+        results = deploy(client, desired, _definition, max_workers=args.max_workers)
+        elapsed = time.perf_counter() - start
+        actions = {a: sum(r.action == a for r in results) for a in ("created", "unchanged")}
+        print(f"{label:<24} {elapsed:6.2f}s  calls={client.calls}  {actions}")
+
+    print("summary as printed by deploy_agents.py:")
+    deploy_agents.print_summary(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
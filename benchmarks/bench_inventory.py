@@ -0,0 +1,173 @@
+"""Microbenchmarks of the order agent's inventory store at 100k+ SKUs.
+
+* bulk load from CSV and JSONL;
+* exact and prefix name lookups;
+* concurrent ``decrement`` from many threads on a small set of hot SKUs,
+  checking that stock never goes negative and every unit is sold exactly once;
+* memory per SKU.
+
+Checks first: ``find`` matches exact names only (``"desk"`` never orders
+the ``"desk lamp"``), and auto-registering a name twice, also from
+concurrent lookups, keeps one row and its reserved stock.
+
+Usage::
+
+    python benchmarks/bench_inventory.py [--skus 200000] [--threads 32]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from _support import AGENTS_DIR
+
+sys.path.insert(0, str(AGENTS_DIR / "order"))
+
+from inventory import InventoryError, InventoryStore, ProductRecord, normalize_name, read_catalog  # noqa: E402
+
+_ADJECTIVES = ["oak", "steel", "nordic", "compact", "ergonomic", "wireless", "vintage", "modular", "outdoor", "kids"]
+_NOUNS = ["table", "chair", "lamp", "desk", "shelf", "sofa", "headphones", "monitor", "bottle", "jacket"]
+
+
+def _catalog(count: int, stock: int) -> list[ProductRecord]:
+    rng = random.Random(1)
+    return [
+        ProductRecord(
+            sku=f"SKU-{i:07d}",
+            name=f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {i}",
+            price=round(rng.uniform(5, 500), 2),
+            stock=stock,
+        )
+        for i in range(count)
+    ]
+
+
+def _timed(label: str, fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    per_op = elapsed / repeat
+    unit = f"{per_op * 1e6:9.2f}µs/op" if repeat > 1 else f"{elapsed:9.3f}s"
+    print(f"{label:<34} {unit}")
+    return elapsed
+
+
+def _check() -> None:
+    store = InventoryStore()
+    store.add(ProductRecord(sku="SKU-1", name="Desk Lamp", price=19.0, stock=5))
+    assert store.find("desk") is None and store.find("DESK  lamp") == 0
+    assert store.prefix("desk") == [0]
+
+    store = InventoryStore(auto_register=True, default_stock=1000)
+    rows: list[int] = []
+    threads = [threading.Thread(target=lambda: rows.append(store.find("Blue Vase"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(rows)) == 1 and len(store) == 1, (rows, len(store))
+    row = rows[0]
+    initial = store.stock[row]
+    store.reserve(row, 1)
+    # A lookup that missed the name index just before the first registration
+    assert store._register("Blue Vase", normalize_name("Blue Vase")) == row
+    assert store.stock[row] == initial - 1 and store.reserved[row] == 1, (store.stock[row], store.reserved[row])
+    # "plumless" and "buckeroo" have the same CRC32
+    first, second = store.find("Plumless"), store.find("Buckeroo")
+    assert first != second and store.names[second] == "Buckeroo", (store.skus[first], store.skus[second])
+    assert store.skus[second] == store.skus[first] + "-2", store.skus[second]
+    print(
+        "checks: exact lookups for orders, one row per auto-registered name, reservations kept, "
+        "colliding SKUs ... ok"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--hot", type=int, default=10, help="Number of SKUs the concurrent orders target.")
+    args = parser.parse_args()
+    _check()
+
+    records = _catalog(args.skus, stock=50)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "catalog.csv"
+        jsonl_path = Path(tmp) / "catalog.jsonl"
+        with csv_path.open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["sku", "name", "price", "stock"])
+            writer.writerows((r.sku, r.name, r.price, r.stock) for r in records)
+        with jsonl_path.open("w", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(r.__dict__) + "\n" for r in records)
+
+        print(f"skus={args.skus}")
+        _timed("load csv", lambda: InventoryStore().load(read_catalog(csv_path)))
+        _timed("load jsonl", lambda: InventoryStore().load(read_catalog(jsonl_path)))
+
+    tracemalloc.start()
+    store = InventoryStore()
+    store.load(records)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'memory per sku (incl. indexes)':<34} {current / args.skus:9.0f}B")
+
+    rng = random.Random(2)
+    names = [records[rng.randrange(args.skus)].name.upper() for _ in range(10_000)]
+    it = iter(names * 10)
+    _timed("exact lookup (find)", lambda: store.find(next(it)), repeat=50_000)
+    prefixes = iter([f"{a} {n}" for a in _ADJECTIVES for n in _NOUNS] * 500)
+    _timed("prefix lookup (limit=10)", lambda: store.prefix(next(prefixes)), repeat=50_000)
+    _timed("miss (no auto-register)", lambda: store.find("unknown product xyz"), repeat=50_000)
+
+    # Concurrent orders: demand exceeds the hot SKUs' stock, so some must fail
+    hot_rows = list(range(args.hot))
+    for row in hot_rows:
+        # ~80% of the expected demand (2 units per order on average)
+        store.stock[row] = int(args.orders * 2 * 0.8 / args.hot)
+    initial = sum(store.stock[row] for row in hot_rows)
+    sold = [0] * args.threads
+    rejected = [0] * args.threads
+    per_thread = args.orders // args.threads
+
+    def worker(index: int) -> None:
+        local_rng = random.Random(index)
+        for _ in range(per_thread):
+            row = hot_rows[local_rng.randrange(len(hot_rows))]
+            quantity = local_rng.randint(1, 3)
+            try:
+                store.decrement(row, quantity)
+                sold[index] += quantity
+            except InventoryError:
+                rejected[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    remaining = sum(store.stock[row] for row in hot_rows)
+    total = per_thread * args.threads
+    print(
+        f"{'concurrent decrement':<34} {elapsed / total * 1e6:9.2f}µs/op "
+        f"({total} orders, {args.threads} threads, {args.hot} hot skus)"
+    )
+    consistent = sum(sold) + remaining == initial and min(store.stock[row] for row in hot_rows) >= 0
+    print(f"{'':<34} sold={sum(sold)} rejected={sum(rejected)} remaining={remaining} consistent={consistent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Perceived routing latency of the orchestrator: early-emit streaming vs run().
+
+Measures the time until the routing decision (``goto.next_agent``) is known
+to the caller. ``run()`` only returns after the whole routing JSON, including
+the free-text reason, has been generated; ``run_stream()`` emits the decision
+as soon as the ``next_agent`` field is complete. The local classifier tier and
+the decision cache are disabled so that every message reaches the mock LLM.
+
+Checks first: when a repaired response picks another route than the one
+already streamed, the streamed route is kept with a matching reason and the
+decision is not cached.
+
+Usage::
+
+    python benchmarks/bench_orchestrator_stream.py [--latency 0.8] [--runs 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from _support import MockChatClient, load_agent_module, summarize
+
+_USER_TEXT = "I need a dining table for six people, ideally oak"
+_ANSWER = json.dumps(
+    {
+        "next_agent": "product-search",
+        "reason": "The user wants to discover dining tables and has not selected a specific product yet.",
+        "input": _USER_TEXT,
+    }
+)
+
+
+async def _decision_via_run(agent, orchestrator) -> float:
+    start = time.perf_counter()
+    response = await agent.run(_USER_TEXT)
+    orchestrator.OrchestratorOutput.model_validate_json(response.messages[0].text)
+    return time.perf_counter() - start
+
+
+async def _decision_via_stream(agent, orchestrator) -> tuple[float, float]:
+    start = time.perf_counter()
+    decided: float | None = None
+    text = ""
+    async for update in agent.run_stream(_USER_TEXT):
+        if decided is None and '"next_agent"' in update.text:
+            decided = time.perf_counter() - start
+        text += update.text
+    total = time.perf_counter() - start
+    orchestrator.OrchestratorOutput.model_validate_json(text)
+    return decided or total, total
+
+
+async def _check(orchestrator) -> None:
+    from routing_cache import InMemoryBackend, RoutingCache
+
+    def reply(text: str) -> str:
+        if text == _USER_TEXT:
+            # Cut off after next_agent: only an LLM repair can complete it
+            return '{"next_agent":"product-search","reason":"The user wants'
+        return json.dumps({"next_agent": "order-agent", "reason": "The user wants to place an order."})
+
+    cache = RoutingCache(InMemoryBackend(16), ttl=60, prompt="check")
+    agent = orchestrator.OrderOrchestratorAgent(
+        name="order-orchestrator", chat_client=MockChatClient(reply, latency=0.05), routing_cache=cache
+    )
+    updates = [update async for update in agent.run_stream(_USER_TEXT)]
+    output = orchestrator.OrchestratorOutput.model_validate_json("".join(update.text for update in updates))
+    assert output.goto.next_agent.value == "product-search" and output.goto.error, output.goto
+    assert "order" not in output.goto.reason, output.goto.reason
+    assert await cache.get(_USER_TEXT) is None
+    print("checks: streamed route kept on a disagreeing repair, with its own reason, not cached ... ok")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.8, help="Total generation time of the mock model.")
+    parser.add_argument("--first-token", type=float, default=0.1, help="Mock time to first token.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["ROUTER_CLASSIFIER"] = "off"
+    os.environ["ROUTER_CACHE"] = "off"
+    orchestrator = load_agent_module("order-orchestrator")
+    await _check(orchestrator)
+    client = MockChatClient(lambda _: _ANSWER, latency=args.latency, first_token_latency=args.first_token)
+    agent = orchestrator.OrderOrchestratorAgent(name="order-orchestrator", chat_client=client)
+
+    buffered: list[float] = []
+    decided: list[float] = []
+    totals: list[float] = []
+    for _ in range(args.runs):
+        buffered.append(await _decision_via_run(agent, orchestrator))
+        first, total = await _decision_via_stream(agent, orchestrator)
+        decided.append(first)
+        totals.append(total)
+
+    print(f"mock latency={args.latency}s first_token={args.first_token}s runs={args.runs}")
+    print(summarize("run() decision", buffered))
+    print(summarize("run_stream() decision", decided))
+    print(summarize("run_stream() complete", totals))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Throughput of the sync vs async order agent graphs under concurrent sessions.
+
+Each session is one order conversation: the mock model first asks for
+``check_inventory``, then answers with a confirmation, so every session makes
+two model calls and one tool call. Both graphs are driven through
+``ainvoke`` exactly as the ``from_langgraph`` adapter does; the sync graph's
+nodes therefore run on worker threads while the async graph stays on the
+event loop.
+
+Usage::
+
+    python benchmarks/bench_order_async_load.py [--latency 0.3] [--levels 1 10 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from typing import Any
+
+from _support import load_agent_module, percentile
+
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+
+class MockOrderModel(BaseChatModel):
+    """Calls check_inventory once, then confirms; sleeps ``latency`` per call."""
+
+    latency: float = 0.3
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-order-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> MockOrderModel:
+        return self
+
+    def _reply(self, messages: list) -> ChatResult:
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content="Your order is confirmed.")
+        else:
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": "check_inventory", "args": {"product_name": "table"}, "id": "call_1"}],
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+async def _drive(graph, concurrency: int, sessions: int) -> tuple[float, list[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    peak_threads = threading.active_count()
+
+    async def session() -> None:
+        nonlocal peak_threads
+        async with semaphore:
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content="Order one oak table")]})
+            latencies.append(time.perf_counter() - start)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    return time.perf_counter() - start, latencies, peak_threads
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock model latency per call.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--sessions-per-level", type=int, default=2, help="Sessions per concurrent slot.")
+    args = parser.parse_args()
+
+    order = load_agent_module("order")
+    model = MockOrderModel(latency=args.latency)
+    order.llm_with_tools = order.Lazy(lambda: model)  # the sync graph reads the module-level model
+    graphs = {"sync": order.build_agent(), "async": order.build_async_agent(model=model)}
+
+    print(f"mock latency={args.latency}s per model call, 2 model calls + 1 tool call per session")
+    for concurrency in args.levels:
+        sessions = concurrency * args.sessions_per_level
+        for mode, graph in graphs.items():
+            elapsed, latencies, threads = await _drive(graph, concurrency, sessions)
+            print(
+                f"{mode:<6} concurrency={concurrency:<4} sessions={sessions:<4} "
+                f"throughput={sessions / elapsed:7.2f}/s "
+                f"p50={percentile(latencies, 50) * 1000:8.1f}ms "
+                f"p95={percentile(latencies, 95) * 1000:8.1f}ms threads={threads}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
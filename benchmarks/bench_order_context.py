@@ -0,0 +1,132 @@
+"""Per-turn context size and latency of the order agent as conversations grow.
+
+Drives one long conversation through the async order graph: every user turn
+makes the model call ``check_inventory`` and then answer. The mock model's
+latency grows with its input size (``--base`` + ``--per-1k`` per 1000 input
+tokens) and it reports ``usage_metadata``, like the real service. Compares
+full history (``keep_turns=0``) with a window of ``--keep-turns`` turns plus
+a running summary, using the usage records in ``state["usage"]`` and the
+totals in ``state["usage_totals"]``. Checks that ``state["usage"]`` stays
+capped. Turn totals include the summarization calls.
+
+Usage::
+
+    python benchmarks/bench_order_context.py [--turns 40] [--keep-turns 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any
+
+from _support import load_agent_module
+
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+os.environ.setdefault("ORDER_LOG_PATH", "off")
+
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+_ANSWER = (
+    "Good news: the {product} is in stock. It is made of solid oak with a natural oil finish, "
+    "ships within three to five days and comes with a two year warranty. Shall I place the order?"
+)
+
+
+class SizeSensitiveModel(BaseChatModel):
+    """Mock whose latency grows with the input; answers tool loops and summaries."""
+
+    base: float = 0.05
+    per_1k: float = 0.05
+    summaries: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "size-sensitive-mock"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> SizeSensitiveModel:
+        return self
+
+    def _reply(self, messages: list) -> tuple[AIMessage, int]:
+        tokens = sum(len(str(m.content)) for m in messages) // 4
+        if isinstance(messages[0], SystemMessage) and "running summary" in str(messages[0].content):
+            self.summaries += 1
+            message = AIMessage(content="Customer browsed several oak tables; no order placed yet.")
+        elif isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=_ANSWER.format(product="oak table"))
+        else:
+            product = str(messages[-1].content).rsplit(" ", 1)[-1]
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": "check_inventory", "args": {"product_name": product}, "id": f"call_{tokens}"}],
+            )
+        message.usage_metadata = {
+            "input_tokens": tokens,
+            "output_tokens": len(str(message.content)) // 4,
+            "total_tokens": tokens + len(str(message.content)) // 4,
+        }
+        return message, tokens
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, tokens = self._reply(messages)
+        await asyncio.sleep(self.base + self.per_1k * tokens / 1000)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError("async only")
+
+
+async def _conversation(graph, turns: int, max_records: int) -> tuple[list[dict], dict, list[float]]:
+    state: dict = {"messages": []}
+    per_turn: list[dict] = []
+    wall: list[float] = []
+    for turn in range(turns):
+        state["messages"] = state["messages"] + [HumanMessage(content=f"Do you have oak table {turn}")]
+        start = time.perf_counter()
+        state = await graph.ainvoke(state)
+        wall.append(time.perf_counter() - start)
+        # Two llm_calls per turn; keep the first (the one that sees the new user message)
+        per_turn.append(state["usage"][-2])
+    assert len(state["usage"]) <= max_records, len(state["usage"])
+    assert state["usage_totals"]["llm_calls"] == 2 * turns, state["usage_totals"]
+    return per_turn, state["usage_totals"], wall
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--keep-turns", type=int, default=4)
+    parser.add_argument("--base", type=float, default=0.05, help="Mock latency per call.")
+    parser.add_argument("--per-1k", type=float, default=0.05, help="Mock latency per 1000 input tokens.")
+    args = parser.parse_args()
+
+    order = load_agent_module("order")
+    import context_window  # loaded with the order agent
+
+    checkpoints = sorted({1, args.turns // 4, args.turns // 2, args.turns})
+    for label, keep_turns in (("full history", 0), (f"window={args.keep_turns}+summary", args.keep_turns)):
+        order.context_policy = order.ContextPolicy(keep_turns=keep_turns)
+        model = SizeSensitiveModel(base=args.base, per_1k=args.per_1k)
+        per_turn, totals, wall = await _conversation(
+            order.build_async_agent(model=model), args.turns, context_window.USAGE_RECORDS
+        )
+        print(f"{label} (summaries={model.summaries})")
+        for turn in checkpoints:
+            record = per_turn[turn - 1]
+            print(
+                f"  turn {turn:<4} input_tokens={record['input_tokens']:<6} "
+                f"context_messages={record['context_messages']:<4} llm_call={record['latency_ms']:7.1f}ms "
+                f"turn_total={wall[turn - 1] * 1000:7.1f}ms"
+            )
+        total = totals["input_tokens"]
+        print(f"  input tokens over {args.turns} turns (excl. summaries): {total}, mean turn {sum(wall) / len(wall) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""Write throughput and crash recovery of the order agent's durable order log.
+
+* throughput: ``--threads`` writers place orders through ``place_once`` with
+  fsync enabled, once with group commit and once forced to one fsync per
+  order (``max_batch=1``);
+* idempotency: replaying every key returns the logged confirmation and adds
+  no records;
+* crash recovery: a child process writes orders and reports each
+  acknowledged order ID; it is killed with SIGKILL mid-stream, then the log
+  is reopened and every acknowledged order must be present;
+* torn tail: garbage appended to the log is truncated on open;
+* failed commit: when the order agent cannot log an order, its stock is
+  released, and a retry of the same tool call places it once.
+
+Usage::
+
+    python benchmarks/bench_order_log.py [--threads 32] [--orders 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from _support import AGENTS_DIR, load_agent_module
+
+sys.path.insert(0, str(AGENTS_DIR / "order"))
+
+from order_log import OrderLog  # noqa: E402
+
+
+class _FailingLog(OrderLog):
+    """Order log whose commits fail while ``failing`` is set."""
+
+    failing = True
+
+    def append(self, order_id: str, confirmation: dict, *, key: str | None = None) -> None:
+        if self.failing:
+            raise OSError("No space left on device")
+        super().append(order_id, confirmation, key=key)
+
+
+def _confirmation(i: int) -> dict:
+    return {
+        "order_id": uuid.uuid4().hex[:16].upper(),
+        "product_name": f"product {i % 100}",
+        "quantity": 1 + i % 3,
+        "total_price": 19.99,
+        "status": "confirmed",
+    }
+
+
+def _throughput(path: Path, threads: int, orders: int, max_batch: int) -> tuple[float, OrderLog]:
+    log = OrderLog(path, max_batch=max_batch)
+    per_thread = orders // threads
+
+    def worker(t: int) -> None:
+        for i in range(per_thread):
+            log.place_once(f"conv-{t}:call-{i}", lambda i=i: _confirmation(i))
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start), log
+
+
+def _child(path: str) -> None:
+    """Write orders forever, printing each ID once it is durable."""
+    log = OrderLog(path)
+    i = 0
+    while True:
+        confirmation = _confirmation(i)
+        log.append(confirmation["order_id"], confirmation, key=f"child:{i}")
+        print(confirmation["order_id"], flush=True)
+        i += 1
+
+
+def _check_failed_commit(path: Path) -> None:
+    os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+    os.environ.setdefault("ORDER_LOG_PATH", "off")
+    order = load_agent_module("order")
+    from inventory import InventoryStore, ProductRecord
+    from common.startup import Lazy
+
+    order.inventory = InventoryStore()
+    row = order.inventory.add(ProductRecord(sku="SKU-1", name="Oak Table", price=349.0, stock=10))
+    log = _FailingLog(path)
+    order.order_log = Lazy(lambda: log)
+    config = {"configurable": {"thread_id": "conv-1"}}
+    try:
+        order._place_once("Oak Table", 3, "call-1", config)
+    except OSError:
+        pass
+    else:
+        raise AssertionError("the failed commit was not reported")
+    assert order.inventory.stock[row] == 10 and order.inventory.reserved[row] == 0, order.inventory.snapshot(row)
+    log.failing = False
+    first = order._place_once("Oak Table", 3, "call-1", config)
+    replay = order._place_once("Oak Table", 3, "call-1", config)
+    assert first["status"] == "confirmed" and replay["order_id"] == first["order_id"], (first, replay)
+    assert order.inventory.stock[row] == 7 and len(log) == 1, order.inventory.snapshot(row)
+    log.close()
+    print("failed commit: stock released, retry placed once")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+
+        for label, max_batch in (("group commit", 1024), ("fsync per order", 1)):
+            rate, log = _throughput(tmp_path / f"{max_batch}.log", args.threads, args.orders, max_batch)
+            print(
+                f"{label:<16} threads={args.threads} orders={len(log)} {rate:9.0f} orders/s "
+                f"records/fsync={log.stats.records_per_commit:.1f}"
+            )
+            if max_batch > 1:
+                grouped = log
+            else:
+                log.close()
+
+        before = len(grouped)
+        per_thread = args.orders // args.threads
+        replayed = [grouped.place_once(f"conv-0:call-{i}", lambda: _confirmation(-1)) for i in range(per_thread)]
+        print(
+            f"idempotency: replays={grouped.stats.replays} new records={len(grouped) - before} "
+            f"same ids={all(grouped.lookup_key(f'conv-0:call-{i}')['order_id'] == c['order_id'] for i, c in enumerate(replayed))}"
+        )
+        grouped.close()
+
+        # Kill a writer mid-stream and check that every acknowledged order survived
+        crash_path = tmp_path / "crash.log"
+        child = subprocess.Popen(
+            [sys.executable, __file__, "--child", str(crash_path)],
+            stdout=subprocess.PIPE,
+            text=True,
+            cwd=Path(__file__).parent,
+        )
+        acknowledged = [child.stdout.readline().strip() for _ in range(500)]
+        os.kill(child.pid, signal.SIGKILL)
+        child.wait()
+        recovered = OrderLog(crash_path)
+        missing = [order_id for order_id in acknowledged if recovered.get(order_id) is None]
+        print(
+            f"crash recovery: acknowledged={len(acknowledged)} recovered={len(recovered)} "
+            f"missing={len(missing)} truncated_bytes={recovered.stats.truncated_bytes}"
+        )
+        recovered.close()
+
+        # Simulate a torn write: a partial header and payload at the end
+        with crash_path.open("ab") as f:
+            f.write(b"\x40\x00\x00\x00\xde\xad\xbe\xef{\"order_id\":")
+        reopened = OrderLog(crash_path)
+        print(f"torn tail: truncated_bytes={reopened.stats.truncated_bytes} records={len(reopened)}")
+        reopened.close()
+
+        _check_failed_commit(tmp_path / "failing.log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""LLM calls and latency per order, tool loop vs plan mode (``ORDER_PLAN_MODE``).
+
+Places ``--orders`` orders through the async order graph, each in its own
+conversation that already holds ``--history`` turns of product questions.
+The mock model behaves like a tool-calling LLM: in the tool loop it calls
+``check_inventory``, then ``place_order``, then writes the confirmation; in
+plan mode it calls ``check_and_place_order`` once and the ``confirm`` node
+answers. Its latency grows with the input (``--base`` + ``--per-1k`` per
+1000 input tokens), as each call re-sends the history. Reports LLM calls,
+input tokens and end-to-end latency per order.
+
+Checks first: one LLM call per confirmed or rejected order in plan mode
+(stock taken once, or left alone), three in the tool loop, availability
+questions still answered by the model, and ``ORDER_MAX_LLM_CALLS`` stopping a
+conversation with the limit reply.
+
+Usage::
+
+    python benchmarks/bench_order_plan.py [--orders 40] [--history 4] [--concurrency 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any
+
+from _support import load_agent_module, percentile
+
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+os.environ.setdefault("ORDER_LOG_PATH", "off")
+
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from pydantic import Field  # noqa: E402
+
+_ORDER_RE = re.compile(r"order (\d+) of (.+)$", re.IGNORECASE)
+_QUESTION_RE = re.compile(r"do you have (.+)\?$", re.IGNORECASE)
+_STOCK = 1000
+
+
+class OrderFlowModel(BaseChatModel):
+    """Mock that orders like a tool-calling LLM; latency grows with the input."""
+
+    base: float = 0.3
+    per_1k: float = 0.1
+    tool_names: tuple[str, ...] = ()
+    # Shared with the copies made by bind_tools
+    stats: dict = Field(default_factory=lambda: {"calls": 0})
+
+    @property
+    def _llm_type(self) -> str:
+        return "order-flow-mock"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> OrderFlowModel:
+        return self.model_copy(update={"tool_names": tuple(t.name for t in tools)})
+
+    def _call(self, name: str, **args: Any) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{self.stats['calls']}"}])
+
+    def _reply(self, messages: list) -> AIMessage:
+        last = messages[-1]
+        request = next(m for m in reversed(messages) if isinstance(m, HumanMessage)).content
+        if isinstance(last, HumanMessage):
+            if match := _ORDER_RE.search(last.content):
+                quantity, product = int(match[1]), match[2]
+                if "check_and_place_order" in self.tool_names:
+                    return self._call("check_and_place_order", product_name=product, quantity=quantity)
+                return self._call("check_inventory", product_name=product)
+            if match := _QUESTION_RE.search(last.content):
+                return self._call("check_inventory", product_name=match[1])
+            return AIMessage(content="Our catalog has several options; which one would you like?")
+        result = json.loads(last.content)
+        if last.name == "check_inventory" and (match := _ORDER_RE.search(request)):
+            if result.get("available_quantity", 0) >= int(match[1]):
+                return self._call("place_order", product_name=match[2], quantity=int(match[1]))
+            return AIMessage(content=f"Sorry, only {result.get('available_quantity', 0)} of {match[2]} are available.")
+        if last.name == "check_inventory":
+            return AIMessage(content=f"Yes, {result['available_quantity']} of {result['product_name']} are in stock.")
+        return AIMessage(
+            content=f"Thank you! Your order {result.get('order_id')} for {result.get('quantity')} x "
+            f"{result.get('product_name')} is {result.get('status')}."
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.stats["calls"] += 1
+        tokens = sum(len(str(m.content)) for m in messages) // 4
+        message = self._reply(messages)
+        message.usage_metadata = {"input_tokens": tokens, "output_tokens": 20, "total_tokens": tokens + 20}
+        await asyncio.sleep(self.base + self.per_1k * tokens / 1000)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError("async only")
+
+
+def _history(turns: int) -> list:
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"What can you tell me about the solid oak dining table, variant {turn}?"))
+        messages.append(
+            AIMessage(
+                content="The solid oak dining table seats six, has a natural oil finish and ships within three to "
+                "five days. It is available in three sizes and comes with a two year warranty. " * 3
+            )
+        )
+    return messages
+
+
+def _stock_up(order: Any, products: int) -> None:
+    from inventory import ProductRecord
+
+    order.inventory = order.InventoryStore()
+    order.inventory.load(
+        ProductRecord(sku=f"SKU-{i:05d}", name=f"Product {i:05d}", price=49.5, stock=_STOCK)
+        for i in range(products)
+    )
+
+
+async def _order(graph: Any, text: str, history: list) -> tuple[dict, float]:
+    started = time.perf_counter()
+    state = await graph.ainvoke({"messages": [*history, HumanMessage(content=text)]})
+    return state, time.perf_counter() - started
+
+
+async def _check(order: Any) -> None:
+    _stock_up(order, 2)
+    stock = order.inventory.stock
+    model = OrderFlowModel(base=0.0, per_1k=0.0)
+    plan = order.build_async_agent(model=model, plan=True)
+    loop = order.build_async_agent(model=model, plan=False)
+
+    state, _ = await _order(plan, "please order 3 of Product 00000", [])
+    assert state["usage_totals"]["llm_calls"] == 1 and "is confirmed" in state["messages"][-1].content, state["messages"][-1]
+    assert stock[0] == _STOCK - 3, stock[0]
+    state, _ = await _order(plan, f"please order {_STOCK} of Product 00000", [])
+    assert state["usage_totals"]["llm_calls"] == 1 and f"only {_STOCK - 3} available" in state["messages"][-1].content
+    assert stock[0] == _STOCK - 3, stock[0]
+    state, _ = await _order(plan, "do you have Product 00001?", [])
+    assert state["usage_totals"]["llm_calls"] == 2 and "in stock" in state["messages"][-1].content
+
+    state, _ = await _order(loop, "please order 3 of Product 00001", [])
+    assert state["usage_totals"]["llm_calls"] == 3 and "confirmed" in state["messages"][-1].content
+    assert stock[1] == _STOCK - 3, stock[1]
+
+    order.plan_policy.max_llm_calls = 2
+    try:
+        state, _ = await _order(loop, "please order 1 of Product 00001", [])
+    finally:
+        order.plan_policy.max_llm_calls = 0
+    assert state["usage_totals"]["llm_calls"] == 2 and state["messages"][-1].content == order.LIMIT_REPLY
+    assert stock[1] == _STOCK - 4, stock[1]
+    print("checks: plan mode orders in one call (confirmed, rejected), questions, tool loop, LLM call cap ... ok")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=40)
+    parser.add_argument("--history", type=int, default=4, help="Turns already in each conversation.")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--base", type=float, default=0.3, help="Mock latency per call.")
+    parser.add_argument("--per-1k", type=float, default=0.1, help="Mock latency per 1000 input tokens.")
+    args = parser.parse_args()
+
+    order = load_agent_module("order")
+    await _check(order)
+
+    history = _history(args.history)
+    print(f"{args.orders} orders, {args.history} turns of history, base={args.base}s per_1k={args.per_1k}s")
+    for label, plan in (("tool loop", False), ("plan mode", True)):
+        _stock_up(order, args.orders)
+        model = OrderFlowModel(base=args.base, per_1k=args.per_1k)
+        graph = order.build_async_agent(model=model, plan=plan)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def place(i: int) -> tuple[dict, float]:
+            async with semaphore:
+                return await _order(graph, f"please order 2 of Product {i:05d}", history)
+
+        results = await asyncio.gather(*(place(i) for i in range(args.orders)))
+        confirmed = sum("confirmed" in state["messages"][-1].content for state, _ in results)
+        latencies = [elapsed for _, elapsed in results]
+        tokens = sum(state["usage_totals"]["input_tokens"] for state, _ in results)
+        print(
+            f"  {label:<10} llm_calls/order={model.stats['calls'] / args.orders:4.2f} "
+            f"input_tokens/order={tokens / args.orders:6.0f} p50={percentile(latencies, 50) * 1000:6.0f}ms "
+            f"p95={percentile(latencies, 95) * 1000:6.0f}ms confirmed={confirmed}/{args.orders}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Speedup of concurrent tool execution in the order agent's tool node.
+
+Builds tool nodes with ``make_tool_node`` around tools with artificial
+latency and runs one turn containing ``--calls`` tool calls, first with a
+concurrency limit of 1 (the previous sequential behaviour) and then with
+``--concurrency`` workers. Also checks that results keep the original
+``tool_call_id`` order and that a slow tool is cut off by its timeout.
+
+Usage::
+
+    python benchmarks/bench_order_tool_node.py [--calls 5] [--tool-latency 0.2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+from _support import load_agent_module, summarize
+
+# The order agent builds its LLM client at import time; point it at a dummy endpoint.
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    order = load_agent_module("order")
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import tool
+
+    @tool
+    def check_inventory(product_name: str) -> dict:
+        """Check inventory availability for a product (artificially slow)."""
+        time.sleep(args.tool_latency * random.uniform(0.8, 1.2))
+        return {"product_name": product_name, "in_stock": True, "available_quantity": 10}
+
+    @tool
+    def stuck_tool(product_name: str) -> dict:
+        """A tool that never answers in time."""
+        time.sleep(args.tool_latency * 5)
+        return {"product_name": product_name}
+
+    tools = {t.name: t for t in (check_inventory, stuck_tool)}
+    calls = [
+        {"name": "check_inventory", "args": {"product_name": f"product-{i}"}, "id": f"call_{i}", "type": "tool_call"}
+        for i in range(args.calls)
+    ]
+    state = {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+    for label, concurrency in (("sequential", 1), (f"concurrent x{args.concurrency}", args.concurrency)):
+        node = order.make_tool_node(tools, max_concurrency=concurrency)
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = node(state)
+            samples.append(time.perf_counter() - start)
+            assert [m.tool_call_id for m in result["messages"]] == [c["id"] for c in calls]
+        print(summarize(f"{label} ({args.calls} calls)", samples))
+
+    node = order.make_tool_node(tools, timeouts={"stuck_tool": args.tool_latency})
+    stuck = {"name": "stuck_tool", "args": {"product_name": "x"}, "id": "call_stuck", "type": "tool_call"}
+    result = node({"messages": [AIMessage(content="", tool_calls=[calls[0], stuck])]})
+    print(f"timeout check: statuses={[m.status for m in result['messages']]}")
+
+
+if __name__ == "__main__":
+    main()
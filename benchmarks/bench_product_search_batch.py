@@ -0,0 +1,75 @@
+"""Throughput of the product-search batch runner and resume after interruption.
+
+Runs ``--queries`` distinct queries through ``batch.run_batch`` against a mock
+chat client at several concurrency levels (semantic cache disabled). Then
+cancels a batch half-way and reruns it with the same progress file to show
+that only the remaining queries are executed.
+
+Usage::
+
+    python benchmarks/bench_product_search_batch.py [--latency 0.2] [--queries 400]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+
+from _support import AGENTS_DIR, MockChatClient, load_agent_module
+
+sys.path.insert(0, str(AGENTS_DIR / "product-search"))
+
+from batch import run_batch  # noqa: E402
+
+
+def _answer(query: str) -> str:
+    return json.dumps({"name": query.title(), "price": "10.00€", "description": f"About {query}."})
+
+
+async def _lines(count: int):
+    for i in range(count):
+        yield json.dumps({"id": f"q{i}", "query": f"product number {i}"}) + "\n"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock model latency per call.")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    os.environ["PRODUCT_CACHE"] = "off"
+    product_search = load_agent_module("product-search")
+    print(f"mock latency={args.latency}s queries={args.queries}")
+
+    for concurrency in args.levels:
+        queries = args.queries if concurrency > 1 else max(1, args.queries // 20)
+        agent = product_search.ProductSearchAgent(chat_client=MockChatClient(_answer, latency=args.latency))
+        stats = await run_batch(agent, _lines(queries), io.StringIO(), concurrency=concurrency)
+        print(f"concurrency={concurrency:<4} {stats.summary()}")
+
+    # Interrupt a batch half-way, then resume it from the progress file
+    client = MockChatClient(_answer, latency=args.latency)
+    agent = product_search.ProductSearchAgent(chat_client=client)
+    output, progress = io.StringIO(), io.StringIO()
+    task = asyncio.create_task(run_batch(agent, _lines(args.queries), output, progress=progress, concurrency=32))
+    await asyncio.sleep(args.latency * args.queries / 32 / 2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    done = set(progress.getvalue().split())
+    first_calls = client.calls
+
+    stats = await run_batch(agent, _lines(args.queries), output, progress=progress, done=done, concurrency=32)
+    ids = [json.loads(line)["id"] for line in output.getvalue().splitlines()]
+    print(
+        f"resume: first run completed={len(done)} (llm calls {first_calls}), "
+        f"second run {stats.summary()}, unique ids in output={len(set(ids))}/{args.queries}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
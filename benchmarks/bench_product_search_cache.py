@@ -0,0 +1,161 @@
+"""Hit rate and latency of the product-search semantic cache.
+
+Replays a query stream in which most queries are variants (case, prefix, word
+order, plural) of a smaller set of base queries, once with the cache disabled
+and once with the local ``HashingEmbedder``. Also measures raw index lookup
+time at growing index sizes, a save/load round trip, and how long ``set()``
+holds the event loop when it triggers the periodic save of a full index.
+
+Usage::
+
+    python benchmarks/bench_product_search_cache.py [--latency 0.5] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from _support import AGENTS_DIR, MockChatClient, load_agent_module, summarize
+
+sys.path.insert(0, str(AGENTS_DIR / "product-search"))
+
+from semantic_cache import HashingEmbedder, SemanticCache, VectorIndex  # noqa: E402
+
+_BASE_QUERIES = [
+    "wireless headphones",
+    "oak dining table for six",
+    "ergonomic office chair",
+    "stainless steel water bottle",
+    "mechanical keyboard",
+    "running shoes for women",
+    "4k computer monitor",
+    "espresso machine",
+    "queen size memory foam mattress",
+    "kids winter jacket",
+]
+
+
+def _variant(query: str, rng: random.Random) -> str:
+    words = query.split()
+    choice = rng.randrange(5)
+    if choice == 0:
+        return query.upper()
+    if choice == 1:
+        return "I need " + query
+    if choice == 2 and len(words) > 1:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+        return " ".join(words)
+    if choice == 3:
+        return query + "s"
+    return query + "!"
+
+
+def _answer(query: str) -> str:
+    return json.dumps({"name": query.title(), "price": "99.00€", "description": f"A fine {query}."})
+
+
+async def _replay(agent, queries: list[str]) -> list[float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await agent.run(query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _index_lookup_ms(size: int, dimensions: int, probes: int = 200) -> float:
+    rng = np.random.default_rng(0)
+    index = VectorIndex(dimensions, size)
+    vectors = rng.standard_normal((size, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for vector in vectors:
+        index.add(vector, "x")
+    start = time.perf_counter()
+    for vector in vectors[:probes]:
+        index.search(vector)
+    return (time.perf_counter() - start) * 1000 / probes
+
+
+async def _periodic_save(path: Path, max_entries: int = 4096) -> None:
+    embedder = HashingEmbedder()
+    cache = SemanticCache(embedder, max_entries=max_entries, path=path, save_every=1)
+    rng = np.random.default_rng(5)
+    for _ in range(max_entries):
+        cache.index.add(rng.standard_normal(embedder.dimensions).astype(np.float32), _answer("filler"))
+    start = time.perf_counter()
+    cache.index.save(path, metadata={})
+    blocking = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await cache.set("oak dining table for six", _answer("oak dining table for six"))
+    held = time.perf_counter() - start
+    await cache._save_task
+    restored = SemanticCache(embedder, max_entries=max_entries, path=path)
+    assert len(restored.index) == max_entries and restored.index.search(
+        (await embedder.embed(["oak dining table for six"]))[0]
+    )[1] > 0.99
+    print(
+        f"periodic save of {max_entries} entries: inline write {blocking * 1000:.1f}ms, "
+        f"set() holds the event loop {held * 1000:.1f}ms (write runs in a thread)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock model latency per call.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.92)
+    args = parser.parse_args()
+
+    os.environ["PRODUCT_CACHE"] = "off"  # only the explicitly passed cache is used
+    rng = random.Random(7)
+    queries = [_variant(rng.choice(_BASE_QUERIES), rng) for _ in range(args.queries)]
+
+    product_search = load_agent_module("product-search")
+    print(f"mock latency={args.latency}s queries={len(queries)} distinct bases={len(_BASE_QUERIES)}")
+
+    client = MockChatClient(_answer, latency=args.latency)
+    uncached = product_search.ProductSearchAgent(chat_client=client)
+    print(summarize("no cache", await _replay(uncached, queries)), f"llm_calls={client.calls}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "product-cache.npz"
+        client = MockChatClient(_answer, latency=args.latency)
+        cache = SemanticCache(HashingEmbedder(), threshold=args.threshold, path=path)
+        cached = product_search.ProductSearchAgent(chat_client=client, semantic_cache=cache)
+        print(summarize("semantic cache", await _replay(cached, queries)), f"llm_calls={client.calls}")
+        print(f"{'':<28} {json.dumps({k: round(v, 3) for k, v in cache.snapshot().items()})}")
+
+        cache.save()
+        restored = SemanticCache(HashingEmbedder(), threshold=args.threshold, path=path)
+        print(f"persisted {path.stat().st_size / 1024:.1f} KiB, restored entries={len(restored.index)}")
+        await _periodic_save(Path(tmp) / "full-cache.npz")
+
+        # Fewer stores than save_every: only save_cache() persists them
+        path = Path(tmp) / "batch-cache.npz"
+        cache = SemanticCache(HashingEmbedder(), threshold=args.threshold, path=path)
+        agent = product_search.ProductSearchAgent(chat_client=MockChatClient(_answer, latency=0.0), semantic_cache=cache)
+        for query in _BASE_QUERIES[:5]:
+            await agent.search(query)
+        await agent.save_cache()
+        restored = SemanticCache(HashingEmbedder(), threshold=args.threshold, path=path)
+        assert len(restored.index) == 5, len(restored.index)
+        print("save_cache: stores below the periodic save threshold persisted")
+
+    embedder = HashingEmbedder()
+    for size in (1_000, 10_000, 50_000):
+        print(f"index lookup size={size:<6} dim={embedder.dimensions} {_index_lookup_ms(size, embedder.dimensions):.3f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Time-to-first-byte of ProductSearchAgent streaming versus the buffered path.
+
+The buffered baseline awaits ``run()`` and yields a single update (the
+previous ``run_stream`` behaviour). The streaming path consumes
+``get_streaming_response`` and emits one update per product field. Both run
+against a mock chat client that streams the same JSON answer over
+``--latency`` seconds.
+
+Usage::
+
+    python benchmarks/bench_product_search_stream.py [--latency 1.5] [--runs 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from _support import MockChatClient, load_agent_module, summarize
+
+# Every run sends the same query; measure the model, not the result cache
+os.environ["PRODUCT_CACHE"] = "off"
+
+_ANSWER = json.dumps(
+    {
+        "name": "Nordic Oak Dining Table",
+        "price": "349.00€",
+        "description": "Solid oak table for six with a natural oil finish and rounded edges.",
+    },
+    ensure_ascii=False,
+)
+
+
+async def _buffered(agent) -> tuple[float, float]:
+    start = time.perf_counter()
+    response = await agent.run("I need a table")
+    first = time.perf_counter() - start
+    assert response.messages
+    return first, first
+
+
+async def _streaming(agent, product_search) -> tuple[float, float]:
+    start = time.perf_counter()
+    first: float | None = None
+    text = ""
+    async for update in agent.run_stream("I need a table"):
+        if first is None:
+            first = time.perf_counter() - start
+        text += update.text
+    total = time.perf_counter() - start
+    # The concatenated stream must still be a valid structured output.
+    product_search.ProductSearchOutput.model_validate_json(text)
+    return first or total, total
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.5, help="Total generation time of the mock model.")
+    parser.add_argument("--first-token", type=float, default=0.15, help="Mock time to first token.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    product_search = load_agent_module("product-search")
+    client = MockChatClient(lambda _: _ANSWER, latency=args.latency, first_token_latency=args.first_token)
+    agent = product_search.ProductSearchAgent(chat_client=client)
+
+    results: dict[str, tuple[list[float], list[float]]] = {"buffered": ([], []), "streaming": ([], [])}
+    for _ in range(args.runs):
+        for mode, coro in (("buffered", _buffered(agent)), ("streaming", _streaming(agent, product_search))):
+            first, total = await coro
+            results[mode][0].append(first)
+            results[mode][1].append(total)
+
+    print(f"mock latency={args.latency}s first_token={args.first_token}s runs={args.runs}")
+    for mode, (ttfb, total) in results.items():
+        print(summarize(f"{mode} ttfb", ttfb))
+        print(summarize(f"{mode} total", total))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
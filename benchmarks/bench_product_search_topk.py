@@ -0,0 +1,250 @@
+"""Latency of k product results, one top-k call versus k separate searches.
+
+The top-k path streams one LLM call that returns up to ``--k`` products and
+emits each product as soon as it is validated. The baselines are the way the
+UI gets alternatives today: ``--k`` single-product searches, one after the
+other or all at once. The mock model takes ``--first-token`` seconds to start
+and then generates ``--chars-per-second`` characters, so a call returning k
+products takes longer than one returning a single product, but pays the
+first-token latency only once (and sends the prompt once). Concurrent
+single searches finish first against a mock without a rate limit, at k
+times the calls and input.
+
+Checks first: the streamed text is a valid ``ProductSearchPage``, products
+arrive one by one, the stream stops after k products, invalid and repeated
+products are dropped, the next pages (via ``next_cursor``) repeat no product
+even though the mock repeats one, ``{"query": ..., "top_k": k}`` messages
+select top-k mode, a ``{"query": ...}`` message without ``top_k`` searches
+its query, and bad cursors or ``top_k`` values get an error page.
+
+Usage::
+
+    python benchmarks/bench_product_search_topk.py [--k 5] [--runs 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from collections.abc import AsyncIterable
+from typing import Any
+
+from _support import load_agent_module, summarize
+
+# Distinct queries would miss the cache anyway; keep every search on the model
+os.environ["PRODUCT_CACHE"] = "off"
+
+_TOP_K_RE = re.compile(r"Return up to (\d+) products\.")
+_SEEN_RE = re.compile(r"Already seen: (.+)$", re.MULTILINE)
+
+_CATALOG = [
+    {
+        "name": f"Nordic Oak Dining Table {i}",
+        "price": f"{349 + 10 * i:.2f}€",
+        "description": "Solid oak table for six with a natural oil finish and rounded edges.",
+    }
+    for i in range(200)
+]
+
+
+class CatalogChatClient:
+    """Mock model answering from ``_CATALOG``; its time grows with the output length.
+
+    Top-k requests get ``k + 1`` products after the last seen one, starting
+    with a repeat of that one (models do repeat themselves). A product named
+    in ``invalid`` is sent without its price.
+    """
+
+    def __init__(self, *, first_token: float, chars_per_second: float, chunk_size: int = 8) -> None:
+        self.first_token = first_token
+        self.chars_per_second = chars_per_second
+        self.chunk_size = chunk_size
+        self.invalid: set[str] = set()
+        self.calls = 0
+        self.completed = 0
+        self.input_chars = 0
+        self.output_chars = 0
+        self.last_text = ""
+
+    def _reply(self, text: str) -> str:
+        self.last_text = text
+        match = _TOP_K_RE.search(text)
+        if match is None:
+            return json.dumps(_CATALOG[hash(text) % len(_CATALOG)], ensure_ascii=False)
+        seen = _SEEN_RE.search(text)
+        # Index of the last seen product ("... Table <i>")
+        start = int(seen[1].rsplit(" ", 1)[1]) if seen else 0
+        products = [
+            {k: v for k, v in product.items() if k != "price" or product["name"] not in self.invalid}
+            for product in _CATALOG[start : start + int(match[1]) + 1]
+        ]
+        return json.dumps({"products": products}, ensure_ascii=False)
+
+    async def get_response(self, messages: Any, **kwargs: Any) -> Any:
+        from agent_framework import ChatMessage, ChatResponse, Role
+
+        self.calls += 1
+        self.input_chars += sum(len(m.text or "") for m in messages)
+        text = self._reply(messages[-1].text)
+        await asyncio.sleep(self.first_token + len(text) / self.chars_per_second)
+        self.completed += 1
+        self.output_chars += len(text)
+        return ChatResponse(messages=[ChatMessage(role=Role.ASSISTANT, text=text)])
+
+    async def get_streaming_response(self, messages: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        from agent_framework import ChatResponseUpdate, Role
+
+        self.calls += 1
+        self.input_chars += sum(len(m.text or "") for m in messages)
+        text = self._reply(messages[-1].text)
+        await asyncio.sleep(self.first_token)
+        for i in range(0, len(text), self.chunk_size):
+            chunk = text[i : i + self.chunk_size]
+            await asyncio.sleep(len(chunk) / self.chars_per_second)
+            self.output_chars += len(chunk)
+            yield ChatResponseUpdate(role=Role.ASSISTANT, text=chunk)
+        self.completed += 1
+
+
+async def _top_k(agent: Any, product_search: Any, k: int, query: str) -> tuple[float, float, Any]:
+    start = time.perf_counter()
+    first: float | None = None
+    text = ""
+    async for update in agent.run_stream(query, top_k=k):
+        if first is None:
+            first = time.perf_counter() - start
+        text += update.text
+    total = time.perf_counter() - start
+    page = product_search.ProductSearchPage.model_validate_json(text)
+    assert len(page.products) == k, page
+    return first or total, total, page
+
+
+async def _sequential(agent: Any, k: int, query: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    for i in range(k):
+        await agent.search(f"{query} (alternative {i})")
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def _concurrent(agent: Any, k: int, query: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    firsts = []
+
+    async def one(i: int) -> None:
+        await agent.search(f"{query} (alternative {i})")
+        firsts.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(k)))
+    return min(firsts), time.perf_counter() - start
+
+
+async def _check(product_search: Any, args: argparse.Namespace) -> None:
+    client = CatalogChatClient(first_token=0.05, chars_per_second=args.chars_per_second)
+    agent = product_search.ProductSearchAgent(chat_client=client)
+    k = args.k
+
+    arrivals = []
+    start = time.perf_counter()
+    text = ""
+    async for update in agent.run_stream("I need a table", top_k=k):
+        arrivals.append(time.perf_counter() - start)
+        text += update.text
+    page = product_search.ProductSearchPage.model_validate_json(text)
+    assert [p.name for p in page.products] == [p["name"] for p in _CATALOG[:k]], page.products
+    assert len(arrivals) == k + 1 and arrivals[0] < arrivals[-1] * 0.6, arrivals
+    # The mock had a (k+1)-th product; the stream was closed after k
+    assert client.calls == 1 and client.completed == 0, (client.calls, client.completed)
+
+    names = [p.name for p in page.products]
+    cursor = page.next_cursor
+    client.invalid = {_CATALOG[k + 1]["name"]}
+    for _ in range(3):
+        response = await agent.run(json.dumps({"product_search": {"cursor": cursor}}))
+        next_page = product_search.ProductSearchPage.model_validate_json(response.messages[-1].text)
+        names += [p.name for p in next_page.products]
+        cursor = next_page.next_cursor
+    assert len(names) == len(set(names)), names
+    assert _CATALOG[k + 1]["name"] not in names and len(names) == 4 * k - 1, names
+
+    response = await agent.run(json.dumps({"product_search": {"query": "I need a lamp", "top_k": 2}}))
+    assert len(product_search.ProductSearchPage.model_validate_json(response.messages[-1].text).products) == 2
+    response = await agent.run("I need a lamp")
+    product_search.ProductSearchOutput.model_validate_json(response.messages[-1].text)
+    response = await agent.run(json.dumps({"product_search": {"query": "I need a vase"}}))
+    product_search.ProductSearchOutput.model_validate_json(response.messages[-1].text)
+    assert client.last_text == "I need a vase", client.last_text
+    # JSON outside the envelope is an ordinary query, not a paging request
+    plain = json.dumps({"query": "I need a rug", "top_k": 3})
+    response = await agent.run(plain)
+    product_search.ProductSearchOutput.model_validate_json(response.messages[-1].text)
+    assert client.last_text == plain, client.last_text
+    calls = client.calls
+    for request in (
+        {"cursor": "not-a-cursor"},
+        {"query": "I need a lamp", "top_k": "many"},
+        {"query": "I need a lamp", "top_k": True},
+        {"query": "I need a lamp", "top_k": 2.5},
+        {"query": 5},
+    ):
+        request = {"product_search": request}
+        response = await agent.run(json.dumps(request))
+        error_page = product_search.ProductSearchPage.model_validate_json(response.messages[-1].text)
+        assert error_page.error and not error_page.products, error_page
+        updates = [update async for update in agent.run_stream(json.dumps(request))]
+        assert product_search.ProductSearchPage.model_validate_json("".join(u.text for u in updates)).error
+    assert client.calls == calls, "rejected requests reached the model"
+    print("checks: streamed page, incremental products, early stop, dedup across pages, invalid products, requests, plain JSON ... ok")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token", type=float, default=0.4, help="Mock time to first token per call.")
+    parser.add_argument("--chars-per-second", type=float, default=1000.0, help="Mock generation speed.")
+    args = parser.parse_args()
+
+    product_search = load_agent_module("product-search")
+    await _check(product_search, args)
+
+    results: dict[str, tuple[list[float], list[float]]] = {}
+    calls: dict[str, int] = {}
+    chars: dict[str, tuple[int, int]] = {}
+    for mode in ("top-k stream", "k sequential", "k concurrent"):
+        client = CatalogChatClient(first_token=args.first_token, chars_per_second=args.chars_per_second)
+        agent = product_search.ProductSearchAgent(chat_client=client)
+        firsts, totals = results.setdefault(mode, ([], []))
+        for run in range(args.runs):
+            query = f"I need a table, run {run}"
+            if mode == "top-k stream":
+                first, total, _ = await _top_k(agent, product_search, args.k, query)
+            elif mode == "k sequential":
+                first, total = await _sequential(agent, args.k, query)
+            else:
+                first, total = await _concurrent(agent, args.k, query)
+            firsts.append(first)
+            totals.append(total)
+        calls[mode] = client.calls
+        chars[mode] = client.input_chars, client.output_chars
+
+    print(
+        f"k={args.k} runs={args.runs} first_token={args.first_token}s chars_per_second={args.chars_per_second:.0f}"
+    )
+    for mode, (firsts, totals) in results.items():
+        print(
+            f"{mode}: llm_calls/run={calls[mode] / args.runs:.1f} input_chars/run={chars[mode][0] / args.runs:.0f} "
+            f"output_chars/run={chars[mode][1] / args.runs:.0f}"
+        )
+        print(summarize(f"  {mode} first product", firsts))
+        print(summarize(f"  {mode} all {args.k}", totals))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""Tail latency and outage behaviour of LLM routing, plain vs resilient client.
+
+Starts the mock Azure OpenAI endpoint (``mock_openai.py``) with injected
+faults: ``--slow-rate`` of the completions stall for ``--slow-seconds`` and
+``--error-rate`` fail with HTTP 503. The orchestrator's LLM routing then runs
+against it through the plain ``AzureOpenAIChatClient`` (OpenAI SDK retries)
+and through ``ResilientChatClient`` (hedging, deadline-aware retries,
+circuit breaker), reporting latency percentiles, failed routings and
+requests sent to the endpoint.
+
+A second phase fails every request for ``--outage`` routings: the plain
+client keeps retrying, the resilient one trips its breaker and answers with
+the degraded ``none`` route immediately.
+
+Checks first that a half-open probe which is cancelled (a disconnected
+client, a discarded speculative search) does not leave the breaker stuck.
+
+Usage::
+
+    python benchmarks/bench_resilience.py [--requests 400] [--slow-rate 0.03] [--error-rate 0.02]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from _support import REPO_ROOT, load_agent_module, percentile, summarize
+from mock_openai import MockOpenAIServer
+
+
+async def _routing_phase(orchestrator, server, texts: list[str], concurrency: int) -> tuple[list[float], int, int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failed = 0
+    before = server.stats.requests + server.stats.failed
+
+    async def one(text: str) -> None:
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            goto = await orchestrator._route_with_llm(text)
+            latencies.append(time.perf_counter() - start)
+            failed += goto.error is not None
+
+    await asyncio.gather(*(one(text) for text in texts))
+    return latencies, failed, server.stats.requests + server.stats.failed - before
+
+
+class _StubClient:
+    """Fails, hangs or answers, depending on ``mode``."""
+
+    mode = "fail"
+
+    async def get_response(self, messages, **kwargs):
+        if self.mode == "fail":
+            raise ConnectionError("mock outage")
+        if self.mode == "hang":
+            await asyncio.sleep(3600)
+        return "ok"
+
+
+async def _check_cancelled_probe() -> None:
+    from common.resilience import CircuitBreaker, CircuitOpenError, ResilientChatClient
+
+    stub = _StubClient()
+    client = ResilientChatClient(
+        stub, hedge=False, max_attempts=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    )
+    try:
+        await client.get_response("hi")
+    except ConnectionError:
+        pass
+    assert client.breaker.state == "open", client.breaker.state
+    await asyncio.sleep(0.06)
+    stub.mode = "hang"
+    probe = asyncio.create_task(client.get_response("hi"))
+    await asyncio.sleep(0.01)
+    try:
+        await client.get_response("hi")
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("second call admitted while the probe is running")
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+    stub.mode = "ok"
+    assert await client.get_response("hi") == "ok" and client.breaker.state == "closed", client.breaker.state
+    print("checks: cancelled half-open probe releases the breaker ... ok")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token", type=float, default=0.15)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-seconds", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--outage", type=int, default=30, help="Routings during the full outage phase.")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        port=8091,
+        first_token=args.first_token,
+        tokens_per_second=400,
+        jitter=args.first_token / 5,
+        slow_rate=args.slow_rate,
+        slow_seconds=args.slow_seconds,
+        error_rate=args.error_rate,
+    )
+    server.start()
+    os.environ.update(
+        {
+            "AZURE_OPENAI_ENDPOINT": server.endpoint,
+            "AZURE_OPENAI_API_KEY": "mock",
+            "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "mock",
+            "SSL_CERT_FILE": str(server.certificate),
+            "AGENT_TELEMETRY": "off",
+            "ROUTER_CLASSIFIER": "off",
+            "ROUTER_CACHE": "off",
+            "CHAT_BREAKER_RESET_SECONDS": "2",
+        }
+    )
+    sys.path.append(str(REPO_ROOT / "src"))
+    from common.azure_clients import get_client_pool
+
+    await _check_cancelled_probe()
+
+    orchestrator_module = load_agent_module("order-orchestrator")
+    pool = get_client_pool()
+    texts = [f"show me a lamp, model {i}" for i in range(args.requests)]
+    print(
+        f"first_token={args.first_token * 1000:.0f}ms slow={args.slow_rate:.0%}x{args.slow_seconds:g}s "
+        f"errors={args.error_rate:.0%} requests={args.requests} concurrency={args.concurrency}"
+    )
+
+    clients = {"plain": pool.chat_client(resilient=False), "resilient": pool.chat_client(resilient=True)}
+    for label, client in clients.items():
+        orchestrator = orchestrator_module.OrderOrchestratorAgent(name="order-orchestrator", chat_client=client)
+        # Warm-up: connections and the resilient client's latency window
+        await _routing_phase(orchestrator, server, texts[:40], args.concurrency)
+        latencies, failed, sent = await _routing_phase(orchestrator, server, texts, args.concurrency)
+        print(
+            f"{summarize(label, latencies)} p99={percentile(latencies, 99) * 1000:8.2f}ms"
+            f"  failed={failed}  requests/routing={sent / len(texts):.3f}"
+        )
+
+        server.error_rate = 1.0
+        latencies, failed, sent = await _routing_phase(orchestrator, server, texts[: args.outage], 1)
+        outage_output = orchestrator.output_for(await orchestrator._route_with_llm("lamp"))
+        server.error_rate = args.error_rate
+        print(f"{summarize(label + ' outage', latencies)}  failed={failed}  requests sent={sent}")
+        print(f"  outage answer: {outage_output.human_readable[:60]!r} ({outage_output.goto.reason})")
+        if label == "resilient":
+            print(f"  stats: {client.snapshot()}")
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
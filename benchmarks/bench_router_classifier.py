@@ -0,0 +1,106 @@
+"""Routing latency and LLM agreement of the orchestrator's local classifier tier.
+
+Replays a corpus of logged ``GotoDecision`` records (JSONL, as written by the
+orchestrator when ``ROUTER_DECISION_LOG`` is set) through
+``OrderOrchestratorAgent.route`` in three configurations:
+
+* ``llm-only``     – local tier disabled, every message hits the (mock) LLM.
+* ``rules``        – keyword/regex rules in front of the LLM.
+* ``rules+model``  – rules plus a TF-IDF model trained on the other folds.
+
+The mock LLM answers with the logged decision after ``--llm-latency`` seconds,
+so agreement measures how often the local tier matches what the LLM decided.
+
+Usage::
+
+    python benchmarks/bench_router_classifier.py [--corpus FILE] [--llm-latency 0.6]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from _support import MockChatClient, load_agent_module, summarize
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "routing_replay.jsonl"
+
+
+def _load_corpus(path: Path) -> list[dict]:
+    with path.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+async def _replay(agent, corpus: list[dict]) -> tuple[list[float], int, int]:
+    latencies: list[float] = []
+    agree = local = 0
+    for record in corpus:
+        start = time.perf_counter()
+        goto = await agent.route(record["user_input"])
+        latencies.append(time.perf_counter() - start)
+        agree += goto.next_agent.value == record["next_agent"]
+        local += goto.confidence is not None
+    return latencies, agree, local
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--llm-latency", type=float, default=0.6)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    orchestrator = load_agent_module("order-orchestrator")
+    from intent_classifier import RuleClassifier, TfidfLinearClassifier, TieredClassifier
+
+    corpus = _load_corpus(args.corpus)
+    labels = {r["user_input"]: r["next_agent"] for r in corpus}
+
+    def reply(text: str) -> str:
+        return json.dumps({"next_agent": labels.get(text, "none"), "reason": "replayed", "input": text})
+
+    def make_agent(classifier) -> object:
+        return orchestrator.OrderOrchestratorAgent(
+            name="order-orchestrator",
+            chat_client=MockChatClient(reply, latency=args.llm_latency),
+            classifier=classifier,
+            use_classifier=classifier is not None,
+            classifier_threshold=args.threshold,
+        )
+
+    print(f"corpus={args.corpus.name} n={len(corpus)} llm_latency={args.llm_latency}s threshold={args.threshold}")
+
+    # Modes without a trained model replay the whole corpus at once.
+    for mode, classifier in (("llm-only", None), ("rules", RuleClassifier())):
+        agent = make_agent(classifier)
+        latencies, agree, local = await _replay(agent, corpus)
+        _report(mode, latencies, agree, local, len(corpus))
+
+    # The model is evaluated with k-fold cross-validation so that no message
+    # is classified by a model that was trained on it.
+    latencies, agree, local = [], 0, 0
+    for fold in range(args.folds):
+        test = corpus[fold :: args.folds]
+        train = [r for i, r in enumerate(corpus) if i % args.folds != fold]
+        model = TfidfLinearClassifier().fit(
+            [r["user_input"] for r in train], [r["next_agent"] for r in train]
+        )
+        agent = make_agent(TieredClassifier([RuleClassifier(), model]))
+        fold_latencies, fold_agree, fold_local = await _replay(agent, test)
+        latencies += fold_latencies
+        agree += fold_agree
+        local += fold_local
+    _report("rules+model", latencies, agree, local, len(corpus))
+
+
+def _report(mode: str, latencies: list[float], agree: int, local: int, total: int) -> None:
+    print(summarize(mode, latencies))
+    print(f"{'':<28} agreement={agree / total:6.1%} local_coverage={local / total:6.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""Upstream LLM calls under bursts of identical queries, with and without single-flight.
+
+First checks the coalescing guarantees against a mock model:
+
+* 50 concurrent copies of one product query (differing in case and
+  whitespace) and 50 of one routing message make one LLM call each;
+* cancelling the waiter that started the shared call leaves it running for
+  the others, and cancelling every waiter cancels the call;
+* an LLM error reaches every waiter and leaves nothing in flight.
+
+Then replays a promotion-style burst: ``--requests`` product searches
+arriving within ``--window`` seconds, ``--hot-share`` of them for a few hot
+queries. The semantic cache is disabled so that only coalescing is measured
+(the cache catches repeats once a call has finished, not concurrent ones).
+
+Usage::
+
+    python benchmarks/bench_single_flight.py [--requests 500] [--window 2] [--latency 1.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from _support import MockChatClient, load_agent_module, summarize
+
+os.environ["AGENT_TELEMETRY"] = "off"
+os.environ["ROUTER_CLASSIFIER"] = "off"
+os.environ["ROUTER_CACHE"] = "off"
+os.environ["PRODUCT_CACHE"] = "off"
+
+_HOT = ["black friday oled tv", "wireless earbuds deal", "air fryer xl", "gaming chair", "robot vacuum"]
+
+
+def _product_reply(text: str) -> str:
+    return json.dumps({"name": text.title()[:40], "price": "99.00€", "description": "On sale."})
+
+
+def _route_reply(text: str) -> str:
+    return json.dumps({"next_agent": "product-search", "reason": "Product query."})
+
+
+def _agent(product_module, *, latency: float, single_flight: bool, reply=_product_reply):
+    client = MockChatClient(reply, latency=latency)
+    agent = product_module.ProductSearchAgent(chat_client=client)
+    if not single_flight:
+        agent.single_flight = None
+    return agent, client
+
+
+async def _checks(product_module, orchestrator_module) -> None:
+    agent, client = _agent(product_module, latency=0.2, single_flight=True)
+    variants = ["Air Fryer XL", "air fryer xl", "  AIR   fryer xl "]
+    results = await asyncio.gather(*(agent.search(variants[i % 3]) for i in range(50)))
+    assert client.calls == 1, client.calls
+    assert len({r.model_dump_json() for r in results}) == 1
+    print(f"50 concurrent identical searches -> {client.calls} LLM call  {agent.single_flight.snapshot()}")
+
+    route_client = MockChatClient(_route_reply, latency=0.2)
+    orchestrator = orchestrator_module.OrderOrchestratorAgent(name="order-orchestrator", chat_client=route_client)
+    decisions = await asyncio.gather(*(orchestrator.route("show me lamps") for _ in range(50)))
+    assert route_client.calls == 1, route_client.calls
+    assert all(d.user_input == "show me lamps" for d in decisions)
+    print(f"50 concurrent identical routings -> {route_client.calls} LLM call")
+
+    agent, client = _agent(product_module, latency=0.2, single_flight=True)
+    leader = asyncio.ensure_future(agent.search("gaming chair"))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.ensure_future(agent.search("gaming chair")) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    leader.cancel()
+    results = await asyncio.gather(*followers)
+    assert leader.cancelled() and client.calls == 1 and len(results) == 3
+    print(f"leader cancelled -> followers served by the same call  {agent.single_flight.snapshot()}")
+
+    agent, client = _agent(product_module, latency=0.2, single_flight=True)
+    waiters = [asyncio.ensure_future(agent.search("air fryer xl")) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    running = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+    assert not running and len(agent.single_flight) == 0, running
+    assert agent.single_flight.stats.cancelled_calls == 1, agent.single_flight.stats
+    await agent.search("air fryer xl")
+    assert client.calls == 2, client.calls
+    print("all waiters cancelled -> shared call cancelled, the next request starts a new one")
+
+    def failing(text: str) -> str:
+        raise RuntimeError("upstream failure")
+
+    agent, client = _agent(product_module, latency=0.05, single_flight=True, reply=failing)
+    outcomes = await asyncio.gather(*(agent.search("robot vacuum") for _ in range(10)), return_exceptions=True)
+    assert client.calls == 1 and all(isinstance(o, RuntimeError) for o in outcomes) and len(agent.single_flight) == 0
+    print("upstream error -> delivered to all 10 waiters, nothing left in flight")
+
+
+async def _burst(agent, workload: list[tuple[float, str]]) -> list[float]:
+    start = time.perf_counter()
+    latencies: list[float] = []
+
+    async def one(at: float, text: str) -> None:
+        await asyncio.sleep(max(0.0, start + at - time.perf_counter()))
+        begin = time.perf_counter()
+        await agent.search(text)
+        latencies.append(time.perf_counter() - begin)
+
+    await asyncio.gather(*(one(at, text) for at, text in workload))
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--window", type=float, default=2.0, help="Seconds over which the burst arrives.")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock LLM latency.")
+    parser.add_argument("--hot-share", type=float, default=0.8)
+    args = parser.parse_args()
+
+    product_module = load_agent_module("product-search")
+    orchestrator_module = load_agent_module("order-orchestrator")
+    await _checks(product_module, orchestrator_module)
+
+    rng = random.Random(3)
+    workload = sorted(
+        (
+            rng.uniform(0, args.window),
+            rng.choice(_HOT) if rng.random() < args.hot_share else f"long tail product {rng.randrange(10_000)}",
+        )
+        for _ in range(args.requests)
+    )
+    print(
+        f"\nburst: {args.requests} searches in {args.window:g}s, "
+        f"hot share {args.hot_share:.0%}, latency {args.latency:g}s"
+    )
+    for single_flight in (False, True):
+        agent, client = _agent(product_module, latency=args.latency, single_flight=single_flight)
+        latencies = await _burst(agent, workload)
+        label = "single-flight on" if single_flight else "single-flight off"
+        ratio = agent.single_flight.stats.coalescing_ratio if single_flight else 0.0
+        print(f"{summarize(label, latencies)}  LLM calls={client.calls}  coalescing ratio={ratio:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
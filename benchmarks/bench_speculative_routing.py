@@ -0,0 +1,171 @@
+"""Latency of routing + product search, sequential vs speculative.
+
+Replays a workload where ``--product-share`` of the messages route to
+product-search and the rest to the order agent. The sequential baseline
+routes with the orchestrator and then calls the product search, like the
+hosted workflow does; the ``order-router`` agent starts the search while the
+router is still deciding and cancels it for other routes. The local
+classifier and both caches are disabled so that every message reaches the
+mock LLMs.
+
+Checks first: a speculative search that failed before another route was
+chosen counts as discarded and its error is retrieved, an unused search
+still running is cancelled together with its (single-flight) LLM call, and a
+caller that stops reading after the routing decision leaves no search
+running.
+
+Usage::
+
+    python benchmarks/bench_speculative_routing.py [--route 0.8] [--search 1.5] [--messages 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import time
+
+from _support import MockChatClient, load_agent_module, summarize
+
+_PRODUCT_QUERIES = [
+    "I need a dining table for six people, ideally oak",
+    "show me wireless headphones under 100 euro",
+    "looking for a standing desk",
+    "any waterproof hiking boots?",
+]
+_ORDER_QUERIES = [
+    "please cancel my order 4F2A",
+    "where is my order 77B1?",
+]
+
+
+def _route_reply(text: str) -> str:
+    agent = "order-agent" if "order" in text else "product-search"
+    return json.dumps({"next_agent": agent, "reason": "Benchmark routing decision.", "input": text})
+
+
+def _search_reply(text: str) -> str:
+    return json.dumps({"name": text.title()[:40], "price": "99.00€", "description": "A fine product."})
+
+
+async def _sequential(orchestrator, product_search, text: str, product_search_route: str) -> float:
+    start = time.perf_counter()
+    goto = await orchestrator.route(text)
+    if goto.next_agent == product_search_route:
+        await product_search.search(text)
+    return time.perf_counter() - start
+
+
+async def _speculative(router, text: str) -> float:
+    start = time.perf_counter()
+    await router.run(text)
+    return time.perf_counter() - start
+
+
+def _failing_reply(text: str) -> str:
+    raise ConnectionError("mock search outage")
+
+
+async def _check(router_module, orchestrator_module, product_module) -> None:
+    loop = asyncio.get_running_loop()
+    unhandled: list[dict] = []
+    loop.set_exception_handler(lambda _, context: unhandled.append(context))
+    orchestrator = orchestrator_module.OrderOrchestratorAgent(
+        name="order-orchestrator", chat_client=MockChatClient(_route_reply, latency=0.05)
+    )
+
+    failing = router_module.OrderRouterAgent(
+        orchestrator=orchestrator,
+        product_search=product_module.ProductSearchAgent(chat_client=MockChatClient(_failing_reply, latency=0.0)),
+    )
+    await failing.run(_ORDER_QUERIES[0])
+    assert failing.stats.discarded == 1 and failing.stats.cancelled == 0, failing.stats
+
+    # The search goes through single-flight; cancelling it must stop the LLM call too
+    slow_search = product_module.ProductSearchAgent(chat_client=MockChatClient(_search_reply, latency=5.0))
+    assert slow_search.single_flight is not None
+    slow = router_module.OrderRouterAgent(orchestrator=orchestrator, product_search=slow_search)
+    await slow.run(_ORDER_QUERIES[0])
+    assert slow.stats.cancelled == 1, slow.stats
+    await asyncio.sleep(0.05)
+    running = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+    assert not running, running
+
+    stream = slow.run_stream(_PRODUCT_QUERIES[0])
+    await stream.__anext__()  # the routing decision
+    await stream.aclose()
+    await asyncio.sleep(0.05)
+    running = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+    assert not running, running
+    assert slow_search.single_flight.stats.cancelled_calls == 2, slow_search.single_flight.stats
+
+    gc.collect()
+    await asyncio.sleep(0)
+    assert not unhandled, unhandled
+    loop.set_exception_handler(None)
+    print(
+        "checks: failed speculative search retrieved and discarded, unused search cancelled with its LLM call, "
+        "search cancelled when the caller stops ... ok"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--route", type=float, default=0.8, help="Mock routing LLM latency.")
+    parser.add_argument("--search", type=float, default=1.5, help="Mock product-search LLM latency.")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--product-share", type=float, default=0.7)
+    args = parser.parse_args()
+
+    os.environ["ROUTER_CLASSIFIER"] = "off"
+    os.environ["ROUTER_CACHE"] = "off"
+    os.environ["PRODUCT_CACHE"] = "off"
+    router_module = load_agent_module("order-router")
+    orchestrator_module = router_module.orchestrator_module
+    product_module = router_module.product_search_module
+    await _check(router_module, orchestrator_module, product_module)
+
+    rng = random.Random(7)
+    workload = [
+        rng.choice(_PRODUCT_QUERIES if rng.random() < args.product_share else _ORDER_QUERIES)
+        for _ in range(args.messages)
+    ]
+    share = sum(text in _PRODUCT_QUERIES for text in workload) / len(workload)
+    print(f"route={args.route}s search={args.search}s messages={len(workload)} product-search share={share:.0%}")
+
+    orchestrator = orchestrator_module.OrderOrchestratorAgent(
+        name="order-orchestrator", chat_client=MockChatClient(_route_reply, latency=args.route)
+    )
+    search_client = MockChatClient(_search_reply, latency=args.search)
+    product_search = product_module.ProductSearchAgent(chat_client=search_client)
+    sequential = [
+        await _sequential(orchestrator, product_search, text, router_module.PRODUCT_SEARCH) for text in workload
+    ]
+    sequential_calls = search_client.calls
+
+    speculative_client = MockChatClient(_search_reply, latency=args.search)
+    router = router_module.OrderRouterAgent(
+        orchestrator=orchestrator,
+        product_search=product_module.ProductSearchAgent(chat_client=speculative_client),
+    )
+    speculative = [await _speculative(router, text) for text in workload]
+
+    print(summarize("sequential", sequential))
+    print(summarize("speculative", speculative))
+    stats = router.snapshot()
+    print(
+        f"saved={stats['saved_seconds']:.2f}s ({stats['saved_seconds'] / len(workload) * 1000:.0f}ms/message) "
+        f"hit_rate={stats['hit_rate']:.0%} cancelled={stats['cancelled']} discarded={stats['discarded']}"
+    )
+    print(
+        f"search calls: sequential={sequential_calls} speculative={speculative_client.calls} "
+        f"wasted tokens (est.): prompt={stats['wasted_prompt_tokens']} completion={stats['wasted_completion_tokens']}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
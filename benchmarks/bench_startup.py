@@ -0,0 +1,141 @@
+"""Start-up time of the hosted agents: import time per module and time to readiness.
+
+For each agent, first imports ``agent.py`` in a fresh interpreter with
+``python -X importtime`` and reports the total and the heaviest modules it
+imports directly. Then launches the agent server against the local mock
+endpoint, as ``load_test.py`` does, once per ``AGENT_STARTUP`` mode. It
+reports the time until ``/liveness`` answers (the server listens), until
+``/readiness`` answers 200 (warm-up done) and the latency of the first
+request, plus the warm-up steps from the readiness body.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--agents order-orchestrator product-search order order-router] [--top 6]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from _support import AGENTS_DIR
+from load_test import MIXES, _conversation_id, _request, _start_agent
+from mock_openai import MockOpenAIServer
+
+_AGENTS = ["order-orchestrator", "product-search", "order", "order-router"]
+_ENV = {
+    "AZURE_OPENAI_ENDPOINT": "https://localhost:1",
+    "AZURE_OPENAI_API_KEY": "mock",
+    "AZURE_AI_MODEL_DEPLOYMENT_NAME": "mock",
+    "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "mock",
+    "OPENAI_API_VERSION": "2024-10-21",
+    "ORDER_LOG_PATH": "off",
+}
+
+
+def import_times(agent: str) -> tuple[float, list[tuple[str, float]]]:
+    """Total import time of ``agent.py`` and the cumulative time of its direct imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import agent"],
+        cwd=AGENTS_DIR / agent,
+        env={**os.environ, **_ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    children: list[tuple[str, float]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0:
+            if name.strip() == "agent":
+                return seconds, sorted(children, key=lambda child: child[1], reverse=True)
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), seconds))
+    raise RuntimeError(f"no import time for {agent}:\n{result.stderr[-2000:]}")
+
+
+async def time_to_ready(agent: str, mode: str, port: int, mock: MockOpenAIServer, workdir: Path) -> dict:
+    os.environ["AGENT_STARTUP"] = mode
+    started = time.perf_counter()
+    process = _start_agent(agent, port, mock, workdir)
+    base = f"http://127.0.0.1:{port}"
+    timings: dict = {}
+    try:
+        async with httpx.AsyncClient(timeout=60) as client:
+            while "ready" not in timings:
+                if process.poll() is not None:
+                    tail = (workdir / f"{agent}.log").read_text(errors="replace").splitlines()[-3:]
+                    raise RuntimeError(f"{agent} exited:\n  " + "\n  ".join(tail))
+                try:
+                    if "live" not in timings and (await client.get(f"{base}/liveness")).status_code == 200:
+                        timings["live"] = time.perf_counter() - started
+                    readiness = await client.get(f"{base}/readiness")
+                    if readiness.status_code == 200:
+                        timings["ready"] = time.perf_counter() - started
+                        timings["steps"] = readiness.json().get("steps", [])
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.02)
+            sample = await _request(client, f"{base}/responses", MIXES[agent][0][1][0], _conversation_id(), True)
+            timings["first_request"] = sample.latency
+            timings["first_ok"] = sample.ok
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", nargs="+", default=_AGENTS, choices=_AGENTS)
+    parser.add_argument("--modes", nargs="+", default=["background", "eager"])
+    parser.add_argument("--top", type=int, default=6, help="Direct imports listed per agent.")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--mock-port", type=int, default=8089)
+    args = parser.parse_args()
+
+    for agent in args.agents:
+        total, children = import_times(agent)
+        print(f"{agent}: import {total * 1000:7.1f}ms")
+        for name, seconds in children[: args.top]:
+            print(f"    {name:<40} {seconds * 1000:7.1f}ms")
+
+    mock = MockOpenAIServer(port=args.mock_port, first_token=0.05, tokens_per_second=2000, jitter=0.0)
+    mock.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for agent in args.agents:
+                for mode in args.modes:
+                    try:
+                        timings = await time_to_ready(agent, mode, args.port, mock, Path(workdir))
+                    except RuntimeError as e:
+                        print(f"{agent:<18} {mode:<10} skipped: {e}")
+                        break
+                    steps = ", ".join(f"{s['name']}={s['seconds'] * 1000:.0f}ms" for s in timings["steps"])
+                    print(
+                        f"{agent:<18} {mode:<10} live={timings['live']:5.2f}s ready={timings['ready']:5.2f}s "
+                        f"first request={timings['first_request'] * 1000:6.0f}ms"
+                        f"{'' if timings['first_ok'] else ' (failed)'}  [{steps}]"
+                    )
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""Wasted LLM calls from malformed JSON, with and without the repair attempt.
+
+The mock routing and product models answer with malformed output for
+``--malformed`` of the requests, split evenly between three failure kinds
+seen in practice: a markdown fence around the object (repaired locally),
+an unknown ``next_agent`` / missing product field, and a truncated object
+(both repaired by one LLM call). Reports usable answers, LLM calls per
+request and latency for ``STRUCTURED_OUTPUT_REPAIR`` off and on, plus the
+cost of the single validating parse against ``json.loads`` + model
+construction.
+
+Usage::
+
+    python benchmarks/bench_structured_output.py [--malformed 0.1] [--latency 0.05] [--requests 300]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from _support import REPO_ROOT, MockChatClient, load_agent_module, summarize
+
+os.environ["AGENT_TELEMETRY"] = "off"
+os.environ["ROUTER_CLASSIFIER"] = "off"
+os.environ["ROUTER_CACHE"] = "off"
+os.environ["PRODUCT_CACHE"] = "off"
+sys.path.append(str(REPO_ROOT / "src"))
+
+from common.structured_output import StructuredOutput  # noqa: E402
+
+_ROUTE = {"next_agent": "product-search", "reason": "The user is looking for a product."}
+_PRODUCT = {"name": "Oak Dining Table", "price": "499.00€", "description": "Solid oak, seats six."}
+
+
+def _malformed_replies(valid: dict, invalid: dict, rate: float, seed: int):
+    rng = random.Random(seed)
+    text = json.dumps(valid, ensure_ascii=False)
+
+    def reply(user_text: str) -> str:
+        if user_text.startswith("Errors:"):
+            return text  # the repair call
+        roll = rng.random()
+        if roll >= rate:
+            return text
+        kind = int(roll / rate * 3)
+        if kind == 0:
+            return f"```json\n{text}\n```"
+        if kind == 1:
+            return json.dumps(invalid, ensure_ascii=False)
+        return text[: len(text) // 2]
+
+    return reply
+
+
+async def _measure(label: str, agent_call, client: MockChatClient, requests: int) -> None:
+    latencies, usable = [], 0
+    for i in range(requests):
+        start = time.perf_counter()
+        usable += await agent_call(f"I need a dining table {i}")
+        latencies.append(time.perf_counter() - start)
+    print(f"{summarize(label, latencies)}  usable={usable / requests:.1%}  calls/request={client.calls / requests:.3f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--malformed", type=float, default=0.1, help="Share of malformed model outputs.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock LLM latency in seconds.")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    orchestrator_module = load_agent_module("order-orchestrator")
+    product_module = load_agent_module("product-search")
+    none = orchestrator_module.NextAgent.NONE
+
+    print(f"malformed={args.malformed:.0%} latency={args.latency * 1000:.0f}ms requests={args.requests}")
+    for repair in (False, True):
+        suffix = "repair on" if repair else "repair off"
+
+        route_client = MockChatClient(
+            _malformed_replies(_ROUTE, {**_ROUTE, "next_agent": "checkout"}, args.malformed, 1), latency=args.latency
+        )
+        orchestrator = orchestrator_module.OrderOrchestratorAgent(
+            name="order-orchestrator",
+            chat_client=route_client,
+            structured_output=StructuredOutput(
+                orchestrator_module.RoutingResponse, route_client, agent="order-orchestrator", repair=repair
+            ),
+        )
+
+        async def route(text: str) -> bool:
+            return (await orchestrator._route_with_llm(text)).next_agent != none
+
+        await _measure(f"route ({suffix})", route, route_client, args.requests)
+
+        search_client = MockChatClient(
+            _malformed_replies(_PRODUCT, {"name": _PRODUCT["name"]}, args.malformed, 2), latency=args.latency
+        )
+        product_search = product_module.ProductSearchAgent(
+            chat_client=search_client,
+            structured_output=StructuredOutput(
+                product_module.Product, search_client, agent="product-search", repair=repair
+            ),
+        )
+
+        async def search(text: str) -> bool:
+            try:
+                await product_search.search(text)
+            except ValueError:
+                return False
+            return True
+
+        await _measure(f"search ({suffix})", search, search_client, args.requests)
+        print(f"  routing stats: {orchestrator.structured_output.snapshot()}")
+
+    raw = json.dumps(_PRODUCT, ensure_ascii=False)
+    rounds = 100_000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        product_module.Product(**json.loads(raw))
+    loads = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        product_module.Product.model_validate_json(raw)
+    validate = (time.perf_counter() - start) / rounds
+    print(f"parse: json.loads + Product(**)={loads * 1e6:.2f}µs  model_validate_json={validate * 1e6:.2f}µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Overhead of the OpenTelemetry instrumentation per request.
+
+Runs the orchestrator (LLM routing, non-streaming and streaming) and the
+product search against zero-latency mock LLMs, once with telemetry disabled
+and once recording into an in-memory span exporter and metric reader, and
+reports the added time per request and what was recorded. The local
+classifier and the caches are disabled so that every message reaches the
+instrumented LLM path.
+
+Usage::
+
+    python benchmarks/bench_telemetry.py [--requests 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from _support import REPO_ROOT, MockChatClient, load_agent_module
+
+os.environ["AGENT_TELEMETRY"] = "off"
+os.environ["ROUTER_CLASSIFIER"] = "off"
+os.environ["ROUTER_CACHE"] = "off"
+os.environ["PRODUCT_CACHE"] = "off"
+sys.path.append(str(REPO_ROOT / "src"))
+
+from common.telemetry import Telemetry  # noqa: E402
+
+
+def _route_reply(text: str) -> str:
+    return json.dumps({"next_agent": "product-search", "reason": "Benchmark routing.", "input": text})
+
+
+def _search_reply(text: str) -> str:
+    return json.dumps({"name": "Oak Table", "price": "499.00€", "description": "Seats six."})
+
+
+async def _time(requests: int, call) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        await call(f"dining table number {i}")
+    return (time.perf_counter() - start) / requests
+
+
+async def _drain(stream) -> None:
+    async for _ in stream:
+        pass
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    orchestrator_module = load_agent_module("order-orchestrator")
+    product_module = load_agent_module("product-search")
+
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    reader = InMemoryMetricReader()
+    variants = {
+        "off": Telemetry(enabled=False),
+        "on": Telemetry(tracer_provider=tracer_provider, meter_provider=MeterProvider(metric_readers=[reader])),
+    }
+
+    results: dict[str, dict[str, float]] = {}
+    for label, telemetry in variants.items():
+        orchestrator = orchestrator_module.OrderOrchestratorAgent(
+            name="order-orchestrator", chat_client=MockChatClient(_route_reply, latency=0.0), telemetry=telemetry
+        )
+        product_search = product_module.ProductSearchAgent(
+            chat_client=MockChatClient(_search_reply, latency=0.0), telemetry=telemetry
+        )
+        paths = {
+            "route": orchestrator.run,
+            "route (stream)": lambda text: _drain(orchestrator.run_stream(text)),
+            "search": product_search.search,
+        }
+        for name, call in paths.items():
+            await _time(50, call)  # warm-up
+            results.setdefault(name, {})[label] = await _time(args.requests, call)
+
+    print(f"requests per path: {args.requests}")
+    for name, timings in results.items():
+        added = (timings["on"] - timings["off"]) * 1e6
+        print(f"{name:<15} off={timings['off'] * 1e6:7.1f}µs  on={timings['on'] * 1e6:7.1f}µs  added={added:6.1f}µs")
+
+    spans = Counter(span.name for span in exporter.get_finished_spans())
+    print("spans:", ", ".join(f"{name}={count}" for name, count in sorted(spans.items())))
+    metrics = reader.get_metrics_data()
+    points = {
+        metric.name: sum(getattr(point, "count", None) or getattr(point, "value", 0) for point in metric.data.data_points)
+        for resource in metrics.resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    print("metrics:", ", ".join(f"{name}={count}" for name, count in sorted(points.items())))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,281 @@
+"""Memory of conversation state at 10k concurrent threads, in process vs the thread store.
+
+Checks first that the store bounds its state: LRU eviction of decoded
+threads, compaction to ``max_messages``, pruning of idle threads, resuming
+threads and graph checkpoints after a restart, consistent threads when two
+processes share the file (``AGENT_WORKERS``) and keeping only the newest
+checkpoints.
+
+Then runs each variant in a fresh interpreter and reports the growth of its
+anonymous resident memory (RSS without the mapped database file), the time
+per turn and, for the store, the size of the database and the time to
+reload an evicted thread:
+
+* ``messages``: ``--threads`` agent threads get ``--turns`` turns each (a
+  user message and a product-search answer), kept by ``agent_framework``'s
+  in-memory ``ChatMessageStore`` or by ``ThreadStore`` (``:memory:`` and a
+  file, ``--cached-threads`` decoded threads);
+* ``checkpoints``: the async order graph (mock model, one inventory check
+  per turn) runs ``--graph-turns`` turns on each of ``--threads``
+  conversations with LangGraph's ``InMemorySaver`` or ``StoreCheckpointer``.
+
+Usage::
+
+    python benchmarks/bench_thread_store.py [--threads 10000] [--turns 4] [--graph-turns 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _support import REPO_ROOT, load_agent_module, percentile
+
+sys.path.append(str(REPO_ROOT / "src"))
+
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost.invalid")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+os.environ.setdefault("ORDER_LOG_PATH", "off")
+
+from agent_framework import AgentThread, ChatMessage, ChatMessageStore, Role  # noqa: E402
+
+from common.thread_store import ThreadStore  # noqa: E402
+
+_VARIANTS = {
+    "messages": ["in-memory", "store :memory:", "store file"],
+    "checkpoints": ["in-memory", "store file"],
+}
+_ANSWER = json.dumps(
+    {
+        "product": {
+            "name": "Solid Oak Dining Table {i}",
+            "price": "849.00€",
+            "description": "Six-seat dining table in solid oak with a natural oil finish.",
+        },
+        "human_readable": "Found: **Solid Oak Dining Table {i}** at 849.00€. Six-seat dining table in solid oak.",
+    }
+)
+
+
+def _rss_mb() -> float:
+    """Anonymous resident memory; file-backed pages (the mmap'd database) are excluded.
+
+    Falls back to the peak RSS where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _turn(thread: int, turn: int) -> list[ChatMessage]:
+    return [
+        ChatMessage(role=Role.USER, text=f"Do you have an oak dining table for six, variant {thread}-{turn}?"),
+        ChatMessage(role=Role.ASSISTANT, text=_ANSWER.replace("{i}", f"{thread}-{turn}")),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+
+async def _check(workdir: Path) -> None:
+    store = ThreadStore(max_cached_threads=2, max_messages=4)
+    for i in range(3):
+        store.append(f"t{i}", _turn(i, 0))
+    assert store.snapshot()["cached_threads"] == 2 and store.stats.evictions == 1, store.snapshot()
+    for turn in range(1, 4):
+        store.append("t0", _turn(0, turn))
+    assert [m.text for m in store.load("t0")] == [m.text for m in _turn(0, 2) + _turn(0, 3)]
+    assert store.stats.messages_compacted == 4, store.stats
+    misses = store.stats.cache_misses
+    store._cache.clear()
+    assert len(store.load("t0")) == 4 and store.stats.cache_misses == misses + 1
+
+    store.append("idle", _turn(9, 0))
+    assert store.prune(time.time() + store.idle_seconds + 1) == 4 and store.thread_count() == 0
+
+    # Threads and graph state survive a restart
+    path = workdir / "check.db"
+    store = ThreadStore(path)
+    thread = AgentThread(message_store=store.message_store())
+    await thread.on_new_messages(_turn(0, 0))
+    thread_id = thread.message_store.thread_id
+    store.close()
+    resumed = ThreadStore(path).message_store(thread_id)
+    assert [m.text for m in await resumed.list_messages()] == [m.text for m in _turn(0, 0)]
+
+    # Two workers on one file: cached threads pick up each other's turns
+    first, second = ThreadStore(path), ThreadStore(path)
+    first.load(thread_id)
+    second.append(thread_id, _turn(0, 1))
+    assert [m.text for m in first.load(thread_id)] == [m.text for m in _turn(0, 0) + _turn(0, 1)]
+    first.append(thread_id, _turn(0, 2))
+    assert len(second.load(thread_id)) == 6 and len(first.load(thread_id)) == 6
+    first.close()
+    second.close()
+
+    order, checkpointer_for = _order_graph_factory()
+    store = ThreadStore(path)
+    graph = order.build_async_agent(model=_mock_model(), checkpointer=checkpointer_for(store))
+    config = {"configurable": {"thread_id": "conv"}}
+    for turn in range(3):
+        await graph.ainvoke({"messages": [("user", f"Do you have oak table {turn}")]}, config)
+    store.close()
+    store = ThreadStore(path)
+    checkpointer = checkpointer_for(store)
+    state = await order.build_async_agent(model=_mock_model(), checkpointer=checkpointer).ainvoke(
+        {"messages": [("user", "Do you have oak table 3")]}, config
+    )
+    assert len(state["messages"]) == 16, len(state["messages"])
+    assert len(list(checkpointer.list(config))) == checkpointer.keep
+    store.close()
+    print(
+        "checks: LRU eviction, compaction, idle pruning, restart (threads and checkpoints), "
+        "shared file, checkpoint pruning ... ok"
+    )
+
+
+def _mock_model():
+    from bench_order_context import SizeSensitiveModel
+
+    return SizeSensitiveModel(base=0.0, per_1k=0.0)
+
+
+def _order_graph_factory():
+    from common.checkpoints import StoreCheckpointer
+
+    return load_agent_module("order"), StoreCheckpointer
+
+
+# ---------------------------------------------------------------------------
+# Variants (each in its own interpreter)
+# ---------------------------------------------------------------------------
+
+
+async def _messages(variant: str, args: argparse.Namespace, workdir: Path) -> dict:
+    store = None
+    if variant != "in-memory":
+        path = ":memory:" if variant == "store :memory:" else workdir / "threads.db"
+        store = ThreadStore(path, max_cached_threads=args.cached_threads, max_messages=0)
+
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    threads = [
+        AgentThread(message_store=store.message_store() if store else ChatMessageStore()) for _ in range(args.threads)
+    ]
+    for turn in range(args.turns):
+        for i, thread in enumerate(threads):
+            await thread.on_new_messages(_turn(i, turn))
+    elapsed = time.perf_counter() - started
+    result = {"rss_mb": _rss_mb() - baseline, "turn_us": elapsed / (args.threads * args.turns) * 1e6}
+
+    if store is not None:
+        # The first threads were evicted long ago
+        reloads = []
+        for thread in threads[: min(200, args.threads - args.cached_threads)]:
+            start = time.perf_counter()
+            await thread.message_store.list_messages()
+            reloads.append(time.perf_counter() - start)
+        result["reload_p50_us"] = percentile(reloads, 50) * 1e6 if reloads else 0.0
+        if store.path != ":memory:":
+            result["db_mb"] = sum(p.stat().st_size for p in workdir.glob("threads.db*")) / 2**20
+        result["cached_threads"] = store.snapshot()["cached_threads"]
+    return result
+
+
+async def _checkpoints(variant: str, args: argparse.Namespace, workdir: Path) -> dict:
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    order, checkpointer_for = _order_graph_factory()
+    store = ThreadStore(workdir / "checkpoints.db") if variant != "in-memory" else None
+    graph = order.build_async_agent(
+        model=_mock_model(), checkpointer=checkpointer_for(store) if store else InMemorySaver()
+    )
+
+    async def conversation(i: int, turn: int) -> None:
+        config = {"configurable": {"thread_id": f"conv-{i}"}}
+        await graph.ainvoke({"messages": [("user", f"Do you have oak table {i}-{turn}")]}, config)
+
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    for turn in range(args.graph_turns):
+        for batch in range(0, args.threads, 100):
+            await asyncio.gather(*(conversation(i, turn) for i in range(batch, min(batch + 100, args.threads))))
+    elapsed = time.perf_counter() - started
+    result = {"rss_mb": _rss_mb() - baseline, "turn_us": elapsed / (args.threads * args.graph_turns) * 1e6}
+    if store is not None:
+        result["db_mb"] = sum(p.stat().st_size for p in workdir.glob("checkpoints.db*")) / 2**20
+    return result
+
+
+def _child(kind: str, variant: str, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        run = _messages if kind == "messages" else _checkpoints
+        print(json.dumps(asyncio.run(run(variant, args, Path(workdir)))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--graph-turns", type=int, default=1)
+    parser.add_argument("--cached-threads", type=int, default=1024)
+    parser.add_argument("--child", nargs=2, metavar=("KIND", "VARIANT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child, args)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        asyncio.run(_check(Path(workdir)))
+
+    options = [
+        f"--threads={args.threads}",
+        f"--turns={args.turns}",
+        f"--graph-turns={args.graph_turns}",
+        f"--cached-threads={args.cached_threads}",
+    ]
+    for kind, variants in _VARIANTS.items():
+        turns = args.turns if kind == "messages" else args.graph_turns
+        print(f"{kind}: {args.threads} threads x {turns} turns")
+        for variant in variants:
+            output = subprocess.run(
+                [sys.executable, __file__, *options, "--child", kind, variant],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=Path(__file__).parent,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            extra = "".join(
+                f" {label}={result[key]:.{digits}f}"
+                for key, label, digits in (
+                    ("db_mb", "db_mb", 1),
+                    ("reload_p50_us", "evicted_reload_p50_us", 0),
+                    ("cached_threads", "cached_threads", 0),
+                )
+                if key in result
+            )
+            print(f"  {variant:<16} anon_rss=+{result['rss_mb']:7.1f}MB turn={result['turn_us']:8.1f}us{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Throughput of the hosted agents per worker process count (``AGENT_WORKERS``).
+
+Runs the mock Azure OpenAI endpoint (``mock_openai.py``) in its own process
+and, for each agent and ``--workers`` count, launches the agent server as
+``load_test.py`` does with ``AGENT_WORKERS`` set. Once every worker answers
+``/readiness`` (probed over fresh connections), ``--concurrency`` closed-loop
+clients run the agent's conversation mix for ``--duration`` seconds. It
+reports request throughput, the speedup over one worker, latency p50/p95 and
+the resident memory of the server (parent plus workers).
+
+Scaling needs as many free cores as workers, plus the load generator and the
+mock; the host's CPU count is printed first. The mock answers fast by
+default (``--first-token 0.02``, ``--tokens-per-second 2000``) so the agents'
+own CPU work, not the model latency, bounds throughput.
+
+Checks for the multi-process runs: no failed requests, a worker killed with
+SIGKILL is replaced and serves again, and SIGTERM stops the server with exit
+code 0 within ``AGENT_WORKER_SHUTDOWN_SECONDS``.
+
+Usage::
+
+    python benchmarks/bench_workers.py [--agents order-orchestrator product-search] [--workers 1 2 4]
+        [--concurrency 32] [--duration 15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import psutil
+
+from _support import percentile
+from load_test import MIXES, MemorySampler, _closed_loop, _conversation, _start_agent
+
+_SHUTDOWN_SECONDS = 10
+
+
+def _start_mock(args: argparse.Namespace) -> tuple[subprocess.Popen, SimpleNamespace]:
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "mock_openai.py",
+            f"--port={args.mock_port}",
+            f"--first-token={args.first_token}",
+            f"--tokens-per-second={args.tokens_per_second}",
+        ],
+        cwd=Path(__file__).parent,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # endpoint=https://... SSL_CERT_FILE=...
+    fields = dict(item.split("=", 1) for item in process.stdout.readline().split())
+    return process, SimpleNamespace(endpoint=fields["endpoint"], certificate=fields["SSL_CERT_FILE"])
+
+
+async def _wait_all_ready(base: str, process: subprocess.Popen, workers: int, timeout: float) -> float:
+    """Seconds until ``/readiness`` answers 200 on ``3 * workers`` fresh connections in a row."""
+    start = time.perf_counter()
+    streak = 0
+    while streak < 3 * workers:
+        if process.poll() is not None:
+            raise RuntimeError(f"agent exited with code {process.returncode}")
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f"agent not ready after {timeout}s")
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                ok = (await client.get(f"{base}/readiness")).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if not ok:
+            await asyncio.sleep(0.1)
+    return time.perf_counter() - start
+
+
+def _workers_of(process: subprocess.Popen) -> list[psutil.Process]:
+    return psutil.Process(process.pid).children()
+
+
+async def _check_restart(base: str, process: subprocess.Popen, workers: int, timeout: float) -> None:
+    victim = _workers_of(process)[0]
+    victim.kill()
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        children = _workers_of(process)
+        if len(children) == workers and victim.pid not in {c.pid for c in children}:
+            break
+        await asyncio.sleep(0.1)
+    else:
+        raise AssertionError(f"worker {victim.pid} was not replaced")
+    await _wait_all_ready(base, process, workers, timeout)
+
+
+def _check_shutdown(process: subprocess.Popen) -> float:
+    start = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    code = process.wait(timeout=_SHUTDOWN_SECONDS + 5)
+    assert code == 0, f"server exited with code {code} on SIGTERM"
+    return time.perf_counter() - start
+
+
+async def _run(agent: str, workers: int, args: argparse.Namespace, mock: SimpleNamespace, workdir: Path) -> dict:
+    os.environ["AGENT_WORKERS"] = str(workers)
+    os.environ["AGENT_WORKER_SHUTDOWN_SECONDS"] = str(_SHUTDOWN_SECONDS)
+    base = f"http://127.0.0.1:{args.port}"
+    url = f"{base}/responses"
+    process = _start_agent(agent, args.port, mock, workdir)
+    try:
+        try:
+            ready = await _wait_all_ready(base, process, workers, args.startup_timeout)
+        except RuntimeError as e:
+            tail = (workdir / f"{agent}.log").read_text(errors="replace").splitlines()[-15:]
+            raise RuntimeError(f"{e}; last log lines:\n  " + "\n  ".join(tail)) from None
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            # Warm every worker: each client connection sticks to one worker
+            await asyncio.gather(*(_conversation(client, url, MIXES[agent][0][1], True, []) for _ in range(workers * 4)))
+            memory = MemorySampler(process.pid)
+            with memory:
+                start = time.perf_counter()
+                samples = await _closed_loop(
+                    client, url, MIXES[agent], args.concurrency, args.duration, True, random.Random(args.seed)
+                )
+                elapsed = time.perf_counter() - start
+        result = {
+            "ready": ready,
+            "requests": len(samples),
+            "errors": sum(not s.ok for s in samples),
+            "throughput": len(samples) / elapsed,
+            "p50_ms": percentile([s.latency for s in samples], 50) * 1000,
+            "p95_ms": percentile([s.latency for s in samples], 95) * 1000,
+            "rss_mb": memory.peak / 2**20,
+        }
+        if workers > 1:
+            assert result["errors"] == 0, f"{result['errors']} failed requests with {workers} workers"
+            assert len(_workers_of(process)) == workers, _workers_of(process)
+            await _check_restart(base, process, workers, args.startup_timeout)
+            result["shutdown_s"] = _check_shutdown(process)
+        return result
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=_SHUTDOWN_SECONDS + 5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # The order agent always serves from one process (its stock and order log)
+    agents = [agent for agent in MIXES if agent != "order"]
+    parser.add_argument("--agents", nargs="+", default=["order-orchestrator", "product-search"], choices=agents)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per worker count.")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--mock-port", type=int, default=8089)
+    parser.add_argument("--first-token", type=float, default=0.02)
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=90.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"cpus={cpus} concurrency={args.concurrency} duration={args.duration}s first_token={args.first_token}s")
+    if cpus and max(args.workers) >= cpus:
+        print(f"note: {max(args.workers)} workers on {cpus} CPUs (shared with the load generator and the mock)")
+
+    mock_process, mock = _start_mock(args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-workers-") as tmp:
+            for agent in args.agents:
+                print(f"{agent}:")
+                baseline = None
+                for workers in args.workers:
+                    result = await _run(agent, workers, args, mock, Path(tmp))
+                    baseline = baseline or result["throughput"]
+                    shutdown = f" shutdown={result['shutdown_s']:.1f}s" if "shutdown_s" in result else ""
+                    print(
+                        f"  workers={workers:<2} {result['throughput']:7.1f} req/s "
+                        f"x{result['throughput'] / baseline:4.2f}  p50/p95={result['p50_ms']:.0f}/"
+                        f"{result['p95_ms']:.0f}ms  err={result['errors']}  rss={result['rss_mb']:.0f}MB "
+                        f"ready={result['ready']:.1f}s{shutdown}"
+                    )
+    finally:
+        mock_process.terminate()
+        mock_process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""End-to-end latency of a workflow YAML run in-process with mock agents.
+
+Runs ``src/workflows/sample.yaml`` (orchestrator, then product search when
+routed there) through the local workflow runner. The chat clients are mocks
+with fixed latencies, so the breakdown shows where the time goes per action
+and how much the runner itself adds (expression evaluation, variable
+binding) on top of the agent calls. The local classifier and the caches are
+disabled so that every message reaches the mock LLMs.
+
+Usage::
+
+    python benchmarks/bench_workflow.py [--route 0.3] [--search 0.6] [--runs 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from _support import REPO_ROOT, MockChatClient, load_agent_module, summarize
+
+sys.path.insert(0, str(REPO_ROOT / "src" / "workflows"))
+
+from local_runner import AgentRegistry, Expression, WorkflowRunner  # noqa: E402
+
+_MESSAGES = {
+    "product-search": "I need a dining table for six people, ideally oak",
+    "order-agent": "please cancel my order 4F2A",
+}
+
+
+def _route_reply(text: str) -> str:
+    agent = "order-agent" if "order" in text else "product-search"
+    return json.dumps({"next_agent": agent, "reason": "Benchmark routing decision.", "input": text})
+
+
+def _search_reply(text: str) -> str:
+    return json.dumps({"name": "Oak Dining Table", "price": "499.00€", "description": "Seats six."})
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--route", type=float, default=0.3, help="Mock routing LLM latency.")
+    parser.add_argument("--search", type=float, default=0.6, help="Mock product-search LLM latency.")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["ROUTER_CLASSIFIER"] = "off"
+    os.environ["ROUTER_CACHE"] = "off"
+    os.environ["PRODUCT_CACHE"] = "off"
+    orchestrator = load_agent_module("order-orchestrator")
+    product_search = load_agent_module("product-search")
+    registry = AgentRegistry(
+        {
+            "order-orchestrator": orchestrator.OrderOrchestratorAgent(
+                name="order-orchestrator", chat_client=MockChatClient(_route_reply, latency=args.route)
+            ),
+            "product-search": product_search.ProductSearchAgent(
+                chat_client=MockChatClient(_search_reply, latency=args.search)
+            ),
+        }
+    )
+    runner = WorkflowRunner.from_file(REPO_ROOT / "src" / "workflows" / "sample.yaml", registry)
+    print(f"route={args.route}s search={args.search}s runs={args.runs}")
+
+    for route, message in _MESSAGES.items():
+        totals: list[float] = []
+        overhead: list[float] = []
+        for _ in range(args.runs):
+            run = await runner.run(message)
+            totals.append(run.seconds)
+            overhead.append(run.seconds - run.agent_seconds)
+        print(f"route={route} replies={len(run.messages)}")
+        print(run.format_timings())
+        print(summarize("  end-to-end", totals))
+        print(f"  runner overhead (outside agent calls): mean={sum(overhead) / len(overhead) * 1e6:.0f}us")
+
+    condition = '=If(Text(Local.GotoJson.goto.next_agent) = "product-search", true, false)'
+    expression = Expression(condition[1:])
+    scopes = {"System": {}, "Local": {"GotoJson": {"goto": {"next_agent": "product-search"}}}}
+    start = time.perf_counter()
+    for _ in range(10000):
+        expression.evaluate(scopes)
+    print(f"condition evaluation: {(time.perf_counter() - start) / 10000 * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,354 @@
+"""Load test of the hosted agents against a local mock Azure OpenAI endpoint.
+
+Starts ``benchmarks/mock_openai.py`` in-process, then, one agent at a time,
+launches ``src/agents/<agent>/agent.py`` exactly as its container does (the
+``from_agent_framework`` / ``from_langgraph`` server on ``--port``, 8088 by
+default) with ``AZURE_OPENAI_ENDPOINT`` pointing at the mock. Each agent is
+driven over HTTP (``POST /responses``) with a weighted mix of multi-turn
+conversations, in two modes:
+
+* closed loop: ``--concurrency`` workers, each running conversations back to
+  back;
+* open loop: conversations start at ``--rate`` per second (Poisson arrivals)
+  regardless of how fast earlier ones finish, so queueing shows up in the
+  latency instead of silently lowering the offered load.
+
+Per agent and load level it reports request throughput, errors, latency
+p50/p95/p99, time to first byte (first streamed text delta) and the agent
+process's resident memory (at start and peak). ``--json`` writes the same
+numbers to a file for comparison between runs.
+
+The routing and product caches are disabled (the mixes repeat messages);
+the local routing classifier stays on. The agents load the root ``.env``
+with ``override=True``, so move it aside while load testing.
+
+Usage::
+
+    python benchmarks/load_test.py [--agents order-orchestrator product-search order]
+        [--concurrency 1 8 32] [--rate 5 20] [--duration 20]
+        [--first-token 0.2] [--tokens-per-second 80] [--no-stream] [--json results.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import httpx
+import psutil
+
+from _support import AGENTS_DIR, REPO_ROOT, percentile
+from mock_openai import MockOpenAIServer
+
+# (weight, turns) per agent; each conversation's turns share a conversation ID
+MIXES: dict[str, list[tuple[float, list[str]]]] = {
+    "order-orchestrator": [
+        (0.5, ["I need a dining table for six people, ideally oak"]),
+        (0.2, ["show me wireless headphones", "something cheaper, under 50 euro"]),
+        (0.2, ["where is my order 4F2A?", "please cancel it"]),
+        (0.1, ["hello"]),
+    ],
+    "product-search": [
+        (0.6, ["oak dining table for six"]),
+        (0.3, ["waterproof hiking boots", "in size 44"]),
+        (0.1, ["a gift for a coffee lover"]),
+    ],
+    "order": [
+        (0.5, ["do you have the oak dining table?", "great, order two of them"]),
+        (0.3, ["is the walnut bookshelf in stock?"]),
+        (0.2, ["I want to buy 3 desk lamps", "yes please place the order"]),
+    ],
+}
+
+
+@dataclass
+class RequestSample:
+    latency: float
+    ttfb: float | None
+    ok: bool
+
+
+@dataclass
+class LoadResult:
+    """Summary of one agent at one load level."""
+
+    agent: str
+    mode: str
+    level: float
+    requests: int
+    errors: int
+    throughput: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_p99_ms: float
+    ttfb_p50_ms: float | None
+    ttfb_p95_ms: float | None
+    rss_start_mb: float
+    rss_peak_mb: float
+    mock_calls: int = 0
+    extra: dict = field(default_factory=dict)
+
+
+def _conversation_id() -> str:
+    # Hosted conversation IDs are "conv_" + alphanumerics (partition key + entropy)
+    return "conv_" + uuid.uuid4().hex + uuid.uuid4().hex[:18]
+
+
+def _pick(mix: list[tuple[float, list[str]]], rng: random.Random) -> list[str]:
+    return rng.choices([turns for _, turns in mix], weights=[weight for weight, _ in mix])[0]
+
+
+async def _request(client: httpx.AsyncClient, url: str, text: str, conversation_id: str, stream: bool) -> RequestSample:
+    payload = {"input": text, "stream": stream, "conversation": {"id": conversation_id}}
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        if not stream:
+            response = await client.post(url, json=payload)
+            ok = response.status_code == 200 and "error" not in response.json()
+        else:
+            ok = True
+            async with client.stream("POST", url, json=payload) as response:
+                ok = response.status_code == 200
+                async for line in response.aiter_lines():
+                    if ttfb is None and line.startswith("data:") and "delta" in line:
+                        ttfb = time.perf_counter() - start
+                    if line.startswith("event: error"):
+                        ok = False
+    except httpx.HTTPError:
+        ok = False
+    return RequestSample(time.perf_counter() - start, ttfb, ok)
+
+
+async def _conversation(client, url, turns, stream, samples: list[RequestSample]) -> None:
+    conversation_id = _conversation_id()
+    for text in turns:
+        samples.append(await _request(client, url, text, conversation_id, stream))
+
+
+async def _closed_loop(client, url, mix, concurrency, duration, stream, rng) -> list[RequestSample]:
+    samples: list[RequestSample] = []
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            await _conversation(client, url, _pick(mix, rng), stream, samples)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def _open_loop(client, url, mix, rate, duration, stream, rng) -> list[RequestSample]:
+    samples: list[RequestSample] = []
+    tasks = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(_conversation(client, url, _pick(mix, rng), stream, samples)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+class MemorySampler:
+    """Samples the RSS of a process (and its children) on a background task."""
+
+    def __init__(self, pid: int, interval: float = 0.25) -> None:
+        self._process = psutil.Process(pid)
+        self._interval = interval
+        self.peak = 0
+        self._task: asyncio.Task | None = None
+
+    def rss(self) -> int:
+        processes = [self._process, *self._process.children(recursive=True)]
+        return sum(p.memory_info().rss for p in processes if p.is_running())
+
+    async def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, self.rss())
+            await asyncio.sleep(self._interval)
+
+    def __enter__(self) -> MemorySampler:
+        self.peak = self.rss()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._task.cancel()
+
+
+def _start_agent(agent: str, port: int, mock: MockOpenAIServer, workdir: Path) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DEFAULT_AD_PORT": str(port),
+        "AZURE_OPENAI_ENDPOINT": mock.endpoint,
+        "AZURE_OPENAI_API_KEY": "mock",
+        "SSL_CERT_FILE": str(mock.certificate),
+        "AZURE_AI_MODEL_DEPLOYMENT_NAME": "mock",
+        "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "mock",
+        "OPENAI_API_VERSION": "2024-10-21",
+        "ROUTER_CACHE": "off",
+        "PRODUCT_CACHE": "off",
+        "ORDER_LOG_PATH": str(workdir / f"{agent}-orders.log"),
+        "THREAD_STORE_PATH": str(workdir / f"{agent}-threads.db"),
+    }
+    log = open(workdir / f"{agent}.log", "wb")
+    return subprocess.Popen(
+        [sys.executable, "agent.py"], cwd=AGENTS_DIR / agent, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, base: str, process: subprocess.Popen, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"agent exited with code {process.returncode}")
+        try:
+            if (await client.get(f"{base}/readiness")).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"agent not ready after {timeout}s")
+
+
+def _summarize(agent, mode, level, samples, elapsed, memory: MemorySampler, rss_start, mock_calls) -> LoadResult:
+    latencies = [s.latency for s in samples]
+    ttfbs = [s.ttfb for s in samples if s.ttfb is not None]
+
+    def ms(values: list[float], pct: float) -> float | None:
+        return round(percentile(values, pct) * 1000, 1) if values else None
+
+    return LoadResult(
+        agent=agent,
+        mode=mode,
+        level=level,
+        requests=len(samples),
+        errors=sum(not s.ok for s in samples),
+        throughput=round(len(samples) / elapsed, 2),
+        latency_p50_ms=ms(latencies, 50) or 0.0,
+        latency_p95_ms=ms(latencies, 95) or 0.0,
+        latency_p99_ms=ms(latencies, 99) or 0.0,
+        ttfb_p50_ms=ms(ttfbs, 50),
+        ttfb_p95_ms=ms(ttfbs, 95),
+        rss_start_mb=round(rss_start / 2**20, 1),
+        rss_peak_mb=round(memory.peak / 2**20, 1),
+        mock_calls=mock_calls,
+    )
+
+
+def _print(result: LoadResult) -> None:
+    ttfb = f"{result.ttfb_p50_ms}/{result.ttfb_p95_ms}" if result.ttfb_p50_ms is not None else "-"
+    print(
+        f"  {result.mode:<6} {result.level:>6g}  req={result.requests:<5} err={result.errors:<3} "
+        f"{result.throughput:7.2f} req/s  p50/p95/p99={result.latency_p50_ms}/{result.latency_p95_ms}/"
+        f"{result.latency_p99_ms}ms  ttfb p50/p95={ttfb}ms  rss={result.rss_start_mb}->{result.rss_peak_mb}MB "
+        f"llm_calls={result.mock_calls}"
+    )
+
+
+async def _load_agent(agent: str, args, mock: MockOpenAIServer, workdir: Path) -> list[LoadResult]:
+    base = f"http://127.0.0.1:{args.port}"
+    url = f"{base}/responses"
+    rng = random.Random(args.seed)
+    results = []
+    process = _start_agent(agent, args.port, mock, workdir)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            try:
+                startup = await _wait_ready(client, base, process, args.startup_timeout)
+            except RuntimeError as e:
+                tail = (workdir / f"{agent}.log").read_text(errors="replace").splitlines()[-15:]
+                print(f"{agent}: {e}; skipped. Last log lines:\n  " + "\n  ".join(tail))
+                return results
+            # One warm-up conversation so first-request setup is not measured
+            await _conversation(client, url, MIXES[agent][0][1], not args.no_stream, [])
+            print(f"{agent}: ready in {startup:.1f}s")
+            levels = [("closed", c) for c in args.concurrency] + [("open", r) for r in args.rate]
+            for mode, level in levels:
+                memory = MemorySampler(process.pid)
+                rss_start = memory.rss()
+                calls_before = mock.stats.requests
+                with memory:
+                    start = time.perf_counter()
+                    if mode == "closed":
+                        samples = await _closed_loop(
+                            client, url, MIXES[agent], int(level), args.duration, not args.no_stream, rng
+                        )
+                    else:
+                        samples = await _open_loop(
+                            client, url, MIXES[agent], level, args.duration, not args.no_stream, rng
+                        )
+                    elapsed = time.perf_counter() - start
+                result = _summarize(
+                    agent, mode, level, samples, elapsed, memory, rss_start, mock.stats.requests - calls_before
+                )
+                result.extra["startup_seconds"] = round(startup, 2)
+                results.append(result)
+                _print(result)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", nargs="+", default=list(MIXES), choices=list(MIXES))
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 8, 32])
+    parser.add_argument("--rate", nargs="*", type=float, default=[5.0, 20.0], help="Conversations per second.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load level.")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--mock-port", type=int, default=8089)
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--no-stream", action="store_true", help="Send non-streaming requests (no TTFB).")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    if (REPO_ROOT / ".env").exists():
+        print("warning: the agents load the root .env with override=True; its endpoint settings win over the mock")
+
+    mock = MockOpenAIServer(
+        port=args.mock_port,
+        first_token=args.first_token,
+        tokens_per_second=args.tokens_per_second,
+        jitter=args.jitter,
+    )
+    mock.start()
+    print(
+        f"mock {mock.endpoint}: first_token={args.first_token}s tokens/s={args.tokens_per_second} "
+        f"stream={not args.no_stream} duration={args.duration}s per level"
+    )
+    results: list[LoadResult] = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="load-test-") as tmp:
+            for agent in args.agents:
+                results.extend(await _load_agent(agent, args, mock, Path(tmp)))
+    finally:
+        mock.stop()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in results], indent=2))
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,319 @@
+"""Local mock of the Azure OpenAI chat completions endpoint.
+
+Serves ``POST /openai/deployments/<deployment>/chat/completions`` (and the
+``/openai/v1`` and ``/v1`` variants) with plausible replies for the agents in
+this repo, chosen from the request:
+
+* the orchestrator's routing prompt gets a routing decision (``order-agent``
+  when the message mentions an order, otherwise ``product-search``);
+* the product-search prompt gets a product JSON object;
+* requests with tools get a ``check_inventory`` tool call for a new user
+  message and a text answer once the tool result is in;
+* the order agent's summarization prompt gets a short summary.
+
+Latency is ``first_token`` seconds plus one ``1 / tokens_per_second`` step
+per completion token (about four characters), with optional uniform
+``jitter``. Streaming requests receive server-sent ``chat.completion.chunk``
+events paced the same way; responses report ``usage``.
+
+Faults can be injected for resilience tests: ``slow_rate`` of the requests
+wait an extra ``slow_seconds`` before the first token and ``error_rate`` of
+them fail with HTTP 503. The attributes can be changed while serving.
+
+The agent-framework clients only accept ``https`` endpoints, so the server
+uses TLS with a self-signed certificate for ``127.0.0.1``/``localhost``
+generated on start; clients trust it through ``SSL_CERT_FILE``.
+
+Usage::
+
+    python benchmarks/mock_openai.py [--port 8089] [--first-token 0.2] [--tokens-per-second 80]
+
+It prints the certificate path. Point an agent at it with
+``AZURE_OPENAI_ENDPOINT=https://127.0.0.1:8089``, ``AZURE_OPENAI_API_KEY=mock``
+and ``SSL_CERT_FILE=<certificate>``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+_ORDER_WORDS = re.compile(r"\b(order|orders|cancel|buy|purchase|status|track)\b", re.IGNORECASE)
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class MockStats:
+    """Counters exposed by ``MockOpenAIServer.stats``."""
+
+    requests: int = 0
+    streamed: int = 0
+    slowed: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _reply(body: dict) -> tuple[str, list[dict] | None]:
+    """``(content, tool_calls)`` for one chat completions request."""
+    messages = body.get("messages") or []
+    system = " ".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    last = messages[-1] if messages else {}
+    user_text = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if "must be one of: product-search" in system:
+        agent = "order-agent" if _ORDER_WORDS.search(user_text) else "product-search"
+        return json.dumps({"next_agent": agent, "reason": "Mock routing decision.", "input": user_text}), None
+    if "product generator" in system:
+        name = " ".join(user_text.split()[-3:]).title() or "Product"
+        product = {"name": name, "price": f"{random.randint(10, 999)}.99€", "description": f"A mock {name.lower()}."}
+        return json.dumps(product, ensure_ascii=False), None
+    if "running summary" in system:
+        return "The customer asked about products and their availability; no order placed yet.", None
+
+    tools = [tool["function"]["name"] for tool in body.get("tools") or [] if tool.get("type") == "function"]
+    if tools and last.get("role") == "user":
+        name = "check_inventory" if "check_inventory" in tools else tools[0]
+        product = " ".join(user_text.split()[-2:]) or "table"
+        call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps({"product_name": product})},
+        }
+        return "", [call]
+    return "The item is in stock and ships within three days. Shall I place the order for you?", None
+
+
+def self_signed_certificate(directory: str | Path) -> tuple[Path, Path]:
+    """Write a certificate and key for ``127.0.0.1``/``localhost`` into ``directory``."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]
+            ),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = Path(directory) / "mock-openai.pem"
+    key_path = Path(directory) / "mock-openai.key"
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+    )
+    return cert_path, key_path
+
+
+class MockOpenAIServer:
+    """Mock chat completions server, runnable in a background thread."""
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 8089,
+        first_token: float = 0.2,
+        tokens_per_second: float = 80.0,
+        jitter: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_seconds: float = 5.0,
+        error_rate: float = 0.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.error_rate = error_rate
+        self.stats = MockStats()
+        self._tls_dir = tempfile.TemporaryDirectory(prefix="mock-openai-")
+        self.certificate, self._key = self_signed_certificate(self._tls_dir.name)
+        routes = [
+            Route(path, self._completions, methods=["POST"])
+            for path in (
+                "/openai/deployments/{deployment}/chat/completions",
+                "/openai/v1/chat/completions",
+                "/v1/chat/completions",
+            )
+        ]
+        self.app = Starlette(routes=routes)
+        self._server: uvicorn.Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"https://{self.host}:{self.port}"
+
+    def _delay(self) -> float:
+        delay = max(0.0, self.first_token + random.uniform(-self.jitter, self.jitter))
+        if random.random() < self.slow_rate:
+            self.stats.slowed += 1
+            delay += self.slow_seconds
+        return delay
+
+    async def _completions(self, request: Request):
+        body = await request.json()
+        if random.random() < self.error_rate:
+            self.stats.failed += 1
+            await asyncio.sleep(self.first_token / 4)
+            error = {"code": "ServiceUnavailable", "message": "Injected fault."}
+            return JSONResponse({"error": error}, status_code=503)
+        content, tool_calls = _reply(body)
+        prompt_tokens = sum(len(_text(m.get("content"))) for m in body.get("messages") or []) // _CHARS_PER_TOKEN
+        chunks = [content[i : i + _CHARS_PER_TOKEN] for i in range(0, len(content), _CHARS_PER_TOKEN)]
+        completion_tokens = len(chunks) + (8 if tool_calls else 0)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        self.stats.requests += 1
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model") or request.path_params.get("deployment", "mock")
+        finish = "tool_calls" if tool_calls else "stop"
+
+        if not body.get("stream"):
+            await asyncio.sleep(self._delay() + completion_tokens / self.tokens_per_second)
+            message = {"role": "assistant", "content": content or None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+                    "usage": usage,
+                }
+            )
+
+        self.stats.streamed += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def event(delta: dict | None, finish_reason: str | None = None, **extra) -> str:
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        async def stream():
+            await asyncio.sleep(self._delay())
+            yield event({"role": "assistant", "content": ""})
+            for chunk in chunks:
+                await asyncio.sleep(1 / self.tokens_per_second)
+                yield event({"content": chunk})
+            if tool_calls:
+                await asyncio.sleep(8 / self.tokens_per_second)
+                yield event({"tool_calls": [{"index": i, **call} for i, call in enumerate(tool_calls)]})
+            yield event({}, finish)
+            if include_usage:
+                yield event(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    def _config(self) -> uvicorn.Config:
+        return uvicorn.Config(
+            self.app,
+            host=self.host,
+            port=self.port,
+            log_level="warning",
+            ssl_certfile=str(self.certificate),
+            ssl_keyfile=str(self._key),
+        )
+
+    def start(self) -> None:
+        """Serve on a daemon thread; returns once the socket is listening."""
+        self._server = uvicorn.Server(self._config())
+        self._thread = threading.Thread(target=self._server.run, name="mock-openai", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+        self._tls_dir.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token", type=float, default=0.2, help="Seconds until the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the first token.")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-seconds.")
+    parser.add_argument("--slow-seconds", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with HTTP 503.")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        host=args.host,
+        port=args.port,
+        first_token=args.first_token,
+        tokens_per_second=args.tokens_per_second,
+        jitter=args.jitter,
+        slow_rate=args.slow_rate,
+        slow_seconds=args.slow_seconds,
+        error_rate=args.error_rate,
+    )
+    print(f"endpoint={server.endpoint} SSL_CERT_FILE={server.certificate}", flush=True)
+    uvicorn.Server(server._config()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,12 @@ if [ ! -f "$ENV_FILE" ]; then
   touch "$ENV_FILE"
 fi
 
+if command -v sha256sum >/dev/null 2>&1; then
+  HASH="sha256sum"
+else
+  HASH="shasum -a 256"
+fi
+
 for spec in "$@"; do
   IMAGE_NAME="${spec%%:*}"
   CONTEXT_PATH="${spec#*:}"
@@ -33,13 +39,44 @@ for spec in "$@"; do
     exit 1
   fi
 
-  IMAGE_TAG="$REGISTRY/$IMAGE_NAME:latest"
+  # Stage the shared helpers (src/common) into the build context so the
+  # container can import them next to agent.py
+  rm -rf "$CONTEXT_PATH/common"
+  cp -R "$REPO_ROOT/src/common" "$CONTEXT_PATH/common"
+
+  # Composite agents list the agents they embed in an EMBEDS file; stage
+  # their modules into <context>/<agent>/ so agent.py can load them
+  EMBEDDED=""
+  if [ -f "$CONTEXT_PATH/EMBEDS" ]; then
+    EMBEDDED=$(cat "$CONTEXT_PATH/EMBEDS")
+    for embedded in $EMBEDDED; do
+      rm -rf "$CONTEXT_PATH/$embedded"
+      mkdir -p "$CONTEXT_PATH/$embedded"
+      cp "$REPO_ROOT/src/agents/$embedded/"*.py "$CONTEXT_PATH/$embedded/"
+    done
+  fi
+
+  # Tag the image with a hash of its staged build context: unchanged agents
+  # keep their tag, so the ACR build is skipped and deploy_agents.py leaves
+  # the hosted agent alone
+  CONTENT_HASH=$(cd "$CONTEXT_PATH" && find . -type f ! -name '*.pyc' ! -path '*/__pycache__/*' | LC_ALL=C sort | xargs $HASH | $HASH | cut -c1-12)
+  IMAGE_TAG="$REGISTRY/$IMAGE_NAME:$CONTENT_HASH"
+
+  if az acr repository show --name "${REGISTRY%%.*}" --image "$IMAGE_NAME:$CONTENT_HASH" >/dev/null 2>&1; then
+    echo "$IMAGE_TAG already exists, skipping ACR build."
+  else
+    echo "Queuing ACR build for $IMAGE_TAG from context $CONTEXT_PATH..."
+    az acr build \
+      --registry "${REGISTRY%%.*}" \
+      --image "$IMAGE_TAG" \
+      --image "$REGISTRY/$IMAGE_NAME:latest" \
+      "$CONTEXT_PATH"
+  fi
 
-  echo "Queuing ACR build for $IMAGE_TAG from context $CONTEXT_PATH..."
-  az acr build \
-    --registry "${REGISTRY%%.*}" \
-    --image "$IMAGE_TAG" \
-    "$CONTEXT_PATH"
+  rm -rf "$CONTEXT_PATH/common"
+  for embedded in $EMBEDDED; do
+    rm -rf "$CONTEXT_PATH/$embedded"
+  done
   
   # Persist image URL into .env using a conventional variable name
   # e.g., product-agent -> PRODUCT_AGENT_IMAGE
@@ -8,13 +8,16 @@ and returns a structured JSON response.
 from __future__ import annotations
 
 import json
+import logging
 import os
+import sys
+import time
+import uuid
 from collections.abc import AsyncIterable
 from enum import Enum
 from pathlib import Path
 from typing import Any, ClassVar
 
-from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
@@ -23,12 +26,27 @@ from agent_framework import (
     AgentRunResponseUpdate,
     AgentThread,
     BaseAgent,
+    ChatClientProtocol,
     ChatMessage,
     Role,
     TextContent,
 )
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.ai.agentserver.agentframework import from_agent_framework
+
+# Shared helpers live in src/common; the container build stages a copy next to agent.py
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common.azure_clients import get_client_pool  # noqa: E402
+from common.json_stream import JsonObjectStreamParser  # noqa: E402
+from common.resilience import CircuitOpenError  # noqa: E402
+from common.single_flight import SingleFlight, flight_key  # noqa: E402
+from common.startup import LazyClient, azure_openai_warmup, serve  # noqa: E402
+from common.structured_output import StructuredOutput, StructuredOutputError  # noqa: E402
+from common.telemetry import Telemetry, configure_telemetry, usage_counts  # noqa: E402
+from common.thread_store import ThreadStore, ensure_stored, get_thread_store  # noqa: E402
+
+from intent_classifier import IntentClassifier, RuleClassifier, TfidfLinearClassifier, TieredClassifier
+from routing_cache import InMemoryBackend, RedisBackend, RoutingCache
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -39,7 +57,7 @@ You are an intent router for an e-commerce assistant.
 Classify the user message into exactly one of three intents.
 
 Respond ONLY with valid JSON (no markdown, no extra text):
-{"next_agent":"<agent>","reason":"<short reason>","input":"<user text>"}
+{"next_agent":"<agent>","reason":"<short reason>"}
 
 <agent> must be one of: product-search | order-agent | none
 
@@ -72,6 +90,16 @@ _GREETING: str = (
     "or place an order, and I'll route your request to the best capability."
 )
 
+# Reason of the ``none`` route returned while the chat circuit breaker is open
+_DEGRADED_REASON: str = "Routing is temporarily unavailable."
+
+# Local classification tier (see intent_classifier.py)
+_DEFAULT_CLASSIFIER_THRESHOLD: float = 0.9
+
+# Routing decision cache (see routing_cache.py)
+_DEFAULT_CACHE_MAX_ENTRIES: int = 1024
+_DEFAULT_CACHE_TTL_SECONDS: float = 3600.0
+
 
 # ---------------------------------------------------------------------------
 # Structured Output Models
@@ -92,9 +120,20 @@ class GotoDecision(BaseModel):
     next_agent: NextAgent = Field(description="The downstream agent to invoke.")
     reason: str = Field(description="Short explanation for the routing decision.")
     user_input: str = Field(description="Original user query forwarded to the next agent.")
+    confidence: float | None = Field(
+        default=None,
+        description="Confidence of the local classifier, or None when the LLM decided.",
+    )
     error: str | None = Field(default=None, description="Error details if routing failed.")
 
 
+class RoutingResponse(BaseModel):
+    """Schema the routing LLM answers with (the ``response_format``)."""
+
+    next_agent: NextAgent = Field(description="The downstream agent to invoke.")
+    reason: str = Field(description="Short explanation for the routing decision.")
+
+
 class OrchestratorOutput(BaseModel):
     """Structured output returned by the orchestrator agent."""
 
@@ -121,6 +160,16 @@ class OrderOrchestratorAgent(BaseAgent):
         description: str | None = None,
         product_search_agent_name: str | None = None,
         order_agent_name: str | None = None,
+        chat_client: ChatClientProtocol | None = None,
+        classifier: IntentClassifier | None = None,
+        use_classifier: bool = True,
+        classifier_threshold: float | None = None,
+        decision_log: str | Path | None = None,
+        routing_cache: RoutingCache | None = None,
+        telemetry: Telemetry | None = None,
+        structured_output: StructuredOutput[RoutingResponse] | None = None,
+        single_flight: SingleFlight[GotoDecision] | None = None,
+        thread_store: ThreadStore | None = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(name=name, description=description, **kwargs)
@@ -129,16 +178,66 @@ class OrderOrchestratorAgent(BaseAgent):
         if order_agent_name:
             self.order_agent_name = order_agent_name
 
-        # Initialize Azure OpenAI client for intent routing
-        self._chat_client = AzureOpenAIChatClient(
-            credential=DefaultAzureCredential(),
-            api_version="2024-05-01-preview",
+        # Azure OpenAI client for intent routing, built on first use or during
+        # the start-up warm-up (see common/startup.py)
+        self._chat_client = chat_client or LazyClient(
+            lambda: get_client_pool().chat_client(), warm=True
         )
 
+        # Local fast-path tier; the LLM is only called below the threshold.
+        # use_classifier=False routes every message with the LLM
+        if not use_classifier:
+            classifier = None
+        elif classifier is None:
+            classifier = self._default_classifier()
+        self._classifier = classifier
+        if classifier_threshold is None:
+            classifier_threshold = float(
+                os.getenv("ROUTER_CLASSIFIER_THRESHOLD", _DEFAULT_CLASSIFIER_THRESHOLD)
+            )
+        self._classifier_threshold = classifier_threshold
+
+        # Optional JSONL log of LLM decisions, used to train the local model
+        decision_log = decision_log or os.getenv("ROUTER_DECISION_LOG")
+        self._decision_log = Path(decision_log) if decision_log else None
+
+        # Cache of LLM decisions keyed on normalized text + prompt fingerprint
+        self._routing_cache = routing_cache if routing_cache is not None else self._default_routing_cache()
+
+        # Spans and routing/token/parse-failure metrics (AGENT_TELEMETRY*)
+        self._telemetry = telemetry or configure_telemetry("order-orchestrator")
+
+        # Schema-constrained routing output with one repair attempt (STRUCTURED_OUTPUT*)
+        self.structured_output = structured_output or StructuredOutput.from_env(
+            RoutingResponse,
+            self._chat_client,
+            agent=self.name,
+            failure_label="next_agent",
+            telemetry=self._telemetry,
+        )
+
+        # Identical concurrent messages share one LLM routing call (SINGLE_FLIGHT)
+        if single_flight is None and os.getenv("SINGLE_FLIGHT", "on").lower() != "off":
+            single_flight = SingleFlight(agent=self.name, telemetry=self._telemetry)
+        self.single_flight = single_flight
+
+        # Conversation threads (THREAD_STORE_*); the process-wide store by default
+        self._thread_store = thread_store
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
 
+    def get_new_thread(self, *, thread_id: str | None = None, **kwargs: Any) -> AgentThread:
+        """A new thread whose messages live in the thread store (``THREAD_STORE_*``).
+
+        ``thread_id`` resumes a stored conversation, e.g. after a restart.
+        """
+        store = self._thread_store if self._thread_store is not None else get_thread_store()
+        if store is None or "service_thread_id" in kwargs or "message_store" in kwargs:
+            return super().get_new_thread(**kwargs)
+        return super().get_new_thread(message_store=store.message_store(thread_id), **kwargs)
+
     async def run(
         self,
         messages: str | ChatMessage | list[str] | list[ChatMessage] | None = None,
@@ -149,18 +248,10 @@ class OrderOrchestratorAgent(BaseAgent):
         normalized = self._normalize_messages(messages)
 
         if not normalized:
-            goto = GotoDecision(
-                next_agent=NextAgent.NONE,
-                reason="No user query provided yet.",
-                user_input="",
-            )
-            human_readable = _GREETING
+            output = self.greeting_output()
         else:
             user_text = normalized[-1].text or ""
-            goto = await self._route(user_text)
-            human_readable = _HUMAN_MESSAGES.get(goto.next_agent.value, _HUMAN_MESSAGES["none"])
-
-        output = OrchestratorOutput(human_readable=human_readable, goto=goto)
+            output = self.output_for(await self.route(user_text))
 
         response_message = ChatMessage(
             role=Role.ASSISTANT,
@@ -179,24 +270,296 @@ class OrderOrchestratorAgent(BaseAgent):
         thread: AgentThread | None = None,
         **kwargs: Any,
     ) -> AsyncIterable[AgentRunResponseUpdate]:
-        full = await self.run(messages=messages, thread=thread, **kwargs)
-        if full.messages:
-            msg = full.messages[0]
-            yield AgentRunResponseUpdate(contents=msg.contents, role=msg.role)
+        """Stream the routing decision, emitting ``next_agent`` as early as possible.
+
+        When the LLM is consulted, its output is parsed incrementally: the first
+        update carries ``human_readable`` and ``goto.next_agent`` as soon as the
+        ``next_agent`` field is complete, and a second update adds the
+        ``reason`` and remaining fields. The text of all updates concatenates
+        to a valid ``OrchestratorOutput`` JSON document.
+        """
+        normalized = self._normalize_messages(messages)
+        user_text = (normalized[-1].text or "") if normalized else ""
+
+        fast = await self.route_fast(user_text) if normalized else None
+        if not normalized or fast is not None:
+            # No LLM call involved, so the whole decision is available at once
+            output = self.output_for(fast) if fast is not None else self.greeting_output()
+            response_message = ChatMessage(
+                role=Role.ASSISTANT,
+                contents=[TextContent(text=output.model_dump_json())],
+            )
+            yield AgentRunResponseUpdate(contents=response_message.contents, role=response_message.role)
+            if thread is not None:
+                await self._notify_thread_of_new_messages(thread, normalized, response_message)
+            return
+
+        message_id = uuid.uuid4().hex
+        head_agent: NextAgent | None = None
+        goto: GotoDecision | None = None
+        raw = ""
+        parser: JsonObjectStreamParser | None = JsonObjectStreamParser()
+        started = time.perf_counter()
+        # Not made current: the span stays open across the yields below
+        span = self._telemetry.start_span("llm_call", **{"gen_ai.agent.name": self.name, "streaming": True})
+        try:
+            async for chunk in self._chat_client.get_streaming_response(
+                messages=self._routing_messages(user_text), **self.structured_output.request_options()
+            ):
+                text = chunk.text or ""
+                raw += text
+                if parser is None:
+                    continue
+                try:
+                    members = parser.feed(text)
+                except ValueError:
+                    # Malformed output; report it once the whole response is in
+                    parser = None
+                    continue
+                for key, value in members:
+                    if key != "next_agent" or head_agent is not None:
+                        continue
+                    head_agent = self._parse_next_agent(value)
+                    yield AgentRunResponseUpdate(
+                        contents=[TextContent(text=self._head_fragment(head_agent))],
+                        role=Role.ASSISTANT,
+                        message_id=message_id,
+                        additional_properties={"next_agent": head_agent.value},
+                    )
+        except Exception as e:
+            goto = self._failed_decision(user_text, e)
+        finally:
+            span.end()
+            self._telemetry.record_llm(self.name, time.perf_counter() - started)
+
+        if goto is None:
+            goto = await self._decision_from_raw(raw, user_text)
+        if head_agent is not None and goto.next_agent != head_agent:
+            # The decision has already been emitted; the tail must agree with it. The
+            # final reason belongs to the other route, so the result is not remembered
+            logger.warning(
+                "Streamed route %s disagrees with the final decision %s (%s)",
+                head_agent.value,
+                goto.next_agent.value,
+                goto.reason,
+            )
+            self._telemetry.record_parse_failure(self.name, "stream_mismatch", head_agent.value)
+            goto = goto.model_copy(
+                update={
+                    "next_agent": head_agent,
+                    "reason": "Route streamed before the complete response was validated.",
+                    "error": goto.error or f"The complete response chose {goto.next_agent.value}: {goto.reason}",
+                }
+            )
+        else:
+            await self._remember(goto)
+        self._telemetry.record_routing(time.perf_counter() - started, goto.next_agent.value, "llm")
+
+        output = self.output_for(goto)
+        tail = "" if head_agent is not None else self._head_fragment(goto.next_agent)
+        tail += self._tail_fragment(goto)
+        yield AgentRunResponseUpdate(
+            contents=[TextContent(text=tail)],
+            role=Role.ASSISTANT,
+            message_id=message_id,
+            additional_properties={"orchestrator_output": output.model_dump(mode="json")},
+        )
+
+        if thread is not None:
+            response_message = ChatMessage(
+                role=Role.ASSISTANT,
+                contents=[TextContent(text=output.model_dump_json())],
+            )
+            await self._notify_thread_of_new_messages(thread, normalized, response_message)
+
+    async def route(self, user_text: str) -> GotoDecision:
+        """Routing decision for one message: ``route_fast`` first, ``route_llm`` when unsure."""
+        with self._telemetry.span("route") as span:
+            goto = await self.route_fast(user_text)
+            if goto is None:
+                goto = await self.route_llm(user_text)
+            if span is not None:
+                span.set_attribute("next_agent", goto.next_agent.value)
+            return goto
+
+    async def route_llm(self, user_text: str) -> GotoDecision:
+        """Route with the LLM and log and cache the decision.
+
+        Joins an in-flight call for the same message if there is one.
+        """
+
+        async def route_and_remember() -> GotoDecision:
+            goto = await self._route_with_llm(user_text)
+            await self._remember(goto)
+            return goto
+
+        if self.single_flight is None:
+            return await route_and_remember()
+        goto = await self.single_flight.do(flight_key(user_text, _SYSTEM_PROMPT), route_and_remember)
+        return goto if goto.user_input == user_text else goto.model_copy(update={"user_input": user_text})
+
+    async def route_fast(self, user_text: str) -> GotoDecision | None:
+        """Answer from the local classifier or the decision cache, if possible."""
+        started = time.perf_counter()
+        local = self._classify_locally(user_text)
+        if local is not None:
+            self._telemetry.record_routing(time.perf_counter() - started, local.next_agent.value, "classifier")
+            return local
+
+        if self._routing_cache is not None:
+            cached = await self._routing_cache.get(user_text)
+            if cached is not None:
+                goto = GotoDecision.model_validate_json(cached).model_copy(update={"user_input": user_text})
+                self._telemetry.record_routing(time.perf_counter() - started, goto.next_agent.value, "cache")
+                return goto
+        return None
+
+    @staticmethod
+    def greeting_output() -> OrchestratorOutput:
+        """Output for a request without a user message."""
+        return OrchestratorOutput(
+            human_readable=_GREETING,
+            goto=GotoDecision(
+                next_agent=NextAgent.NONE,
+                reason="No user query provided yet.",
+                user_input="",
+            ),
+        )
+
+    @staticmethod
+    def output_for(goto: GotoDecision) -> OrchestratorOutput:
+        """Output announcing the routing decision ``goto``."""
+        if goto.reason == _DEGRADED_REASON:
+            # The model is unreachable; answer with the greeting instead of asking to clarify
+            return OrchestratorOutput(human_readable=_GREETING, goto=goto)
+        return OrchestratorOutput(
+            human_readable=_HUMAN_MESSAGES.get(goto.next_agent.value, _HUMAN_MESSAGES["none"]),
+            goto=goto,
+        )
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
-    async def _route(self, user_text: str) -> GotoDecision:
+    async def _notify_thread_of_new_messages(self, thread, input_messages, response_messages) -> None:
+        # Threads created without get_new_thread would otherwise keep messages in memory
+        ensure_stored(thread, self._thread_store)
+        with self._telemetry.span("thread_notify"):
+            await super()._notify_thread_of_new_messages(thread, input_messages, response_messages)
+
+    @staticmethod
+    def _default_classifier() -> IntentClassifier | None:
+        """Build the local tier from ``ROUTER_CLASSIFIER`` / ``ROUTER_CLASSIFIER_MODEL``."""
+        mode = os.getenv("ROUTER_CLASSIFIER", "rules").lower()
+        if mode == "off":
+            return None
+
+        tiers: list[IntentClassifier] = [RuleClassifier()]
+        model_path = os.getenv("ROUTER_CLASSIFIER_MODEL")
+        if model_path:
+            try:
+                tiers.append(TfidfLinearClassifier.load(model_path))
+            except (OSError, ValueError, KeyError):
+                logger.exception("Failed to load router model from %s", model_path)
+        return TieredClassifier(tiers)
+
+    @staticmethod
+    def _default_routing_cache() -> RoutingCache | None:
+        """Build the decision cache from the ``ROUTER_CACHE_*`` settings."""
+        if os.getenv("ROUTER_CACHE", "on").lower() == "off":
+            return None
+
+        ttl = float(os.getenv("ROUTER_CACHE_TTL_SECONDS", _DEFAULT_CACHE_TTL_SECONDS))
+        redis_url = os.getenv("ROUTER_CACHE_REDIS_URL")
+        if redis_url:
+            backend = RedisBackend(redis_url)
+        else:
+            backend = InMemoryBackend(
+                int(os.getenv("ROUTER_CACHE_MAX_ENTRIES", _DEFAULT_CACHE_MAX_ENTRIES))
+            )
+        return RoutingCache(backend, ttl=ttl, prompt=_SYSTEM_PROMPT)
+
+    def _classify_locally(self, user_text: str) -> GotoDecision | None:
+        """Return a confident local decision, or None to fall back to the LLM."""
+        if self._classifier is None:
+            return None
+
+        result = self._classifier.classify(user_text)
+        if result is None or result.confidence < self._classifier_threshold:
+            return None
+
+        try:
+            next_agent = NextAgent(result.label)
+        except ValueError:
+            return None
+
+        return GotoDecision(
+            next_agent=next_agent,
+            reason=result.reason,
+            user_input=user_text,
+            confidence=result.confidence,
+        )
+
+    def _log_decision(self, goto: GotoDecision) -> None:
+        """Append an LLM decision to the decision log, if one is configured."""
+        if self._decision_log is None or goto.error:
+            return
+        try:
+            with self._decision_log.open("a", encoding="utf-8") as fh:
+                fh.write(goto.model_dump_json() + "\n")
+        except OSError:
+            logger.exception("Failed to write routing decision log")
+
+    async def _remember(self, goto: GotoDecision) -> None:
+        """Log and cache an LLM decision."""
+        self._log_decision(goto)
+
+        # Failed routings are never cached so that transient errors can recover
+        if self._routing_cache is not None and goto.error is None:
+            await self._routing_cache.set(goto.user_input, goto.model_dump_json())
+
+    @staticmethod
+    def _routing_messages(user_text: str) -> list[ChatMessage]:
+        return [
+            ChatMessage(role=Role.SYSTEM, text=_SYSTEM_PROMPT),
+            ChatMessage(role=Role.USER, text=user_text),
+        ]
+
+    @staticmethod
+    def _head_fragment(next_agent: NextAgent) -> str:
+        """JSON text opening an ``OrchestratorOutput`` up to ``goto.next_agent``."""
+        human_readable = _HUMAN_MESSAGES.get(next_agent.value, _HUMAN_MESSAGES["none"])
+        return (
+            '{"human_readable":' + json.dumps(human_readable, ensure_ascii=False)
+            + ',"goto":{"next_agent":' + json.dumps(next_agent.value)
+        )
+
+    @staticmethod
+    def _tail_fragment(goto: GotoDecision) -> str:
+        """JSON text closing an ``OrchestratorOutput`` opened by ``_head_fragment``."""
+        members = goto.model_dump(mode="json", exclude={"next_agent"})
+        return "".join(
+            "," + json.dumps(key) + ":" + json.dumps(value, ensure_ascii=False)
+            for key, value in members.items()
+        ) + "}}"
+
+    @staticmethod
+    def _parse_next_agent(raw_agent: Any) -> NextAgent:
+        """Map to enum, defaulting to NONE for invalid values."""
+        try:
+            return NextAgent(raw_agent)
+        except ValueError:
+            return NextAgent.NONE
+
+    async def _route_with_llm(self, user_text: str) -> GotoDecision:
         """Call the LLM to classify intent and return a GotoDecision."""
+        started = time.perf_counter()
         try:
-            # Build messages with system prompt and user input
-            messages = [
-                ChatMessage(role=Role.SYSTEM, text=_SYSTEM_PROMPT),
-                ChatMessage(role=Role.USER, text=user_text),
-            ]
-            response = await self._chat_client.get_response(messages=messages)
+            with self._telemetry.llm_call(self.name) as span:
+                response = await self._chat_client.get_response(
+                    messages=self._routing_messages(user_text), **self.structured_output.request_options()
+                )
+                self._telemetry.record_usage(self.name, *usage_counts(response), span=span)
             # Extract the text from the response
             if hasattr(response, 'messages') and response.messages:
                 raw = response.messages[-1].text or ""
@@ -205,42 +568,46 @@ class OrderOrchestratorAgent(BaseAgent):
             else:
                 raw = str(response)
         except Exception as e:
+            goto = self._failed_decision(user_text, e)
+        else:
+            goto = await self._decision_from_raw(raw, user_text)
+        self._telemetry.record_routing(time.perf_counter() - started, goto.next_agent.value, "llm")
+        return goto
+
+    @staticmethod
+    def _failed_decision(user_text: str, error: Exception) -> GotoDecision:
+        """The ``none`` route for a failed LLM call; degraded while the circuit is open."""
+        if isinstance(error, CircuitOpenError):
             return GotoDecision(
                 next_agent=NextAgent.NONE,
-                reason="LLM routing failed.",
-                user_input=user_text,
-                error=f"LLM call failed: {type(e).__name__}: {e}",
-            )
-
-        if not raw:
-            return GotoDecision(
-                next_agent=NextAgent.NONE,
-                reason="LLM returned empty response.",
+                reason=_DEGRADED_REASON,
                 user_input=user_text,
-                error="LLM returned empty response",
+                error=str(error),
             )
+        return GotoDecision(
+            next_agent=NextAgent.NONE,
+            reason="LLM routing failed.",
+            user_input=user_text,
+            error=f"LLM call failed: {type(error).__name__}: {error}",
+        )
 
+    async def _decision_from_raw(self, raw: str, user_text: str) -> GotoDecision:
+        """Validate the raw LLM output (repairing it once if needed) into a GotoDecision."""
         try:
-            parsed = json.loads(raw.strip())
-        except (json.JSONDecodeError, ValueError) as e:
+            decision = await self.structured_output.parse(raw)
+        except StructuredOutputError as e:
             return GotoDecision(
                 next_agent=NextAgent.NONE,
-                reason="Failed to parse LLM response.",
+                reason="Failed to parse LLM response." if raw.strip() else "LLM returned empty response.",
                 user_input=user_text,
-                error=f"JSON parse error: {e}. Raw response: {raw[:500]}",
+                error=f"{e}. Raw response: {raw[:500]}",
             )
-
-        raw_agent = parsed.get("next_agent", "none")
-
-        # Map to enum, defaulting to NONE for invalid values
-        try:
-            next_agent = NextAgent(raw_agent)
-        except ValueError:
-            next_agent = NextAgent.NONE
-
+        except Exception as e:
+            # The repair call failed
+            return self._failed_decision(user_text, e)
         return GotoDecision(
-            next_agent=next_agent,
-            reason=parsed.get("reason") or "No reason provided.",
+            next_agent=decision.next_agent,
+            reason=decision.reason or "No reason provided.",
             user_input=user_text,
         )
 
@@ -254,9 +621,12 @@ if __name__ == "__main__":
     # Try to load .env from workspace root (3 levels up from this file)
     workspace_root = Path(__file__).resolve().parent.parent.parent.parent
     load_dotenv(dotenv_path=workspace_root / ".env", override=True)
-    
+
+    from azure.ai.agentserver.agentframework import from_agent_framework
+
     agent = OrderOrchestratorAgent(
         name="order-orchestrator",
         description="Routes user requests to either the product search agent or the order agent.",
+        telemetry=configure_telemetry("order-orchestrator", deferred=True),
     )
-    from_agent_framework(agent).run()
\ No newline at end of file
+    serve(from_agent_framework(agent), azure_openai_warmup(preload=("agent_framework.azure",)))
\ No newline at end of file
@@ -0,0 +1,306 @@
+# Copyright (c) Microsoft. All rights reserved.
+"""Local intent classification tier for the orchestrator.
+
+Cheap in-process classifiers that run in front of the LLM router. Each
+classifier returns a label (``product-search`` | ``order-agent`` | ``none``)
+with a confidence score; the orchestrator only falls back to the LLM when the
+confidence is below its configured threshold.
+
+Two tiers are provided:
+
+* ``RuleClassifier``        – keyword/regex rules for the obvious cases.
+* ``TfidfLinearClassifier`` – TF-IDF features with a softmax linear model,
+  trained from logged routing decisions (see ``load_decision_log``).
+
+Train a model from a decision log with::
+
+    python intent_classifier.py decisions.jsonl -o router-model.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+
+LABELS: tuple[str, ...] = ("product-search", "order-agent", "none")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# (pattern, label) pairs evaluated in order; first match wins.
+_DEFAULT_RULES: tuple[tuple[str, str], ...] = (
+    (r"\b(track|tracking|cancel|cancell?ing|return|refund)\b.*\border\b", "order-agent"),
+    (r"\b(my|the|this|that)\s+order\b", "order-agent"),
+    (r"\bplac(e|ing)\s+(an?\s+)?order\b", "order-agent"),
+    (r"\border\s+(status|number|id|#)", "order-agent"),
+    (r"\bwhere\s+is\s+my\b", "order-agent"),
+    (r"\b(i\s+need|i\s+want|looking\s+for|searching\s+for|search\s+for|find\s+me|show\s+me)\b", "product-search"),
+    (r"\b(recommend|suggest|compare|browse|any\s+good|best)\b", "product-search"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Classification result and protocol
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Classification:
+    """Result of a local classification."""
+
+    label: str
+    confidence: float
+    reason: str
+
+
+class IntentClassifier(Protocol):
+    """A local classifier that may abstain by returning ``None``."""
+
+    def classify(self, text: str) -> Classification | None: ...
+
+
+# ---------------------------------------------------------------------------
+# Rule tier
+# ---------------------------------------------------------------------------
+
+
+class RuleClassifier:
+    """Keyword/regex rules for messages whose intent is unambiguous."""
+
+    def __init__(
+        self,
+        rules: Sequence[tuple[str, str]] = _DEFAULT_RULES,
+        *,
+        confidence: float = 0.95,
+    ) -> None:
+        self._rules = [(re.compile(pattern, re.IGNORECASE), label) for pattern, label in rules]
+        self._confidence = confidence
+
+    def classify(self, text: str) -> Classification | None:
+        for pattern, label in self._rules:
+            if pattern.search(text):
+                return Classification(
+                    label=label,
+                    confidence=self._confidence,
+                    reason=f"Matched local rule '{pattern.pattern}'.",
+                )
+        return None
+
+
+# ---------------------------------------------------------------------------
+# TF-IDF + linear model tier
+# ---------------------------------------------------------------------------
+
+
+def _features(text: str) -> list[str]:
+    """Unigrams plus adjacent bigrams of the lower-cased text."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class TfidfLinearClassifier:
+    """Multinomial logistic regression over L2-normalized TF-IDF vectors."""
+
+    def __init__(
+        self,
+        *,
+        labels: Sequence[str] = LABELS,
+        idf: dict[str, float] | None = None,
+        weights: dict[str, list[float]] | None = None,
+        bias: list[float] | None = None,
+    ) -> None:
+        self.labels = list(labels)
+        self.idf: dict[str, float] = idf or {}
+        self.weights: dict[str, list[float]] = weights or {}
+        self.bias: list[float] = bias or [0.0] * len(self.labels)
+
+    # -- features ----------------------------------------------------------
+
+    def _vectorize(self, text: str) -> dict[str, float]:
+        counts = Counter(f for f in _features(text) if f in self.idf)
+        vec = {f: (1.0 + math.log(c)) * self.idf[f] for f, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if norm:
+            vec = {f: v / norm for f, v in vec.items()}
+        return vec
+
+    def _scores(self, vec: dict[str, float]) -> list[float]:
+        scores = list(self.bias)
+        for feature, value in vec.items():
+            row = self.weights.get(feature)
+            if row is not None:
+                for i, w in enumerate(row):
+                    scores[i] += w * value
+        return scores
+
+    @staticmethod
+    def _softmax(scores: list[float]) -> list[float]:
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    # -- training ----------------------------------------------------------
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        *,
+        epochs: int = 100,
+        learning_rate: float = 5.0,
+        l2: float = 1e-4,
+    ) -> TfidfLinearClassifier:
+        """Fit IDF statistics and weights with full-batch gradient descent."""
+        if len(texts) != len(labels):
+            raise ValueError("texts and labels must have the same length")
+        if not texts:
+            raise ValueError("cannot train on an empty corpus")
+
+        doc_freq: Counter[str] = Counter()
+        for text in texts:
+            doc_freq.update(set(_features(text)))
+        n_docs = len(texts)
+        self.idf = {f: math.log((1 + n_docs) / (1 + df)) + 1.0 for f, df in doc_freq.items()}
+
+        n_labels = len(self.labels)
+        index = {label: i for i, label in enumerate(self.labels)}
+        targets = [index.get(label, index.get("none", n_labels - 1)) for label in labels]
+        vectors = [self._vectorize(text) for text in texts]
+        self.weights = {f: [0.0] * n_labels for f in self.idf}
+        self.bias = [0.0] * n_labels
+
+        for _ in range(epochs):
+            grad_w: dict[str, list[float]] = {}
+            grad_b = [0.0] * n_labels
+            for vec, target in zip(vectors, targets):
+                probs = self._softmax(self._scores(vec))
+                probs[target] -= 1.0
+                for i, p in enumerate(probs):
+                    grad_b[i] += p
+                for feature, value in vec.items():
+                    row = grad_w.setdefault(feature, [0.0] * n_labels)
+                    for i, p in enumerate(probs):
+                        row[i] += p * value
+            step = learning_rate / n_docs
+            for feature, row in self.weights.items():
+                g = grad_w.get(feature)
+                for i in range(n_labels):
+                    row[i] -= step * ((g[i] if g else 0.0) + l2 * row[i])
+            for i in range(n_labels):
+                self.bias[i] -= step * grad_b[i]
+        return self
+
+    # -- inference ---------------------------------------------------------
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        probs = self._softmax(self._scores(self._vectorize(text)))
+        return dict(zip(self.labels, probs))
+
+    def classify(self, text: str) -> Classification | None:
+        if not self.idf:
+            return None
+        probs = self.predict_proba(text)
+        label = max(probs, key=probs.__getitem__)
+        return Classification(
+            label=label,
+            confidence=probs[label],
+            reason=f"Local model predicted '{label}' (p={probs[label]:.2f}).",
+        )
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, path: str | Path) -> None:
+        payload = {"labels": self.labels, "idf": self.idf, "weights": self.weights, "bias": self.bias}
+        Path(path).write_text(json.dumps(payload), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> TfidfLinearClassifier:
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            labels=payload["labels"],
+            idf=payload["idf"],
+            weights=payload["weights"],
+            bias=payload["bias"],
+        )
+
+
+# ---------------------------------------------------------------------------
+# Tiered classifier
+# ---------------------------------------------------------------------------
+
+
+class TieredClassifier:
+    """Runs classifiers in order and returns the most confident answer.
+
+    Evaluation stops early as soon as a tier reaches ``stop_at`` confidence.
+    """
+
+    def __init__(self, tiers: Iterable[IntentClassifier], *, stop_at: float = 0.95) -> None:
+        self._tiers = list(tiers)
+        self._stop_at = stop_at
+
+    def classify(self, text: str) -> Classification | None:
+        best: Classification | None = None
+        for tier in self._tiers:
+            result = tier.classify(text)
+            if result is None:
+                continue
+            if best is None or result.confidence > best.confidence:
+                best = result
+            if best.confidence >= self._stop_at:
+                break
+        return best
+
+
+# ---------------------------------------------------------------------------
+# Decision log helpers
+# ---------------------------------------------------------------------------
+
+
+def load_decision_log(path: str | Path) -> tuple[list[str], list[str]]:
+    """Read ``(texts, labels)`` from a JSONL log of routing decisions.
+
+    Each line is a serialized ``GotoDecision`` (``user_input``/``next_agent``).
+    Failed routings (``error`` set) and empty inputs are skipped.
+    """
+    texts: list[str] = []
+    labels: list[str] = []
+    with Path(path).open(encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("error") or not record.get("user_input"):
+                continue
+            texts.append(record["user_input"])
+            labels.append(record.get("next_agent", "none"))
+    return texts, labels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local routing model from a decision log.")
+    parser.add_argument("decision_log", help="JSONL file of logged GotoDecision records.")
+    parser.add_argument("-o", "--output", default="router-model.json", help="Where to write the model.")
+    parser.add_argument("--epochs", type=int, default=100)
+    args = parser.parse_args()
+
+    texts, labels = load_decision_log(args.decision_log)
+    model = TfidfLinearClassifier().fit(texts, labels, epochs=args.epochs)
+    model.save(args.output)
+    print(f"Trained on {len(texts)} decisions ({len(model.idf)} features) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
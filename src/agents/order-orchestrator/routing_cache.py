@@ -0,0 +1,173 @@
+# Copyright (c) Microsoft. All rights reserved.
+"""Bounded cache of routing decisions.
+
+Decisions are keyed on the normalized user text plus a fingerprint of the
+system prompt, so changing the prompt invalidates every cached entry. Values
+are opaque strings (the orchestrator stores serialized ``GotoDecision``s).
+
+Backends:
+
+* ``InMemoryBackend`` – per-process LRU with TTL.
+* ``RedisBackend``    – shared across orchestrator replicas; TTL is enforced
+  by Redis and eviction by the server's ``maxmemory-policy`` (use
+  ``allkeys-lru``). Requires the ``redis`` package.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Key helpers
+# ---------------------------------------------------------------------------
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,!?;:\"'"
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold, unicode-normalize and collapse whitespace/edge punctuation."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip(_EDGE_PUNCTUATION)
+
+
+def prompt_fingerprint(prompt: str) -> str:
+    """Short stable hash identifying a system prompt version."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class CacheStats:
+    """Counters exposed by ``RoutingCache.stats``."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    stores: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CacheBackend(Protocol):
+    """Storage used by ``RoutingCache``."""
+
+    async def get(self, key: str) -> str | None: ...
+
+    async def set(self, key: str, value: str, ttl: float) -> None: ...
+
+
+class InMemoryBackend:
+    """LRU dictionary bounded by ``max_entries`` with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024, *, stats: CacheStats | None = None) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.stats = stats or CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+class RedisBackend:
+    """Shared backend so that all orchestrator replicas reuse decisions."""
+
+    def __init__(self, url: str, *, namespace: str = "router") -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RedisBackend requires the 'redis' package (pip install redis)") from e
+        self._client: Any = redis.from_url(url, decode_responses=True)
+        self._namespace = namespace
+
+    async def get(self, key: str) -> str | None:
+        return await self._client.get(f"{self._namespace}:{key}")
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._client.set(f"{self._namespace}:{key}", value, px=max(1, int(ttl * 1000)))
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+
+class RoutingCache:
+    """Decision cache keyed on ``(prompt fingerprint, normalized text)``.
+
+    Backend errors are treated as misses so that a cache outage never fails
+    a routing request.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl: float = 3600.0, prompt: str = "") -> None:
+        self._backend = backend
+        self._ttl = ttl
+        self._prefix = prompt_fingerprint(prompt)
+        # In-memory backends share their eviction counters with the cache
+        self.stats: CacheStats = getattr(backend, "stats", None) or CacheStats()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self._prefix}:{digest}"
+
+    async def get(self, text: str) -> str | None:
+        try:
+            value = await self._backend.get(self.key(text))
+        except Exception:
+            logger.warning("Routing cache lookup failed", exc_info=True)
+            value = None
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, text: str, value: str) -> None:
+        try:
+            await self._backend.set(self.key(text), value, self._ttl)
+        except Exception:
+            logger.warning("Routing cache store failed", exc_info=True)
+            return
+        self.stats.stores += 1
+
+    def snapshot(self) -> dict[str, float]:
+        """Counters plus hit rate, suitable for logging or metrics export."""
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate}
@@ -0,0 +1,296 @@
+# Copyright (c) Microsoft. All rights reserved.
+"""Order Router Agent.
+
+Runs the order-orchestrator's intent routing and the product search in one
+process. When routing needs the LLM, the product search starts at the same
+time (speculatively), since product-search is the most common route. If the
+route comes back as anything else the search is cancelled.
+
+The agent embeds the ``order-orchestrator`` and ``product-search`` agents
+(listed in ``EMBEDS``); the container build stages their modules next to
+this file, locally they are loaded from the sibling folders.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import sys
+import time
+from collections.abc import AsyncIterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from dotenv import load_dotenv
+
+from agent_framework import (
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AgentThread,
+    BaseAgent,
+    ChatMessage,
+    Role,
+    TextContent,
+)
+
+_HERE = Path(__file__).resolve().parent
+
+
+def _load_embedded(name: str) -> ModuleType:
+    """Import the ``agent.py`` of an embedded agent under a unique module name."""
+    folder = _HERE / name if (_HERE / name / "agent.py").exists() else _HERE.parent / name
+    module_name = name.replace("-", "_") + "_agent"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    # Sibling modules of the embedded agent (e.g. routing_cache) import by bare name
+    sys.path.insert(0, str(folder))
+    spec = importlib.util.spec_from_file_location(module_name, folder / "agent.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+orchestrator_module = _load_embedded("order-orchestrator")
+product_search_module = _load_embedded("product-search")
+
+# Importable once the embedded agents have extended sys.path
+from common.thread_store import ThreadStore, ensure_stored, get_thread_store  # noqa: E402
+
+PRODUCT_SEARCH = orchestrator_module.NextAgent.PRODUCT_SEARCH.value
+
+# Token estimate for discarded searches (no usage is reported by the client)
+_CHARS_PER_TOKEN = 4
+
+
+# ---------------------------------------------------------------------------
+# Speculation metrics
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SpeculationStats:
+    """Counters exposed by ``OrderRouterAgent.stats``.
+
+    ``saved_seconds`` is the overlap of routing and search on used
+    speculations (the latency a sequential workflow would have added).
+    Searches that had finished (or failed) when another route was chosen
+    count as ``discarded``, those still running as ``cancelled``. Wasted
+    tokens are estimates: the prompt of every unused search plus the
+    completion of those that finished before the route was known.
+    """
+
+    speculated: int = 0
+    used: int = 0
+    cancelled: int = 0
+    discarded: int = 0
+    saved_seconds: float = 0.0
+    wasted_prompt_tokens: int = 0
+    wasted_completion_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.used / self.speculated if self.speculated else 0.0
+
+
+def _settle(search: asyncio.Task) -> None:
+    """Cancel ``search`` if it is still running, else retrieve its outcome."""
+    if not search.done():
+        search.cancel()
+    elif not search.cancelled():
+        search.exception()
+
+
+# ---------------------------------------------------------------------------
+# Agent
+# ---------------------------------------------------------------------------
+
+
+class OrderRouterAgent(BaseAgent):
+    """Routes a message and answers product searches in a single call."""
+
+    def __init__(
+        self,
+        *,
+        name: str | None = None,
+        description: str | None = None,
+        orchestrator: Any = None,
+        product_search: Any = None,
+        speculate: bool = True,
+        thread_store: ThreadStore | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(
+            name=name or "order-router",
+            description=description or "Routes requests and speculatively runs the product search in parallel.",
+            **kwargs,
+        )
+        self._orchestrator = orchestrator or orchestrator_module.OrderOrchestratorAgent(name="order-orchestrator")
+        self._product_search = product_search or product_search_module.ProductSearchAgent()
+        self._speculate = speculate
+        self.stats = SpeculationStats()
+        # Conversation threads (THREAD_STORE_*); the process-wide store by default
+        self._thread_store = thread_store
+
+    def get_new_thread(self, *, thread_id: str | None = None, **kwargs: Any) -> AgentThread:
+        """A new thread whose messages live in the thread store (``THREAD_STORE_*``).
+
+        ``thread_id`` resumes a stored conversation, e.g. after a restart.
+        """
+        store = self._thread_store if self._thread_store is not None else get_thread_store()
+        if store is None or "service_thread_id" in kwargs or "message_store" in kwargs:
+            return super().get_new_thread(**kwargs)
+        return super().get_new_thread(message_store=store.message_store(thread_id), **kwargs)
+
+    async def run(
+        self,
+        messages: str | ChatMessage | list[str] | list[ChatMessage] | None = None,
+        *,
+        thread: AgentThread | None = None,
+        **kwargs: Any,
+    ) -> AgentRunResponse:
+        normalized = self._normalize_messages(messages)
+        response_messages = [message async for message in self._respond(normalized)]
+
+        if thread is not None:
+            await self._notify_thread_of_new_messages(thread, normalized, response_messages)
+
+        return AgentRunResponse(messages=response_messages)
+
+    async def run_stream(
+        self,
+        messages: str | ChatMessage | list[str] | list[ChatMessage] | None = None,
+        *,
+        thread: AgentThread | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        """Emit the routing decision as soon as it is known, then the product."""
+        normalized = self._normalize_messages(messages)
+        response_messages = []
+        async for message in self._respond(normalized):
+            response_messages.append(message)
+            yield AgentRunResponseUpdate(
+                contents=message.contents,
+                role=Role.ASSISTANT,
+                message_id=message.message_id,
+                additional_properties=message.additional_properties,
+            )
+
+        if thread is not None:
+            await self._notify_thread_of_new_messages(thread, normalized, response_messages)
+
+    def snapshot(self) -> dict[str, float]:
+        """Counters plus hit rate, suitable for logging or metrics export."""
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate}
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    async def _notify_thread_of_new_messages(self, thread, input_messages, response_messages) -> None:
+        # Threads created without get_new_thread would otherwise keep messages in memory
+        ensure_stored(thread, self._thread_store)
+        await super()._notify_thread_of_new_messages(thread, input_messages, response_messages)
+
+    async def _respond(self, normalized: list[ChatMessage]) -> AsyncIterable[ChatMessage]:
+        """Yield the orchestrator output and, for product-search, the product."""
+        if not normalized:
+            yield self._message(self._orchestrator.greeting_output(), "orchestrator_output")
+            return
+
+        user_text = normalized[-1].text or ""
+        goto, search, routed = await self._route(user_text)
+        try:
+            yield self._message(self._orchestrator.output_for(goto), "orchestrator_output")
+
+            if goto.next_agent == PRODUCT_SEARCH:
+                if search is not None:
+                    product = await self._record_saving(search, routed)
+                else:
+                    product = await self._product_search.search(user_text)
+                yield self._message(product, "product_search_output")
+        finally:
+            # The caller may stop reading (or be cancelled) before the product
+            if search is not None:
+                _settle(search)
+
+    async def _route(self, user_text: str) -> tuple[Any, asyncio.Task | None, float]:
+        """Route ``user_text``; returns the decision, the speculative search (if kept) and the routing time."""
+        orchestrator = self._orchestrator
+        # Local classifier / cache answers need no speculation
+        fast = await orchestrator.route_fast(user_text)
+        if fast is not None or not self._speculate:
+            goto = fast or await orchestrator.route(user_text)
+            return goto, None, 0.0
+
+        self.stats.speculated += 1
+        started = time.perf_counter()
+        search = asyncio.create_task(self._timed_search(user_text))
+        try:
+            goto = await orchestrator.route_llm(user_text)
+        except BaseException:
+            search.cancel()
+            raise
+        routed = time.perf_counter() - started
+
+        if goto.next_agent == PRODUCT_SEARCH:
+            self.stats.used += 1
+            return goto, search, routed
+
+        self._discard(search, user_text)
+        return goto, None, routed
+
+    async def _timed_search(self, user_text: str) -> tuple[Any, float]:
+        started = time.perf_counter()
+        output = await self._product_search.search(user_text)
+        return output, time.perf_counter() - started
+
+    async def _record_saving(self, search: asyncio.Task, routed: float) -> Any:
+        output, searched = await search
+        # Sequential = route + search; speculative = max(route, search)
+        self.stats.saved_seconds += min(routed, searched)
+        return output
+
+    def _discard(self, search: asyncio.Task, user_text: str) -> None:
+        prompt_chars = self._product_search.prompt_chars(user_text)
+        self.stats.wasted_prompt_tokens += prompt_chars // _CHARS_PER_TOKEN
+        if not search.done():
+            self.stats.cancelled += 1
+            search.cancel()
+            return
+        self.stats.discarded += 1
+        # Retrieved so that a failed search is not logged as never retrieved
+        if not search.cancelled() and search.exception() is None:
+            output, _ = search.result()
+            self.stats.wasted_completion_tokens += len(output.product.model_dump_json()) // _CHARS_PER_TOKEN
+
+    @staticmethod
+    def _message(output: Any, key: str) -> ChatMessage:
+        return ChatMessage(
+            role=Role.ASSISTANT,
+            contents=[TextContent(text=output.model_dump_json())],
+            additional_properties={key: output.model_dump()},
+        )
+
+
+# ---------------------------------------------------------------------------
+# Entrypoint
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    workspace_root = Path(__file__).resolve().parent.parent.parent.parent
+    load_dotenv(dotenv_path=workspace_root / ".env", override=True)
+
+    from azure.ai.agentserver.agentframework import from_agent_framework
+
+    from common.startup import azure_openai_warmup, serve
+    from common.telemetry import configure_telemetry
+
+    configure_telemetry("order-router", deferred=True)
+    agent = OrderRouterAgent(
+        name="order-router",
+        description="Routes requests and speculatively runs the product search in parallel.",
+    )
+    serve(from_agent_framework(agent), azure_openai_warmup(preload=("agent_framework.azure",)))
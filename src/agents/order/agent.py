@@ -1,10 +1,20 @@
 import os
+import sys
+import json
+import asyncio
+import contextvars
 import logging
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Annotated
 
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import SystemMessage, ToolMessage
-from langchain_core.tools import tool
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import InjectedToolCallId, tool
 from langgraph.graph import (
     END,
     START,
@@ -12,55 +22,127 @@ from langgraph.graph import (
     StateGraph,
 )
 from typing_extensions import Literal
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from azure.ai.agentserver.langgraph import from_langgraph
-from azure.monitor.opentelemetry import configure_azure_monitor
+# Shared helpers live in src/common; the container build stages a copy next to agent.py
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common.azure_clients import get_client_pool  # noqa: E402
+from common.checkpoints import StoreCheckpointer  # noqa: E402
+from common.data_dir import store_path  # noqa: E402
+from common.startup import Lazy, azure_openai_warmup, serve  # noqa: E402
+from common.telemetry import configure_telemetry, usage_counts  # noqa: E402
+from common.thread_store import get_thread_store  # noqa: E402
+
+from context_window import (
+    ContextPolicy,
+    OrderState,
+    context_messages,
+    make_async_context_node,
+    make_context_node,
+    usage_update,
+)
+from inventory import InventoryError, InventoryStore, Reservation
+from order_log import OrderLog, idempotency_key
+from plan import LIMIT_REPLY, PlanPolicy, composite_results, confirmation_message
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-if os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"):
-    configure_azure_monitor(enable_live_metrics=True, logger_name="__main__")
+# Exporter per AGENT_TELEMETRY_EXPORTER (Azure Monitor when App Insights is
+# configured); the hosted server sets it up during warm-up
+telemetry = configure_telemetry("order", deferred=__name__ == "__main__")
 
 deployment_name = os.getenv("AZURE_AI_MODEL_DEPLOYMENT_NAME")
 
-try:
-    credential = DefaultAzureCredential()
-    token_provider = get_bearer_token_provider(
-        credential, "https://cognitiveservices.azure.com/.default"
-    )
-    llm = init_chat_model(
-        f"azure_openai:{deployment_name}",
-        azure_ad_token_provider=token_provider,
-    )
-except Exception:
-    logger.exception("Order Agent failed to start")
-    raise
 
+def _create_llm():
+    from langchain.chat_models import init_chat_model
 
-# Define tools
-@tool
-def place_order(product_name: str, quantity: int) -> dict:
-    """Place an order for a product.
+    try:
+        # Shared credential, background-refreshed token and HTTP connection pool
+        return init_chat_model(f"azure_openai:{deployment_name}", **get_client_pool().chat_model_kwargs())
+    except Exception:
+        logger.exception("Order Agent failed to start")
+        raise
 
-    Args:
-        product_name: name of the product to order
-        quantity: number of items to order
+
+# Built on first use or during the start-up warm-up (see common/startup.py)
+llm = Lazy(_create_llm, warm=True)
+
+
+class _DeferredModel:
+    """``invoke``/``ainvoke`` of a ``Lazy`` model, for the context nodes.
+
+    LangGraph probes the attributes of values captured by nodes when it
+    compiles a graph, so nodes call ``get()`` at run time instead.
     """
-    import uuid
-    import random
-    
-    # Mock order logic - generate a fake order confirmation
-    order_id = str(uuid.uuid4())[:8].upper()
-    unit_price = round(random.uniform(10.0, 500.0), 2)
+
+    def __init__(self, model: Lazy) -> None:
+        self._model = model
+
+    def invoke(self, *args, **kwargs):
+        return self._model.get().invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self._model.get().ainvoke(*args, **kwargs)
+
+
+def _load_inventory() -> InventoryStore:
+    """Catalog from ``ORDER_INVENTORY_PATH``, or an empty store that registers
+    products on first use (the demo's product names are generated freely)."""
+
+    path = os.getenv("ORDER_INVENTORY_PATH")
+    auto_register = os.getenv("ORDER_INVENTORY_AUTO_REGISTER", "off" if path else "on").lower() != "off"
+    if path:
+        store = InventoryStore.from_file(path, auto_register=auto_register)
+        logger.info("Loaded %d products from %s", len(store), path)
+        return store
+    return InventoryStore(auto_register=auto_register)
+
+
+inventory = _load_inventory()
+
+
+def _open_order_log() -> OrderLog | None:
+    """Durable log of confirmed orders at ``ORDER_LOG_PATH`` (default:
+    ``orders.log`` in ``AGENT_DATA_DIR``); off when neither is set."""
+
+    path = store_path("ORDER_LOG_PATH", "orders.log")
+    if path is None:
+        return None
+    return OrderLog(path, fsync=os.getenv("ORDER_LOG_FSYNC", "on").lower() != "off")
+
+
+# Opened by the start-up warm-up, or by the first place_order
+order_log = Lazy(_open_order_log, warm=True)
+
+
+def _place(product_name: str, quantity: int, held: list[Reservation] | None = None) -> dict:
+    """Take the stock and build the order confirmation.
+
+    With ``held``, the stock is reserved and the reservation appended to it,
+    for the caller to commit or release.
+    """
+    row = inventory.find(product_name)
+    if row is None:
+        return {"product_name": product_name, "status": "not_found", "error": "Unknown product"}
+    try:
+        if held is None:
+            inventory.decrement(row, quantity)
+        else:
+            held.append(inventory.reserve(row, quantity))
+    except InventoryError as e:
+        return {**inventory.snapshot(row), "quantity": quantity, "status": "rejected", "error": str(e)}
+
+    order_id = uuid.uuid4().hex[:16].upper()
+    unit_price = inventory.prices[row]
     total_price = round(unit_price * quantity, 2)
     estimated_delivery_days = random.randint(2, 7)
-    
+
     return {
         "order_id": order_id,
-        "product_name": product_name,
+        "sku": inventory.skus[row],
+        "product_name": inventory.names[row],
         "quantity": quantity,
         "unit_price": unit_price,
         "total_price": total_price,
@@ -69,6 +151,52 @@ def place_order(product_name: str, quantity: int) -> dict:
     }
 
 
+def _place_once(product_name: str, quantity: int, tool_call_id: str, config: RunnableConfig) -> dict:
+    """Place the order once per (conversation, tool call); replays return the logged confirmation.
+
+    The stock stays reserved until the order is logged and is released if
+    logging fails, so a retry of the tool call does not take it twice.
+    """
+    log = order_log.get()
+    if log is None:
+        return _place(product_name, quantity)
+    key = idempotency_key((config or {}).get("configurable", {}).get("thread_id"), tool_call_id)
+    held: list[Reservation] = []
+    try:
+        confirmation = log.place_once(key, lambda: _place(product_name, quantity, held))
+    except BaseException:
+        for reservation in held:
+            inventory.release(reservation.id)
+        raise
+    for reservation in held:
+        inventory.commit(reservation.id)
+    return confirmation
+
+
+def _open_checkpointer() -> StoreCheckpointer | None:
+    """Graph state per conversation in the thread store; off without ``THREAD_STORE_PATH`` or ``AGENT_DATA_DIR``."""
+
+    store = get_thread_store()
+    return StoreCheckpointer.from_env(store) if store is not None else None
+
+
+# Define tools
+@tool
+def place_order(
+    product_name: str,
+    quantity: int,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
+) -> dict:
+    """Place an order for a product.
+
+    Args:
+        product_name: name of the product to order
+        quantity: number of items to order
+    """
+    return _place_once(product_name, quantity, tool_call_id, config)
+
+
 @tool
 def check_inventory(product_name: str) -> dict:
     """Check inventory availability for a product.
@@ -76,51 +204,250 @@ def check_inventory(product_name: str) -> dict:
     Args:
         product_name: name of the product to check
     """
-    import random
-    
-    # Mock inventory check
-    in_stock = random.choice([True, True, True, False])  # 75% chance in stock
-    available_quantity = random.randint(0, 100) if in_stock else 0
-    
-    return {
-        "product_name": product_name,
-        "in_stock": in_stock,
-        "available_quantity": available_quantity
-    }
+
+    row = inventory.find(product_name)
+    if row is None:
+        return {"product_name": product_name, "in_stock": False, "available_quantity": 0, "error": "Unknown product"}
+    return inventory.snapshot(row)
+
+
+def _check_and_place(product_name: str, quantity: int, tool_call_id: str, config: RunnableConfig) -> dict:
+    """Inventory check, then placement if the stock suffices; no model call in between."""
+    availability = check_inventory.func(product_name)
+    if "error" in availability:
+        return {**availability, "quantity": quantity, "status": "not_found"}
+    if availability["available_quantity"] < quantity:
+        return {**availability, "quantity": quantity, "status": "rejected", "error": "Insufficient stock"}
+    return _place_once(product_name, quantity, tool_call_id, config)
+
+
+@tool
+def check_and_place_order(
+    product_name: str,
+    quantity: int,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
+) -> dict:
+    """Check inventory for a product and place the order if enough stock is available.
+
+    Use this for every order instead of checking the inventory first.
+
+    Args:
+        product_name: name of the product to order
+        quantity: number of items to order
+    """
+    return _check_and_place(product_name, quantity, tool_call_id, config)
+
+
+# Native coroutine variants for the async graph, so tool calls never need a
+# thread (place_order only hands its durable write to one). They share the
+# schema and implementation of the sync tools.
+@tool("place_order", description=place_order.description, args_schema=place_order.args_schema)
+async def aplace_order(
+    product_name: str,
+    quantity: int,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
+) -> dict:
+    # Waiting for the log's fsync must not block the event loop
+    return await asyncio.to_thread(_place_once, product_name, quantity, tool_call_id, config)
+
+
+@tool("check_inventory", description=check_inventory.description, args_schema=check_inventory.args_schema)
+async def acheck_inventory(product_name: str) -> dict:
+    return check_inventory.func(product_name)
+
+
+@tool(
+    "check_and_place_order",
+    description=check_and_place_order.description,
+    args_schema=check_and_place_order.args_schema,
+)
+async def acheck_and_place_order(
+    product_name: str,
+    quantity: int,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
+) -> dict:
+    return await asyncio.to_thread(_check_and_place, product_name, quantity, tool_call_id, config)
 
 
 # Augment the LLM with tools
 tools = [place_order, check_inventory]
+async_tools = [aplace_order, acheck_inventory]
 tools_by_name = {tool.name: tool for tool in tools}
-llm_with_tools = llm.bind_tools(tools)
+llm_with_tools = Lazy(lambda: llm.get().bind_tools(tools), warm=True)
+
+# Plan mode (ORDER_PLAN_MODE): orders go through the composite tool
+plan_tools = [check_and_place_order, check_inventory]
+async_plan_tools = [acheck_and_place_order, acheck_inventory]
+llm_with_plan_tools = Lazy(lambda: llm.get().bind_tools(plan_tools))
+
+SYSTEM_PROMPT = "You are a helpful order assistant. You help customers place orders and check product inventory. When a customer wants to order something, use the available tools to check inventory and place orders. Generate friendly, professional order confirmations based on the order results."
+PLAN_SYSTEM_PROMPT = "You are a helpful order assistant. You help customers place orders and check product inventory. When a customer wants to order something, call check_and_place_order once with the product and quantity; it checks the inventory and places the order. Use check_inventory only for availability questions."
+
+# Bounded history sent to the model (ORDER_CONTEXT_* settings)
+context_policy = ContextPolicy.from_env()
+# Plan mode and the per-conversation LLM call cap (ORDER_PLAN_MODE, ORDER_MAX_LLM_CALLS)
+plan_policy = PlanPolicy.from_env()
+
 
 # Nodes
-def llm_call(state: MessagesState):
+def _llm_call(model_with_tools, system_prompt: str, state: OrderState):
+    if plan_policy.over_budget(state):
+        return {"messages": [AIMessage(content=LIMIT_REPLY)]}
+    context = context_messages(state, system_prompt, context_policy)
+    started = time.perf_counter()
+    with telemetry.llm_call("order") as span:
+        response = model_with_tools.invoke(context)
+        telemetry.record_usage("order", *usage_counts(response), span=span)
+    return {"messages": [response], **usage_update(response, context, started)}
+
+
+def llm_call(state: OrderState):
     """LLM decides whether to call a tool or not"""
 
-    return {
-        "messages": [
-            llm_with_tools.invoke(
-                [
-                    SystemMessage(
-                        content="You are a helpful order assistant. You help customers place orders and check product inventory. When a customer wants to order something, use the available tools to check inventory and place orders. Generate friendly, professional order confirmations based on the order results."
-                    )
-                ]
-                + state["messages"]
+    return _llm_call(llm_with_tools.get(), SYSTEM_PROMPT, state)
+
+
+def plan_llm_call(state: OrderState):
+    """LLM plans the tool calls; orders go through check_and_place_order"""
+
+    return _llm_call(llm_with_plan_tools.get(), PLAN_SYSTEM_PROMPT, state)
+
+
+def confirm(state: OrderState):
+    """Renders the reply from the check_and_place_order results, without the LLM"""
+
+    return {"messages": [confirmation_message(composite_results(state["messages"]))]}
+
+
+def _parse_tool_timeouts(spec: str) -> dict:
+    """Parse ``name=seconds`` pairs, e.g. ``check_inventory=5,place_order=20``"""
+
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+def _invoke_tool(tool, tool_call: dict, config: RunnableConfig | None):
+    with telemetry.span(f"tool.{tool_call['name']}", **{"gen_ai.tool.call.id": tool_call["id"]}):
+        return tool.invoke(tool_call, config)
+
+
+async def _ainvoke_tool(tool, tool_call: dict, config: RunnableConfig | None):
+    with telemetry.span(f"tool.{tool_call['name']}", **{"gen_ai.tool.call.id": tool_call["id"]}):
+        return await tool.ainvoke(tool_call, config)
+
+
+def make_tool_node(
+    tools_by_name: dict,
+    *,
+    max_concurrency: int = 8,
+    default_timeout: float = 30.0,
+    timeouts: dict | None = None,
+):
+    """Build a node that runs the tool calls of one turn concurrently.
+
+    Calls run on a bounded thread pool shared by all conversations. Results
+    keep the original ``tool_call_id`` order. A call exceeding its timeout is
+    reported to the LLM as an error ToolMessage; the worker thread itself
+    cannot be interrupted and finishes in the background.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="order-tool")
+    timeouts = timeouts or {}
+
+    def tool_node(state: dict, config: RunnableConfig | None = None):
+        """Performs the tool calls"""
+
+        tool_calls = state["messages"][-1].tool_calls
+        started = time.monotonic()
+        # Invoking with the full tool call lets tools see their tool_call_id; the
+        # copied context keeps tool spans under the current trace
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _invoke_tool, tools_by_name[tool_call["name"]], tool_call, config
             )
+            for tool_call in tool_calls
         ]
-    }
+        result = []
+        for tool_call, future in zip(tool_calls, futures):
+            timeout = timeouts.get(tool_call["name"], default_timeout)
+            try:
+                # Timeouts count from submission, not from when we start waiting
+                observation = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning("Tool %s timed out after %.1fs", tool_call["name"], timeout)
+                result.append(
+                    ToolMessage(
+                        content=json.dumps({"error": f"{tool_call['name']} timed out after {timeout:g}s"}),
+                        tool_call_id=tool_call["id"],
+                        status="error",
+                    )
+                )
+                continue
+            result.append(observation)
+        return {"messages": result}
 
+    return tool_node
 
-def tool_node(state: dict):
-    """Performs the tool call"""
 
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
-    return {"messages": result}
+def make_async_tool_node(
+    tools_by_name: dict,
+    *,
+    max_concurrency: int = 8,
+    default_timeout: float = 30.0,
+    timeouts: dict | None = None,
+):
+    """Async counterpart of ``make_tool_node``.
+
+    Tool calls of one turn run as concurrent coroutines via ``ainvoke``,
+    limited per turn by ``max_concurrency``. Async tools stay on the event
+    loop; sync tools fall back to LangChain's executor.
+    """
+
+    timeouts = timeouts or {}
+
+    async def tool_node(state: dict, config: RunnableConfig | None = None):
+        """Performs the tool calls"""
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(tool_call: dict) -> ToolMessage:
+            timeout = timeouts.get(tool_call["name"], default_timeout)
+            async with semaphore:
+                try:
+                    observation = await asyncio.wait_for(
+                        _ainvoke_tool(tools_by_name[tool_call["name"]], tool_call, config), timeout
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning("Tool %s timed out after %.1fs", tool_call["name"], timeout)
+                    return ToolMessage(
+                        content=json.dumps({"error": f"{tool_call['name']} timed out after {timeout:g}s"}),
+                        tool_call_id=tool_call["id"],
+                        status="error",
+                    )
+            return observation
+
+        # gather preserves the original tool_call_id order
+        result = await asyncio.gather(*(run(tool_call) for tool_call in state["messages"][-1].tool_calls))
+        return {"messages": list(result)}
+
+    return tool_node
+
+
+_tool_node_options = {
+    "max_concurrency": int(os.getenv("ORDER_TOOL_CONCURRENCY", "8")),
+    "default_timeout": float(os.getenv("ORDER_TOOL_TIMEOUT_SECONDS", "30")),
+    "timeouts": _parse_tool_timeouts(os.getenv("ORDER_TOOL_TIMEOUTS", "")),
+}
+tool_node = make_tool_node(tools_by_name, **_tool_node_options)
+# Plan mode (see plan.py); its pool only starts threads once a plan-mode graph runs
+plan_tool_node = make_tool_node({t.name: t for t in plan_tools}, **_tool_node_options)
 
 
 # Conditional edge function to route to the tool node or end based upon whether the LLM made a tool call
@@ -136,16 +463,16 @@ def should_continue(state: MessagesState) -> Literal["environment", "__end__"]:
     return END
 
 
-# Build workflow
-def build_agent() -> "StateGraph":
-    agent_builder = StateGraph(MessagesState)
+# Plan mode: deterministic edge after the tools
+def after_tools(state: OrderState) -> Literal["confirm", "llm_call"]:
+    """Confirm without the LLM when check_and_place_order settled every call of the step"""
 
-    # Add nodes
-    agent_builder.add_node("llm_call", llm_call)
-    agent_builder.add_node("environment", tool_node)
+    return "confirm" if composite_results(state["messages"]) is not None else "llm_call"
 
-    # Add edges to connect nodes
-    agent_builder.add_edge(START, "llm_call")
+
+def _add_edges(agent_builder: StateGraph, plan: bool) -> None:
+    agent_builder.add_edge(START, "context")
+    agent_builder.add_edge("context", "llm_call")
     agent_builder.add_conditional_edges(
         "llm_call",
         should_continue,
@@ -154,17 +481,92 @@ def build_agent() -> "StateGraph":
             END: END,
         },
     )
-    agent_builder.add_edge("environment", "llm_call")
+    if plan:
+        agent_builder.add_node("confirm", confirm)
+        agent_builder.add_conditional_edges("environment", after_tools)
+        agent_builder.add_edge("confirm", END)
+    else:
+        agent_builder.add_edge("environment", "llm_call")
+
+
+# Build workflow
+def build_agent(checkpointer=None, *, plan: bool | None = None) -> "StateGraph":
+    """Compile the order graph; ``checkpointer`` keeps state per ``thread_id``.
+
+    ``plan`` (default: ``ORDER_PLAN_MODE``) selects plan mode (see ``plan.py``).
+    """
+
+    plan = plan_policy.enabled if plan is None else plan
+    agent_builder = StateGraph(OrderState)
+
+    # Add nodes
+    agent_builder.add_node("context", make_context_node(_DeferredModel(llm), context_policy))
+    agent_builder.add_node("llm_call", plan_llm_call if plan else llm_call)
+    agent_builder.add_node("environment", plan_tool_node if plan else tool_node)
+
+    # Add edges to connect nodes
+    _add_edges(agent_builder, plan)
 
     # Compile the agent
-    return agent_builder.compile()
+    return agent_builder.compile(checkpointer=checkpointer)
+
+
+def build_async_agent(
+    model=None, agent_tools: list | None = None, checkpointer=None, *, plan: bool | None = None
+) -> "StateGraph":
+    """Same graph as ``build_agent`` with coroutine nodes.
+
+    ``llm_call`` uses ``ainvoke`` and the tool node awaits ``ainvoke`` on each
+    tool, so a slow completion suspends its conversation instead of holding a
+    worker thread. Defaults to the module's model and native async tools.
+    """
+
+    plan = plan_policy.enabled if plan is None else plan
+    if agent_tools is None:
+        agent_tools = async_plan_tools if plan else async_tools
+    model_with_tools = Lazy(lambda: (model or llm.get()).bind_tools(agent_tools), warm=True)
+    system_prompt = PLAN_SYSTEM_PROMPT if plan else SYSTEM_PROMPT
+
+    async def llm_call(state: OrderState):
+        """LLM decides whether to call a tool or not"""
+
+        if plan_policy.over_budget(state):
+            return {"messages": [AIMessage(content=LIMIT_REPLY)]}
+        context = context_messages(state, system_prompt, context_policy)
+        started = time.perf_counter()
+        with telemetry.llm_call("order") as span:
+            response = await model_with_tools.get().ainvoke(context)
+            telemetry.record_usage("order", *usage_counts(response), span=span)
+        return {"messages": [response], **usage_update(response, context, started)}
+
+    agent_builder = StateGraph(OrderState)
+
+    agent_builder.add_node("context", make_async_context_node(model or _DeferredModel(llm), context_policy))
+    agent_builder.add_node("llm_call", llm_call)
+    agent_builder.add_node(
+        "environment",
+        make_async_tool_node({t.name: t for t in agent_tools}, **_tool_node_options),
+    )
+
+    _add_edges(agent_builder, plan)
+
+    return agent_builder.compile(checkpointer=checkpointer)
 
 # Build workflow and run agent
 if __name__ == "__main__":
     try:
-        agent = build_agent()
-        adapter = from_langgraph(agent)
-        adapter.run()
+        from azure.ai.agentserver.langgraph import from_langgraph
+
+        async_mode = os.getenv("ORDER_AGENT_MODE", "sync").lower() == "async"
+        checkpointer = _open_checkpointer()
+        agent = build_async_agent(checkpointer=checkpointer) if async_mode else build_agent(checkpointer)
+        # The sync graph calls the model through the pool's sync HTTP client
+        serve(
+            from_langgraph(agent),
+            azure_openai_warmup(sync_connection=not async_mode, preload=("langchain.chat_models", "langchain_openai")),
+            # Stock and order-log idempotency live in this process; workers would oversell
+            max_workers=1,
+        )
     except Exception:
         logger.exception("Order Agent encountered an error while running")
         raise
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Bounded conversation context for the order agent.
+
+The model sees the system prompt, a running summary of older history and
+the last ``keep_turns`` turns verbatim, instead of the whole message list.
+A turn starts at a user message, so an assistant tool call and its tool
+results always stay together.
+
+Older messages are folded into the summary by a ``context`` node in front of
+``llm_call``. The summary and the number of messages it covers are cached in
+graph state, so each message is summarized once; summarization only runs
+when at least ``summary_batch`` turns have left the window (default:
+``keep_turns``), so the model sees between ``keep_turns`` and
+``keep_turns + summary_batch`` turns and the summarizer runs once every
+``summary_batch`` turns. Turns waiting for summarization are still sent
+verbatim, so nothing is dropped.
+
+Every ``llm_call`` appends a usage record (input/output tokens, context
+messages, latency) to ``state["usage"]``, which keeps the last
+``USAGE_RECORDS`` records, and adds its call and token counts to
+``state["usage_totals"]``. The checkpoint stays the same size however long
+the conversation runs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.graph import MessagesState
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a customer conversation with an order assistant. "
+    "Update the summary with the new messages. Keep product names, quantities, prices, "
+    "order IDs, inventory results and open questions. Reply with the summary only."
+)
+
+# Longer tool results and messages are cut in the summarization transcript
+_TRANSCRIPT_CHARS = 600
+
+# Usage records kept in graph state; older calls only count in ``usage_totals``
+USAGE_RECORDS = 20
+
+_TOTAL_KEYS = ("llm_calls", "input_tokens", "output_tokens")
+
+
+def recent_usage(left: list[dict] | None, right: list[dict] | None) -> list[dict]:
+    """Reducer for ``usage``: append and keep the last ``USAGE_RECORDS`` records."""
+    return [*(left or []), *(right or [])][-USAGE_RECORDS:]
+
+
+def add_usage_totals(left: dict | None, right: dict | None) -> dict:
+    """Reducer for ``usage_totals``: sum the call and token counts."""
+    left, right = left or {}, right or {}
+    return {key: left.get(key, 0) + right.get(key, 0) for key in _TOTAL_KEYS}
+
+
+class OrderState(MessagesState):
+    """Graph state: messages plus the cached summary and per-call usage."""
+
+    summary: str
+    summarized: int
+    usage: Annotated[list[dict], recent_usage]
+    usage_totals: Annotated[dict, add_usage_totals]
+
+
+@dataclass
+class ContextPolicy:
+    """How much history ``llm_call`` sends. ``keep_turns=0`` sends everything."""
+
+    keep_turns: int = 6
+    summarize: bool = True
+    summary_batch: int | None = None
+
+    @property
+    def batch_turns(self) -> int:
+        return max(1, self.summary_batch or self.keep_turns)
+
+    @classmethod
+    def from_env(cls) -> ContextPolicy:
+        batch = os.getenv("ORDER_CONTEXT_SUMMARY_BATCH")
+        return cls(
+            keep_turns=int(os.getenv("ORDER_CONTEXT_TURNS", "6")),
+            summarize=os.getenv("ORDER_CONTEXT_SUMMARY", "on").lower() != "off",
+            summary_batch=int(batch) if batch else None,
+        )
+
+
+def _turn_starts(messages: list[AnyMessage]) -> list[int]:
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def window_start(messages: list[AnyMessage], keep_turns: int) -> int:
+    """Index of the first message of the last ``keep_turns`` turns."""
+    if keep_turns <= 0:
+        return 0
+    starts = _turn_starts(messages)
+    if len(starts) <= keep_turns:
+        return 0
+    return starts[-keep_turns]
+
+
+def context_start(state: dict, policy: ContextPolicy) -> int:
+    """First message sent verbatim: the window, or earlier if not yet summarized."""
+    start = window_start(state["messages"], policy.keep_turns)
+    if policy.summarize:
+        start = min(start, state.get("summarized", 0))
+    return start
+
+
+def context_messages(state: dict, system_prompt: str, policy: ContextPolicy) -> list[AnyMessage]:
+    """Messages for one ``llm_call``: system prompt + summary + recent turns."""
+    system = system_prompt
+    if state.get("summary"):
+        system += "\n\nSummary of the earlier conversation:\n" + state["summary"]
+    return [SystemMessage(content=system)] + state["messages"][context_start(state, policy) :]
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= _TRANSCRIPT_CHARS else text[:_TRANSCRIPT_CHARS] + "…"
+
+
+def transcript(messages: list[AnyMessage]) -> str:
+    """Plain-text rendering of ``messages`` for the summarizer."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {_clip(str(message.content))}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool result ({message.name or 'tool'}): {_clip(str(message.content))}")
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                lines.append(f"Assistant called {call['name']}({json.dumps(call['args'], ensure_ascii=False)})")
+            if message.content:
+                lines.append(f"Assistant: {_clip(str(message.content))}")
+    return "\n".join(lines)
+
+
+def _summary_request(state: dict, messages: list[AnyMessage]) -> list[AnyMessage]:
+    return [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(
+            content=f"Current summary:\n{state.get('summary') or '(none)'}\n\nNew messages:\n{transcript(messages)}"
+        ),
+    ]
+
+
+def _pending(state: dict, policy: ContextPolicy) -> tuple[int, int] | None:
+    """``(from, to)`` range of messages to fold into the summary, if due."""
+    if not policy.summarize or policy.keep_turns <= 0:
+        return None
+    done = state.get("summarized", 0)
+    start = window_start(state["messages"], policy.keep_turns)
+    if len(_turn_starts(state["messages"][done:start])) < policy.batch_turns:
+        return None
+    return done, start
+
+
+def make_context_node(model: Any, policy: ContextPolicy):
+    """Node that updates the running summary with ``model.invoke``."""
+
+    def context(state: dict):
+        """Folds messages that left the window into the summary"""
+
+        pending = _pending(state, policy)
+        if pending is None:
+            return {}
+        done, start = pending
+        response = model.invoke(_summary_request(state, state["messages"][done:start]))
+        return {"summary": str(response.content), "summarized": start}
+
+    return context
+
+
+def make_async_context_node(model: Any, policy: ContextPolicy):
+    """Async counterpart of ``make_context_node`` using ``model.ainvoke``."""
+
+    async def context(state: dict):
+        """Folds messages that left the window into the summary"""
+
+        pending = _pending(state, policy)
+        if pending is None:
+            return {}
+        done, start = pending
+        response = await model.ainvoke(_summary_request(state, state["messages"][done:start]))
+        return {"summary": str(response.content), "summarized": start}
+
+    return context
+
+
+def estimate_tokens(messages: list[AnyMessage]) -> int:
+    """Rough token count (4 characters per token) when the model reports none."""
+    return sum(len(str(message.content)) for message in messages) // 4
+
+
+def usage_record(response: Any, context: list[AnyMessage], started: float) -> dict:
+    """Usage of one ``llm_call``, from ``usage_metadata`` when available."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {
+        "input_tokens": usage.get("input_tokens", estimate_tokens(context)),
+        "output_tokens": usage.get("output_tokens", 0),
+        "context_messages": len(context),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def usage_update(response: Any, context: list[AnyMessage], started: float) -> dict:
+    """State update recording one ``llm_call`` in ``usage`` and ``usage_totals``."""
+    record = usage_record(response, context, started)
+    totals = {"llm_calls": 1, "input_tokens": record["input_tokens"], "output_tokens": record["output_tokens"]}
+    return {"usage": [record], "usage_totals": totals}
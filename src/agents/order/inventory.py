@@ -0,0 +1,282 @@
+"""In-memory inventory behind the order agent's tools.
+
+Products live in parallel arrays (``array`` module, one slot per SKU) instead
+of one object per product, so 100k+ SKUs stay compact. A dict maps
+normalized names to rows for exact lookups, and a sorted list of
+``(name, row)`` pairs supports prefix lookups with ``bisect``.
+
+Stock changes are atomic: each row is guarded by one of ``lock_stripes``
+locks, so orders for different products rarely contend and orders for the
+same product never oversell. ``reserve`` moves units from available to
+reserved stock; ``commit`` consumes and ``release`` returns them.
+``decrement`` (used by ``place_order``) is a single check-and-decrement.
+
+Catalogs are bulk loaded from CSV or JSON / JSONL with ``sku``, ``name``,
+``price`` and ``stock`` fields.
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import json
+import re
+import threading
+import unicodedata
+import uuid
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Case-fold, unicode-normalize and collapse whitespace."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", name).casefold()).strip()
+
+
+class InventoryError(Exception):
+    """Raised for unknown products, invalid quantities and insufficient stock."""
+
+
+@dataclass
+class ProductRecord:
+    """One catalog row as loaded from a file."""
+
+    sku: str
+    name: str
+    price: float
+    stock: int
+
+
+@dataclass
+class Reservation:
+    """Units held for an order until ``commit`` or ``release``."""
+
+    id: str
+    row: int
+    quantity: int
+
+
+class InventoryStore:
+    """Array-backed product store with exact and prefix name lookups.
+
+    With ``auto_register`` set, unknown product names are added on first
+    lookup with a stock level derived from the name, so that the demo works
+    with the free-form product names produced by product search while still
+    behaving like a real inventory afterwards.
+    """
+
+    def __init__(self, *, auto_register: bool = False, default_stock: int = 100, lock_stripes: int = 64) -> None:
+        self.auto_register = auto_register
+        self._default_stock = default_stock
+        self.skus: list[str] = []
+        self.names: list[str] = []
+        self.prices = array("d")
+        self.stock = array("q")
+        self.reserved = array("q")
+        self._by_name: dict[str, int] = {}
+        self._by_sku: dict[str, int] = {}
+        # (normalized name, row) pairs in name order, for prefix lookups
+        self._sorted: list[tuple[str, int]] = []
+        self._row_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._catalog_lock = threading.Lock()
+        self._reservations: dict[str, Reservation] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # -- loading -------------------------------------------------------------
+
+    def _upsert(self, record: ProductRecord, key: str) -> tuple[int, bool]:
+        """Insert or update one product under ``_catalog_lock``; returns ``(row, inserted)``."""
+        row = self._by_sku.get(record.sku)
+        if row is not None:
+            with self._lock_for(row):
+                self.prices[row] = record.price
+                self.stock[row] = record.stock
+            return row, False
+        row = len(self.names)
+        self.skus.append(record.sku)
+        self.names.append(record.name)
+        self.prices.append(record.price)
+        self.stock.append(record.stock)
+        self.reserved.append(0)
+        self._by_sku[record.sku] = row
+        self._by_name.setdefault(key, row)
+        return row, True
+
+    def add(self, record: ProductRecord) -> int:
+        """Insert or update one product and return its row."""
+        key = normalize_name(record.name)
+        with self._catalog_lock:
+            row, inserted = self._upsert(record, key)
+            if inserted:
+                bisect.insort(self._sorted, (key, row))
+        return row
+
+    def load(self, records: Iterable[ProductRecord]) -> int:
+        """Bulk insert ``records``; the prefix index is rebuilt once at the end."""
+        count = 0
+        with self._catalog_lock:
+            for record in records:
+                key = normalize_name(record.name)
+                row, inserted = self._upsert(record, key)
+                if inserted:
+                    self._sorted.append((key, row))
+                count += 1
+            self._sorted.sort()
+        return count
+
+    @classmethod
+    def from_file(cls, path: str | Path, **kwargs) -> InventoryStore:
+        store = cls(**kwargs)
+        store.load(read_catalog(path))
+        return store
+
+    # -- lookups -------------------------------------------------------------
+
+    def find(self, name: str) -> int | None:
+        """Row of the product called exactly ``name`` (normalized); ``prefix`` is for search."""
+        key = normalize_name(name)
+        row = self._by_name.get(key)
+        if row is not None:
+            return row
+        if self.auto_register and key:
+            return self._register(name.strip(), key)
+        return None
+
+    def _register(self, name: str, key: str) -> int:
+        """Auto-register ``name``; a concurrent registration of the same name keeps its stock.
+
+        The SKU is derived from the name's CRC32, with a ``-<n>`` suffix when
+        another product already has it.
+        """
+        checksum = zlib.crc32(key.encode())
+        with self._catalog_lock:
+            row = self._by_name.get(key)
+            if row is not None:
+                return row
+            sku = base = f"AUTO-{checksum:08X}"
+            suffix = 1
+            while sku in self._by_sku:
+                suffix += 1
+                sku = f"{base}-{suffix}"
+            record = ProductRecord(
+                sku=sku,
+                name=name,
+                price=_derived_price(key),
+                stock=checksum % (self._default_stock + 1),
+            )
+            row, _ = self._upsert(record, key)
+            bisect.insort(self._sorted, (key, row))
+        return row
+
+    def prefix(self, prefix: str, limit: int = 10) -> list[int]:
+        """Rows whose normalized name starts with ``prefix``, in name order."""
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        index = self._sorted
+        start = bisect.bisect_left(index, (key, -1))
+        rows: list[int] = []
+        for name, row in index[start : start + limit]:
+            if not name.startswith(key):
+                break
+            rows.append(row)
+        return rows
+
+    def snapshot(self, row: int) -> dict:
+        return {
+            "sku": self.skus[row],
+            "product_name": self.names[row],
+            "unit_price": self.prices[row],
+            "available_quantity": self.stock[row],
+            "in_stock": self.stock[row] > 0,
+        }
+
+    # -- stock changes -------------------------------------------------------
+
+    def _lock_for(self, row: int) -> threading.Lock:
+        return self._row_locks[row % len(self._row_locks)]
+
+    def _take(self, row: int, quantity: int, *, reserve: bool) -> None:
+        if quantity < 1:
+            raise InventoryError("quantity must be at least 1")
+        with self._lock_for(row):
+            available = self.stock[row]
+            if available < quantity:
+                raise InventoryError(
+                    f"insufficient stock for {self.names[row]!r}: {available} available, {quantity} requested"
+                )
+            self.stock[row] = available - quantity
+            if reserve:
+                self.reserved[row] += quantity
+
+    def decrement(self, row: int, quantity: int) -> None:
+        """Atomically remove ``quantity`` units, or raise ``InventoryError``."""
+        self._take(row, quantity, reserve=False)
+
+    def reserve(self, row: int, quantity: int) -> Reservation:
+        """Hold ``quantity`` units until ``commit``/``release``."""
+        self._take(row, quantity, reserve=True)
+        reservation = Reservation(id=uuid.uuid4().hex, row=row, quantity=quantity)
+        self._reservations[reservation.id] = reservation
+        return reservation
+
+    def commit(self, reservation_id: str) -> Reservation:
+        reservation = self._pop_reservation(reservation_id)
+        with self._lock_for(reservation.row):
+            self.reserved[reservation.row] -= reservation.quantity
+        return reservation
+
+    def release(self, reservation_id: str) -> Reservation:
+        reservation = self._pop_reservation(reservation_id)
+        with self._lock_for(reservation.row):
+            self.reserved[reservation.row] -= reservation.quantity
+            self.stock[reservation.row] += reservation.quantity
+        return reservation
+
+    def _pop_reservation(self, reservation_id: str) -> Reservation:
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            raise InventoryError(f"unknown reservation {reservation_id!r}")
+        return reservation
+
+
+def _derived_price(key: str) -> float:
+    """Stable pseudo-random price in 10.00–500.00 for auto-registered products."""
+    return round(10.0 + (zlib.adler32(key.encode()) % 49001) / 100, 2)
+
+
+# ---------------------------------------------------------------------------
+# Catalog files
+# ---------------------------------------------------------------------------
+
+
+def _record(raw: dict) -> ProductRecord:
+    return ProductRecord(
+        sku=str(raw["sku"]),
+        name=str(raw["name"]),
+        price=float(raw.get("price", 0.0)),
+        stock=int(raw.get("stock", 0)),
+    )
+
+
+def read_catalog(path: str | Path) -> Iterator[ProductRecord]:
+    """Yield products from a ``.csv``, ``.json`` (array) or ``.jsonl`` file."""
+    path = Path(path)
+    with path.open(encoding="utf-8", newline="") as fh:
+        if path.suffix == ".csv":
+            for raw in csv.DictReader(fh):
+                yield _record(raw)
+        elif path.suffix == ".jsonl":
+            for line in fh:
+                if line.strip():
+                    yield _record(json.loads(line))
+        else:
+            for raw in json.load(fh):
+                yield _record(raw)
@@ -0,0 +1,257 @@
+"""Durable append-only log of placed orders.
+
+Every confirmed order is appended to a single log file as one record::
+
+    <length: u32 LE> <crc32: u32 LE> <JSON payload>
+
+A background writer thread drains all pending records, writes them with one
+``write`` and makes them durable with one ``fsync`` (group commit); callers
+block until their batch is on disk. Under load many orders share one fsync,
+and a lone order is not delayed waiting for others.
+
+On open the log is scanned through ``mmap`` to rebuild the in-memory index
+(order ID and idempotency key -> file offset). A torn or corrupt tail left by
+a crash is truncated at the last valid record, so every acknowledged order
+survives and partial writes are dropped.
+
+``place_once`` makes order placement idempotent: a key seen before (in the
+log or in flight) returns the original confirmation instead of placing the
+order again.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")
+# Guard against interpreting garbage as a huge length during recovery
+_MAX_RECORD_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class LogStats:
+    """Counters exposed by ``OrderLog.stats``."""
+
+    records: int = 0
+    commits: int = 0
+    replays: int = 0
+    truncated_bytes: int = 0
+
+    @property
+    def records_per_commit(self) -> float:
+        return self.records / self.commits if self.commits else 0.0
+
+
+class OrderLog:
+    """Append-only order log with group commit and an idempotency index.
+
+    ``fsync=False`` skips the fsync (data reaches the OS page cache only);
+    it exists for benchmarks and tests, not for production use.
+    """
+
+    def __init__(self, path: str | Path, *, fsync: bool = True, max_batch: int = 1024) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fsync = fsync
+        self._max_batch = max_batch
+        self.stats = LogStats()
+        self._by_id: dict[str, int] = {}
+        self._by_key: dict[str, str] = {}
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        end = self._recover()
+        self._file = open(self.path, "a+b")
+        self._offset = end
+        self._queue: queue.SimpleQueue[tuple[bytes, dict, Future] | None] = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._run, name="order-log-writer", daemon=True)
+        self._writer.start()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # -- recovery ------------------------------------------------------------
+
+    def _recover(self) -> int:
+        """Index every valid record and truncate anything after the last one."""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            self.path.touch()
+            return 0
+        with open(self.path, "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                while offset + _HEADER.size <= size:
+                    length, checksum = _HEADER.unpack_from(data, offset)
+                    start = offset + _HEADER.size
+                    if length > _MAX_RECORD_BYTES or start + length > size:
+                        break
+                    payload = data[start : start + length]
+                    if zlib.crc32(payload) != checksum:
+                        break
+                    self._index(json.loads(payload), offset)
+                    offset = start + length
+            if offset < size:
+                logger.warning("Truncating %d bytes of torn/corrupt tail from %s", size - offset, self.path)
+                self.stats.truncated_bytes = size - offset
+                f.truncate(offset)
+                os.fsync(f.fileno())
+        return offset
+
+    def _index(self, record: dict, offset: int) -> None:
+        self._by_id[record["order_id"]] = offset
+        if record.get("key"):
+            self._by_key[record["key"]] = record["order_id"]
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self, order_id: str) -> dict | None:
+        """The logged record of ``order_id``, read from disk by offset."""
+        offset = self._by_id.get(order_id)
+        if offset is None:
+            return None
+        fd = self._file.fileno()
+        length, _ = _HEADER.unpack(os.pread(fd, _HEADER.size, offset))
+        return json.loads(os.pread(fd, length, offset + _HEADER.size))
+
+    def lookup_key(self, key: str) -> dict | None:
+        order_id = self._by_key.get(key)
+        return self.get(order_id) if order_id is not None else None
+
+    # -- writes --------------------------------------------------------------
+
+    def append_async(self, order_id: str, confirmation: dict, *, key: str | None = None) -> Future:
+        """Queue one record; the future resolves once it is durable."""
+        record = {"order_id": order_id, "key": key, "ts": time.time(), "confirmation": confirmation}
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        future: Future = Future()
+        self._queue.put((payload, record, future))
+        return future
+
+    def append(self, order_id: str, confirmation: dict, *, key: str | None = None) -> None:
+        self.append_async(order_id, confirmation, key=key).result()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # Group commit: take everything that queued up during the last fsync
+            while len(batch) < self._max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list[tuple[bytes, dict, Future]]) -> None:
+        chunks = []
+        offsets = []
+        offset = self._offset
+        for payload, _, _ in batch:
+            offsets.append(offset)
+            chunks.append(_HEADER.pack(len(payload), zlib.crc32(payload)))
+            chunks.append(payload)
+            offset += _HEADER.size + len(payload)
+        try:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+        except Exception as e:
+            logger.exception("Order log commit failed")
+            for _, _, future in batch:
+                future.set_exception(e)
+            # Drop whatever part of the batch may have been written
+            self._file.truncate(self._offset)
+            return
+        self._offset = offset
+        with self._lock:
+            for (_, record, _), record_offset in zip(batch, offsets):
+                self._index(record, record_offset)
+        self.stats.records += len(batch)
+        self.stats.commits += 1
+        for _, _, future in batch:
+            future.set_result(None)
+
+    # -- idempotent placement ------------------------------------------------
+
+    def _claim(self, key: str) -> tuple[dict | None, Future | None, Future | None]:
+        """``(logged confirmation, in-flight future, own future)`` for ``key``."""
+        with self._lock:
+            order_id = self._by_key.get(key)
+            if order_id is not None:
+                return self.get(order_id)["confirmation"], None, None
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                return None, pending, None
+            own: Future = Future()
+            self._in_flight[key] = own
+            return None, None, own
+
+    def _settle(self, key: str, own: Future, confirmation: dict | None, error: BaseException | None) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            own.set_exception(error)
+        else:
+            own.set_result(confirmation)
+
+    def place_once(self, key: str, place: Callable[[], dict]) -> dict:
+        """Run ``place`` at most once per ``key`` and log confirmed orders.
+
+        ``place`` returns the confirmation dict; only results with
+        ``status == "confirmed"`` are logged (and therefore replayed), so a
+        rejected order can be retried with the same key.
+        """
+        logged, pending, own = self._claim(key)
+        if logged is not None:
+            self.stats.replays += 1
+            return logged
+        if pending is not None:
+            self.stats.replays += 1
+            return pending.result()
+        try:
+            confirmation = place()
+            if confirmation.get("status") == "confirmed":
+                self.append(confirmation["order_id"], confirmation, key=key)
+        except BaseException as e:
+            self._settle(key, own, None, e)
+            raise
+        self._settle(key, own, confirmation, None)
+        return confirmation
+
+    def close(self) -> None:
+        """Flush pending records and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._file.close()
+
+
+def idempotency_key(conversation_id: str | None, tool_call_id: str) -> str:
+    """Stable key for one tool call of one conversation.
+
+    Replaying the same tool call (graph retry, resumed run) yields the same
+    key; a new tool call in the same conversation yields a new one.
+    """
+    return f"{conversation_id or '-'}:{tool_call_id}"
@@ -0,0 +1,95 @@
+"""Plan-and-execute mode for the order agent.
+
+In the default tool loop an order takes at least three model calls, each
+re-sending the history: ``check_inventory``, ``place_order``, then the
+confirmation. In plan mode the model gets a composite
+``check_and_place_order`` tool instead of ``place_order``. The tool checks
+the stock and places the order without a model call in between, and the
+edge after the tool node goes to a ``confirm`` node, which renders the
+confirmation from the tool results. An order then takes one model call.
+Tool results the template does not cover (other tools, errors, timeouts)
+go back to the model as before.
+
+``max_llm_calls`` caps the ``llm_call`` invocations per conversation,
+counted in ``usage_totals`` in graph state (summaries are not counted).
+Once reached, ``llm_call`` answers with ``LIMIT_REPLY`` without calling the
+model.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+
+from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+
+COMPOSITE_TOOL = "check_and_place_order"
+
+LIMIT_REPLY = (
+    "I'm sorry, this conversation has reached its limit of assistant requests. "
+    "Please start a new conversation to continue."
+)
+
+
+@dataclass
+class PlanPolicy:
+    """Plan mode on/off and the per-conversation ``llm_call`` cap (0: none)."""
+
+    enabled: bool = False
+    max_llm_calls: int = 0
+
+    @classmethod
+    def from_env(cls) -> PlanPolicy:
+        return cls(
+            enabled=os.getenv("ORDER_PLAN_MODE", "off").lower() != "off",
+            max_llm_calls=int(os.getenv("ORDER_MAX_LLM_CALLS", "0")),
+        )
+
+    def over_budget(self, state: dict) -> bool:
+        calls = (state.get("usage_totals") or {}).get("llm_calls", 0)
+        return bool(self.max_llm_calls) and calls >= self.max_llm_calls
+
+
+def last_tool_results(messages: list[AnyMessage]) -> list[ToolMessage]:
+    """Tool results of the most recent tool step."""
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        results.append(message)
+    return results[::-1]
+
+
+def composite_results(messages: list[AnyMessage]) -> list[dict] | None:
+    """Results of the last tool step if all of them came from ``check_and_place_order``."""
+    results = last_tool_results(messages)
+    if not results or any(r.name != COMPOSITE_TOOL or r.status == "error" for r in results):
+        return None
+    try:
+        return [json.loads(r.content) for r in results]
+    except (TypeError, ValueError):
+        return None
+
+
+def _confirmation_line(result: dict) -> str:
+    name = result.get("product_name", "the product")
+    quantity = result.get("quantity")
+    status = result.get("status")
+    if status == "confirmed":
+        return (
+            f"Your order is confirmed: {quantity} × {name} at {result['unit_price']:.2f} each, "
+            f"{result['total_price']:.2f} in total. Order ID {result['order_id']}, estimated delivery in "
+            f"{result['estimated_delivery_days']} days."
+        )
+    if status == "not_found":
+        return f"I couldn't find {name} in our inventory."
+    available = result.get("available_quantity")
+    if available is not None:
+        return f"I couldn't order {quantity} × {name}: only {available} available."
+    return f"I couldn't order {quantity} × {name}: {result.get('error', 'the order was rejected')}."
+
+
+def confirmation_message(results: list[dict]) -> AIMessage:
+    """Deterministic reply for the results of ``check_and_place_order``."""
+    return AIMessage(content="\n".join(_confirmation_line(result) for result in results))
@@ -2,31 +2,54 @@
 """Product Search Agent.
 
 Generates fictional product results based on user search queries.
+
+With ``PRODUCT_SEARCH_TOP_K`` above 1 (or ``top_k=k``, or a
+``{"product_search": {"query": ..., "top_k": k}}`` message) one LLM call
+returns a page of up to k products; ``run_stream``
+emits each product as soon as it is validated, and the page's
+``next_cursor`` continues the search without repeating products
+(``pages.py``).
 """
 
 from __future__ import annotations
 
+import atexit
 import json
-from collections.abc import AsyncIterable
+import os
+import sys
+import time
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator
+from contextlib import aclosing
 from pathlib import Path
 from typing import Any
 
-from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 from agent_framework import (
     AgentRunResponse,
     AgentRunResponseUpdate,
     AgentThread,
     BaseAgent,
+    ChatClientProtocol,
     ChatMessage,
     Role,
     TextContent,
 )
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.ai.agentserver.agentframework import from_agent_framework
 
+# Shared helpers live in src/common; the container build stages a copy next to agent.py
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common.azure_clients import get_client_pool  # noqa: E402
+from common.json_stream import JsonArrayStreamParser, JsonObjectStreamParser  # noqa: E402
+from common.single_flight import SingleFlight, flight_key  # noqa: E402
+from common.startup import LazyClient, azure_openai_warmup, serve  # noqa: E402
+from common.structured_output import StructuredOutput, StructuredOutputError  # noqa: E402
+from common.telemetry import Telemetry, configure_telemetry, usage_counts  # noqa: E402
+from common.thread_store import ThreadStore, ensure_stored, get_thread_store  # noqa: E402
+
+from pages import PageCursor, PageRequestError, envelope, product_key
+from semantic_cache import AzureOpenAIEmbedder, HashingEmbedder, SemanticCache
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -38,6 +61,24 @@ Output ONLY valid JSON, no markdown, no extra text:
 {"name": "<product name>", "price": "<X.XX€>", "description": "<short description>"}
 """
 
+_TOP_K_SYSTEM_PROMPT: str = """\
+You are a product generator. Generate different products based on a online search with your tool, taking the user's promt as search query.
+Return as many products as the user asks for, most relevant first, and never one that the user has already seen.
+Output ONLY valid JSON, no markdown, no extra text:
+{"products": [{"name": "<product name>", "price": "<X.XX€>", "description": "<short description>"}]}
+"""
+
+# Product fields streamed individually by run_stream, with their fallbacks
+_PRODUCT_DEFAULTS: dict[str, str] = {
+    "name": "Product",
+    "price": "0.00€",
+    "description": "A great product.",
+}
+
+_DEFAULT_CACHE_THRESHOLD = 0.92
+_DEFAULT_CACHE_MAX_ENTRIES = 4096
+_DEFAULT_MAX_K = 10
+
 
 # ---------------------------------------------------------------------------
 # Structured Output Models
@@ -59,6 +100,21 @@ class ProductSearchOutput(BaseModel):
     product: Product = Field(description="The generated product.")
 
 
+class ProductList(BaseModel):
+    """Structured output requested from the LLM in top-k mode."""
+
+    products: list[Product] = Field(description="The generated products, most relevant first.")
+
+
+class ProductSearchPage(BaseModel):
+    """One page of top-k product search results."""
+
+    products: list[Product] = Field(description="Products of this page, without repeats of earlier pages.")
+    next_cursor: str | None = Field(description="Cursor of the next page; null once a page finds nothing new.")
+    human_readable: str = Field(description="A user-friendly summary of the page.")
+    error: str | None = Field(default=None, description="Why the request was rejected (bad cursor or top_k).")
+
+
 # ---------------------------------------------------------------------------
 # Agent
 # ---------------------------------------------------------------------------
@@ -72,6 +128,14 @@ class ProductSearchAgent(BaseAgent):
         *,
         name: str | None = None,
         description: str | None = None,
+        chat_client: ChatClientProtocol | None = None,
+        semantic_cache: SemanticCache | None = None,
+        telemetry: Telemetry | None = None,
+        structured_output: StructuredOutput[Product] | None = None,
+        single_flight: SingleFlight[ProductSearchOutput] | None = None,
+        thread_store: ThreadStore | None = None,
+        top_k: int | None = None,
+        max_k: int | None = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(
@@ -79,11 +143,47 @@ class ProductSearchAgent(BaseAgent):
             description=description or "Searches for products based on user queries.",
             **kwargs,
         )
-        self._chat_client = AzureOpenAIChatClient(
-            credential=DefaultAzureCredential(),
-            api_version="2024-05-01-preview",
+        # Built on first use or during the start-up warm-up (see common/startup.py)
+        self._chat_client = chat_client or LazyClient(
+            lambda: get_client_pool().chat_client(), warm=True
+        )
+
+        # Results of similar earlier queries, looked up before calling the LLM
+        self._semantic_cache = semantic_cache if semantic_cache is not None else self._default_semantic_cache()
+
+        # Spans and token/parse-failure metrics (AGENT_TELEMETRY*)
+        self._telemetry = telemetry or configure_telemetry("product-search")
+
+        # Schema-constrained product output with one repair attempt (STRUCTURED_OUTPUT*)
+        self.structured_output = structured_output or StructuredOutput.from_env(
+            Product, self._chat_client, agent=self.name, telemetry=self._telemetry
         )
 
+        # Identical concurrent queries share one LLM call (SINGLE_FLIGHT)
+        if single_flight is None and os.getenv("SINGLE_FLIGHT", "on").lower() != "off":
+            single_flight = SingleFlight(agent=self.name, telemetry=self._telemetry)
+        self.single_flight = single_flight
+
+        # Conversation threads (THREAD_STORE_*); the process-wide store by default
+        self._thread_store = thread_store
+
+        # Products per plain-text request (1: a single ProductSearchOutput) and the page size limit
+        self.max_k = max_k if max_k is not None else int(os.getenv("PRODUCT_SEARCH_MAX_K", _DEFAULT_MAX_K))
+        self.top_k = top_k if top_k is not None else int(os.getenv("PRODUCT_SEARCH_TOP_K", "1"))
+        self.list_output = StructuredOutput.from_env(
+            ProductList, self._chat_client, agent=self.name, telemetry=self._telemetry
+        )
+
+    def get_new_thread(self, *, thread_id: str | None = None, **kwargs: Any) -> AgentThread:
+        """A new thread whose messages live in the thread store (``THREAD_STORE_*``).
+
+        ``thread_id`` resumes a stored conversation, e.g. after a restart.
+        """
+        store = self._thread_store if self._thread_store is not None else get_thread_store()
+        if store is None or "service_thread_id" in kwargs or "message_store" in kwargs:
+            return super().get_new_thread(**kwargs)
+        return super().get_new_thread(message_store=store.message_store(thread_id), **kwargs)
+
     async def run(
         self,
         messages: str | ChatMessage | list[str] | list[ChatMessage] | None = None,
@@ -94,33 +194,12 @@ class ProductSearchAgent(BaseAgent):
         normalized = self._normalize_messages(messages)
         user_text = normalized[-1].text if normalized else "something useful"
 
-        # Call LLM to generate product
-        llm_messages = [
-            ChatMessage(role=Role.SYSTEM, text=_SYSTEM_PROMPT),
-            ChatMessage(role=Role.USER, text=user_text),
-        ]
-        response = await self._chat_client.get_response(messages=llm_messages)
-
-        # Extract response text
-        if hasattr(response, 'messages') and response.messages:
-            raw = response.messages[-1].text or ""
-        elif hasattr(response, 'message'):
-            raw = response.message.text or ""
+        try:
+            query, cursor = self._page_request(user_text, **kwargs)
+        except PageRequestError as e:
+            output = self._error_page(e)
         else:
-            raw = str(response)
-
-        # Parse JSON response
-        parsed = json.loads(raw.strip())
-        product = Product(
-            name=parsed.get("name", "Product"),
-            price=parsed.get("price", "0.00€"),
-            description=parsed.get("description", "A great product."),
-        )
-
-        output = ProductSearchOutput(
-            human_readable=f"Found: **{product.name}** at {product.price}. {product.description}",
-            product=product,
-        )
+            output = await self.search(query) if cursor is None else await self.search_page(cursor)
 
         response_message = ChatMessage(
             role=Role.ASSISTANT,
@@ -132,6 +211,103 @@ class ProductSearchAgent(BaseAgent):
 
         return AgentRunResponse(messages=[response_message])
 
+    @property
+    def semantic_cache(self) -> SemanticCache | None:
+        """The result cache (``PRODUCT_CACHE``), or ``None`` when it is off."""
+        return self._semantic_cache
+
+    async def save_cache(self) -> None:
+        """Persist the semantic cache (``PRODUCT_CACHE_PATH``), e.g. when a batch ends."""
+        if self._semantic_cache is not None:
+            await self._semantic_cache.flush()
+
+    async def search(self, user_text: str) -> ProductSearchOutput:
+        """Return the validated product for one query (cache first, then the LLM).
+
+        Concurrent identical queries share one LLM call (see ``single_flight``).
+        """
+        output = await self._cached_output(user_text)
+        if output is not None:
+            return output
+        if self.single_flight is None:
+            return await self._generate(user_text)
+        return await self.single_flight.do(flight_key(user_text, _SYSTEM_PROMPT), lambda: self._generate(user_text))
+
+    @classmethod
+    def prompt_chars(cls, user_text: str) -> int:
+        """Length of the prompt ``search`` sends for ``user_text`` (for token estimates)."""
+        return sum(len(message.text or "") for message in cls._llm_messages(user_text))
+
+    async def search_page(self, cursor: PageCursor) -> ProductSearchPage:
+        """Return one page of up to ``cursor.k`` new products (see ``stream_page``)."""
+        products = [product async for product in self.stream_page(cursor)]
+        return self._page_for(cursor, products)
+
+    async def stream_page(self, cursor: PageCursor) -> AsyncIterator[Product]:
+        """Yield up to ``cursor.k`` products for ``cursor.query`` from one LLM call.
+
+        Each product is yielded as soon as its object in the model output is
+        complete and valid. Invalid products and repeats (of this page or the
+        names in ``cursor.seen``) are skipped; the stream stops once ``k``
+        products are out. Malformed output is repaired once the whole
+        response is in. Top-k pages are neither cached nor coalesced.
+        """
+        seen = cursor.seen_keys()
+        emitted = 0
+        parser = JsonArrayStreamParser("products")
+        raw = ""
+        malformed = False
+        started = time.perf_counter()
+        # Not made current: the span stays open across the yields below
+        span = self._telemetry.start_span(
+            "llm_call", **{"gen_ai.agent.name": self.name, "streaming": True, "top_k": cursor.k}
+        )
+        try:
+            stream = self._chat_client.get_streaming_response(
+                messages=self._page_messages(cursor), **self.list_output.request_options()
+            )
+            # Closed as soon as k products are out, which ends the generation
+            async with aclosing(stream):
+                async for chunk in stream:
+                    raw += chunk.text or ""
+                    if malformed:
+                        continue
+                    try:
+                        items = parser.feed_items(chunk.text or "")
+                    except ValueError:
+                        # Malformed output; repaired once the whole response is in
+                        malformed = True
+                        continue
+                    for item in items:
+                        product = self._page_product(item, seen)
+                        if product is None:
+                            continue
+                        yield product
+                        emitted += 1
+                        if emitted == cursor.k:
+                            return
+        finally:
+            span.end()
+            self._telemetry.record_llm(self.name, time.perf_counter() - started)
+
+        if not malformed and parser.done:
+            return
+        try:
+            repaired = await self.list_output.parse(raw)
+        except StructuredOutputError:
+            # Products already streamed still make a (short) page
+            if emitted:
+                return
+            raise
+        for product in repaired.products:
+            product = self._page_product(product.model_dump(), seen)
+            if product is None:
+                continue
+            yield product
+            emitted += 1
+            if emitted == cursor.k:
+                return
+
     async def run_stream(
         self,
         messages: str | ChatMessage | list[str] | list[ChatMessage] | None = None,
@@ -139,10 +315,321 @@ class ProductSearchAgent(BaseAgent):
         thread: AgentThread | None = None,
         **kwargs: Any,
     ) -> AsyncIterable[AgentRunResponseUpdate]:
-        full = await self.run(messages=messages, thread=thread, **kwargs)
-        if full.messages:
-            msg = full.messages[0]
-            yield AgentRunResponseUpdate(contents=msg.contents, role=msg.role)
+        """Stream the product as the model generates it.
+
+        One update is emitted per product field (``name``, ``price``,
+        ``description``) as soon as the field is complete in the model output,
+        followed by a final update carrying the validated output. The text of
+        all updates concatenates to a valid ``ProductSearchOutput`` JSON.
+        A cache hit emits the same updates without calling the model.
+
+        In top-k mode (see ``_page_request``) one update is emitted per
+        product instead, followed by a final update with the
+        ``ProductSearchPage``; the text of all updates concatenates to its
+        JSON.
+        """
+        normalized = self._normalize_messages(messages)
+        user_text = normalized[-1].text if normalized else "something useful"
+
+        try:
+            user_text, cursor = self._page_request(user_text, **kwargs)
+        except PageRequestError as e:
+            page = self._error_page(e)
+            yield AgentRunResponseUpdate(
+                contents=[TextContent(text=page.model_dump_json())],
+                role=Role.ASSISTANT,
+                message_id=uuid.uuid4().hex,
+                additional_properties={"product_search_page": page.model_dump()},
+            )
+            if thread is not None:
+                response_message = ChatMessage(role=Role.ASSISTANT, contents=[TextContent(text=page.model_dump_json())])
+                await self._notify_thread_of_new_messages(thread, normalized, response_message)
+            return
+        if cursor is not None:
+            async for update in self._run_stream_page(cursor, normalized, thread):
+                yield update
+            return
+
+        message_id = uuid.uuid4().hex
+        fields: dict[str, str] = {}
+
+        output = await self._cached_output(user_text)
+        if output is not None:
+            for key in _PRODUCT_DEFAULTS:
+                fields[key] = getattr(output.product, key)
+                yield self._field_update(key, fields[key], first=len(fields) == 1, message_id=message_id)
+        else:
+            parser = JsonObjectStreamParser()
+            raw = ""
+            malformed = False
+            started = time.perf_counter()
+            # Not made current: the span stays open across the yields below
+            span = self._telemetry.start_span("llm_call", **{"gen_ai.agent.name": self.name, "streaming": True})
+            try:
+                async for chunk in self._chat_client.get_streaming_response(
+                    messages=self._llm_messages(user_text), **self.structured_output.request_options()
+                ):
+                    raw += chunk.text or ""
+                    if malformed:
+                        continue
+                    try:
+                        members = parser.feed(chunk.text or "")
+                    except ValueError:
+                        # Malformed output; repaired once the whole response is in
+                        malformed = True
+                        continue
+                    for key, value in members:
+                        if key not in _PRODUCT_DEFAULTS or key in fields or value is None:
+                            continue
+                        fields[key] = value if isinstance(value, str) else str(value)
+                        yield self._field_update(key, fields[key], first=len(fields) == 1, message_id=message_id)
+            finally:
+                span.end()
+                self._telemetry.record_llm(self.name, time.perf_counter() - started)
+
+            complete = not malformed and parser.done
+            if complete:
+                output = self._build_output(fields)
+            else:
+                # Fields already streamed stay as emitted so the text remains consistent
+                repaired = await self.structured_output.parse(raw)
+                output = self._build_output({**repaired.model_dump(), **fields})
+            # Answers with defaulted fields are not worth reusing
+            if not complete or len(fields) == len(_PRODUCT_DEFAULTS):
+                await self._remember(user_text, output)
+
+        # Close the product with any defaulted fields, then add the summary
+        tail = "".join(
+            self._member_fragment(key, getattr(output.product, key), first=not fields and i == 0)
+            for i, key in enumerate(k for k in _PRODUCT_DEFAULTS if k not in fields)
+        )
+        tail += "}," + json.dumps("human_readable") + ":" + json.dumps(output.human_readable, ensure_ascii=False) + "}"
+        yield AgentRunResponseUpdate(
+            contents=[TextContent(text=tail)],
+            role=Role.ASSISTANT,
+            message_id=message_id,
+            additional_properties={"product_search_output": output.model_dump()},
+        )
+
+        if thread is not None:
+            response_message = ChatMessage(
+                role=Role.ASSISTANT,
+                contents=[TextContent(text=output.model_dump_json())],
+            )
+            await self._notify_thread_of_new_messages(thread, normalized, response_message)
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _page_request(
+        self, user_text: str, *, top_k: int | None = None, cursor: str | None = None, **kwargs: Any
+    ) -> tuple[str, PageCursor | None]:
+        """The query of a message and its page, or ``None`` for a single-product search.
+
+        Paging is only requested through the ``top_k``/``cursor`` keywords or
+        a ``{"product_search": {...}}`` message (``pages.envelope``); other
+        messages are plain queries. ``cursor`` continues a search; ``top_k``
+        (else ``PRODUCT_SEARCH_TOP_K``) above 1 starts one, capped at
+        ``max_k``. Raises ``PageRequestError`` for a bad cursor, ``query`` or
+        ``top_k``.
+        """
+        request = envelope(user_text)
+        if request is not None:
+            cursor = cursor or request.get("cursor")
+            if top_k is None:
+                top_k = request.get("top_k")
+            query = request.get("query", user_text)
+            if not isinstance(query, str):
+                raise PageRequestError(f"query must be a string, got {query!r}")
+            user_text = query
+        if cursor:
+            page = PageCursor.decode(cursor)
+        else:
+            if top_k is None:
+                top_k = self.top_k
+            elif type(top_k) is not int:
+                raise PageRequestError(f"top_k must be a whole number, got {top_k!r}")
+            if top_k <= 1:
+                return user_text, None
+            page = PageCursor(user_text, top_k)
+        page.k = max(1, min(page.k, self.max_k))
+        return page.query, page
+
+    async def _run_stream_page(
+        self, cursor: PageCursor, normalized: list[ChatMessage], thread: AgentThread | None
+    ) -> AsyncIterator[AgentRunResponseUpdate]:
+        message_id = uuid.uuid4().hex
+        products: list[Product] = []
+        async for product in self.stream_page(cursor):
+            text = ('{"products":[' if not products else ",") + product.model_dump_json()
+            products.append(product)
+            yield AgentRunResponseUpdate(
+                contents=[TextContent(text=text)],
+                role=Role.ASSISTANT,
+                message_id=message_id,
+                additional_properties={"product": product.model_dump(), "index": len(products) - 1},
+            )
+
+        page = self._page_for(cursor, products)
+        tail = ('{"products":[' if not products else "") + "],"
+        tail += json.dumps("next_cursor") + ":" + json.dumps(page.next_cursor) + ","
+        tail += json.dumps("human_readable") + ":" + json.dumps(page.human_readable, ensure_ascii=False) + "}"
+        yield AgentRunResponseUpdate(
+            contents=[TextContent(text=tail)],
+            role=Role.ASSISTANT,
+            message_id=message_id,
+            additional_properties={"product_search_page": page.model_dump()},
+        )
+
+        if thread is not None:
+            response_message = ChatMessage(role=Role.ASSISTANT, contents=[TextContent(text=page.model_dump_json())])
+            await self._notify_thread_of_new_messages(thread, normalized, response_message)
+
+    def _page_product(self, item: Any, seen: set[str]) -> Product | None:
+        """``item`` as a product unless it is invalid or already in ``seen`` (which it joins)."""
+        try:
+            with self._telemetry.span("validate"):
+                product = Product.model_validate(item)
+        except ValidationError:
+            self._telemetry.record_parse_failure(self.name, "validation")
+            return None
+        key = product_key(product.name)
+        if key in seen:
+            return None
+        seen.add(key)
+        return product
+
+    @staticmethod
+    def _page_messages(cursor: PageCursor) -> list[ChatMessage]:
+        text = f"{cursor.query}\n\nReturn up to {cursor.k} products."
+        if cursor.seen:
+            text += "\nAlready seen: " + "; ".join(cursor.seen)
+        return [
+            ChatMessage(role=Role.SYSTEM, text=_TOP_K_SYSTEM_PROMPT),
+            ChatMessage(role=Role.USER, text=text),
+        ]
+
+    @staticmethod
+    def _error_page(error: PageRequestError) -> ProductSearchPage:
+        return ProductSearchPage(
+            products=[],
+            next_cursor=None,
+            human_readable=f"Sorry, I couldn't read that search request: {error}",
+            error=str(error),
+        )
+
+    @staticmethod
+    def _page_for(cursor: PageCursor, products: list[Product]) -> ProductSearchPage:
+        if not products:
+            return ProductSearchPage(products=[], next_cursor=None, human_readable="No further products found.")
+        found = ", ".join(f"**{product.name}** at {product.price}" for product in products)
+        return ProductSearchPage(
+            products=products,
+            next_cursor=cursor.next([product.name for product in products]).encode(),
+            human_readable=f"Found {len(products)} product{'s' if len(products) > 1 else ''}: {found}.",
+        )
+
+    async def _notify_thread_of_new_messages(self, thread, input_messages, response_messages) -> None:
+        # Threads created without get_new_thread would otherwise keep messages in memory
+        ensure_stored(thread, self._thread_store)
+        with self._telemetry.span("thread_notify"):
+            await super()._notify_thread_of_new_messages(thread, input_messages, response_messages)
+
+    async def _generate(self, user_text: str) -> ProductSearchOutput:
+        """Call the LLM for one query and cache the validated product."""
+        with self._telemetry.llm_call(self.name) as span:
+            response = await self._chat_client.get_response(
+                messages=self._llm_messages(user_text), **self.structured_output.request_options()
+            )
+            self._telemetry.record_usage(self.name, *usage_counts(response), span=span)
+
+        # Extract response text
+        if hasattr(response, 'messages') and response.messages:
+            raw = response.messages[-1].text or ""
+        elif hasattr(response, 'message'):
+            raw = response.message.text or ""
+        else:
+            raw = str(response)
+
+        # One validating parse; raises StructuredOutputError if the repair fails too
+        output = self._output_for(await self.structured_output.parse(raw))
+        await self._remember(user_text, output)
+        return output
+
+    @staticmethod
+    def _default_semantic_cache() -> SemanticCache | None:
+        """Build the result cache from the ``PRODUCT_CACHE_*`` settings."""
+        # Opt-in: a hit answers with the product of a similar, not the same, query
+        if os.getenv("PRODUCT_CACHE", "off").lower() != "on":
+            return None
+
+        deployment = os.getenv("PRODUCT_CACHE_EMBEDDING_DEPLOYMENT")
+        if deployment:
+            embedder = AzureOpenAIEmbedder(
+                LazyClient(lambda: get_client_pool().openai_client(), warm=True),
+                deployment,
+                int(os.getenv("PRODUCT_CACHE_EMBEDDING_DIMENSIONS", "1536")),
+            )
+        else:
+            embedder = HashingEmbedder()
+        cache = SemanticCache(
+            embedder,
+            threshold=float(os.getenv("PRODUCT_CACHE_THRESHOLD", _DEFAULT_CACHE_THRESHOLD)),
+            max_entries=int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", _DEFAULT_CACHE_MAX_ENTRIES)),
+            path=os.getenv("PRODUCT_CACHE_PATH") or None,
+            prompt=_SYSTEM_PROMPT,
+        )
+        atexit.register(cache.save)
+        return cache
+
+    async def _cached_output(self, user_text: str) -> ProductSearchOutput | None:
+        if self._semantic_cache is None:
+            return None
+        cached = await self._semantic_cache.get(user_text)
+        return ProductSearchOutput.model_validate_json(cached) if cached is not None else None
+
+    async def _remember(self, user_text: str, output: ProductSearchOutput) -> None:
+        if self._semantic_cache is not None:
+            await self._semantic_cache.set(user_text, output.model_dump_json())
+
+    def _field_update(self, key: str, value: str, *, first: bool, message_id: str) -> AgentRunResponseUpdate:
+        return AgentRunResponseUpdate(
+            contents=[TextContent(text=self._member_fragment(key, value, first=first))],
+            role=Role.ASSISTANT,
+            message_id=message_id,
+            additional_properties={"product_field": {key: value}},
+        )
+
+    @staticmethod
+    def _llm_messages(user_text: str) -> list[ChatMessage]:
+        return [
+            ChatMessage(role=Role.SYSTEM, text=_SYSTEM_PROMPT),
+            ChatMessage(role=Role.USER, text=user_text),
+        ]
+
+    def _build_output(self, parsed: dict[str, Any]) -> ProductSearchOutput:
+        """Validate the model's product fields, filling in defaults."""
+        try:
+            with self._telemetry.span("validate"):
+                product = Product(**{key: parsed.get(key, default) for key, default in _PRODUCT_DEFAULTS.items()})
+        except ValidationError:
+            self._telemetry.record_parse_failure(self.name, "validation")
+            raise
+        return self._output_for(product)
+
+    @staticmethod
+    def _output_for(product: Product) -> ProductSearchOutput:
+        return ProductSearchOutput(
+            human_readable=f"Found: **{product.name}** at {product.price}. {product.description}",
+            product=product,
+        )
+
+    @staticmethod
+    def _member_fragment(key: str, value: str, *, first: bool) -> str:
+        """JSON text for one product member of the streamed output object."""
+        prefix = '{"product":{' if first else ","
+        return prefix + json.dumps(key) + ":" + json.dumps(value, ensure_ascii=False)
 
 
 # ---------------------------------------------------------------------------
@@ -152,9 +639,12 @@ class ProductSearchAgent(BaseAgent):
 if __name__ == "__main__":
     workspace_root = Path(__file__).resolve().parent.parent.parent.parent
     load_dotenv(dotenv_path=workspace_root / ".env", override=True)
-    
+
+    from azure.ai.agentserver.agentframework import from_agent_framework
+
     agent = ProductSearchAgent(
         name="product-search",
         description="Searches for products based on user queries.",
+        telemetry=configure_telemetry("product-search", deferred=True),
     )
-    from_agent_framework(agent).run()
+    serve(from_agent_framework(agent), azure_openai_warmup(preload=("agent_framework.azure",)))
@@ -0,0 +1,275 @@
+# Copyright (c) Microsoft. All rights reserved.
+"""Offline batch mode for the product search agent.
+
+Reads queries from a JSONL file (or stdin), runs them through
+``ProductSearchAgent.search`` with bounded concurrency and an optional rate
+limit, and appends one result record per query to the output JSONL as soon
+as it finishes (so output order follows completion order).
+
+Input lines are either a JSON string or an object with ``query`` and an
+optional ``id`` (defaults to the line number)::
+
+    {"id": "sku-42", "query": "oak dining table"}
+
+Output records carry ``id``, ``query`` and either ``output`` (a
+``ProductSearchOutput``) or ``error``. The ids of successful queries are
+appended to a progress file; rerunning the same command skips them, so an
+interrupted batch resumes where it stopped and failed queries are retried.
+A crash between writing a result and its progress line can duplicate that
+one record, so consumers should key results on ``id``.
+
+Usage::
+
+    python batch.py queries.jsonl -o results.jsonl --concurrency 16 --rate 20
+    cat queries.jsonl | python batch.py - -o results.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class BatchItem:
+    """One query of the batch."""
+
+    id: str
+    query: str
+
+
+def parse_item(line: str, number: int) -> BatchItem | None:
+    """Parse one JSONL line; blank and malformed lines yield ``None``."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        logger.warning("Skipping malformed line %d", number)
+        return None
+    if isinstance(record, str):
+        record = {"query": record}
+    if not isinstance(record, dict) or not record.get("query"):
+        logger.warning("Skipping line %d without a query", number)
+        return None
+    return BatchItem(id=str(record.get("id", number)), query=str(record["query"]))
+
+
+async def _aiter_lines(stream: IO[str]) -> AsyncIterator[str]:
+    """Read lines without blocking the event loop (stdin may be a slow pipe)."""
+    while True:
+        line = await asyncio.to_thread(stream.readline)
+        if not line:
+            return
+        yield line
+
+
+def load_progress(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` acquisitions per second with ``burst``."""
+
+    def __init__(self, rate: float, burst: int | None = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._capacity = float(burst or max(1, int(rate)))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class BatchStats:
+    """Totals reported at the end of a batch."""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    latencies: list[float] = field(default_factory=list, repr=False)
+
+    @property
+    def throughput(self) -> float:
+        done = self.succeeded + self.failed
+        return done / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> str:
+        return (
+            f"succeeded={self.succeeded} failed={self.failed} skipped={self.skipped} "
+            f"elapsed={self.elapsed:.1f}s throughput={self.throughput:.2f}/s "
+            f"p50={self.percentile(50) * 1000:.0f}ms p95={self.percentile(95) * 1000:.0f}ms"
+        )
+
+
+async def run_batch(
+    agent: Any,
+    lines: AsyncIterator[str],
+    output: IO[str],
+    *,
+    progress: IO[str] | None = None,
+    done: set[str] | None = None,
+    concurrency: int = 8,
+    rate: float | None = None,
+) -> BatchStats:
+    """Run every query from ``lines`` through ``agent.search``.
+
+    Items are handed to ``concurrency`` workers through a bounded queue, so
+    memory stays flat for arbitrarily long inputs. Ids in ``done`` are
+    skipped; ids of successful queries are appended to ``progress``.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    done = done or set()
+    limiter = RateLimiter(rate) if rate else None
+    queue: asyncio.Queue[BatchItem | None] = asyncio.Queue(maxsize=concurrency * 2)
+    stats = BatchStats()
+
+    def write(record: dict[str, Any], item_id: str | None) -> None:
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        if item_id is not None and progress is not None:
+            progress.write(item_id + "\n")
+            progress.flush()
+
+    async def worker() -> None:
+        while (item := await queue.get()) is not None:
+            if limiter is not None:
+                await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = await agent.search(item.query)
+            except Exception as e:
+                logger.warning("Query %s failed: %s", item.id, e)
+                stats.failed += 1
+                write({"id": item.id, "query": item.query, "error": str(e)}, None)
+            else:
+                stats.succeeded += 1
+                write({"id": item.id, "query": item.query, "output": result.model_dump()}, item.id)
+            stats.latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        number = 0
+        async for line in lines:
+            number += 1
+            item = parse_item(line, number)
+            if item is None:
+                continue
+            if item.id in done:
+                stats.skipped += 1
+            else:
+                await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from agent import ProductSearchAgent
+
+    output_path = Path(args.output)
+    progress_path = Path(args.progress or f"{args.output}.progress")
+    done = load_progress(progress_path)
+    if done:
+        print(f"Resuming: {len(done)} queries already done", file=sys.stderr)
+
+    agent = ProductSearchAgent()
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with output_path.open("a", encoding="utf-8") as out, progress_path.open("a", encoding="utf-8") as prog:
+            stats = await run_batch(
+                agent,
+                _aiter_lines(source),
+                out,
+                progress=prog,
+                done=done,
+                concurrency=args.concurrency,
+                rate=args.rate,
+            )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        # Entries since the last periodic save would otherwise be lost for the next run
+        await agent.save_cache()
+    print(stats.summary(), file=sys.stderr)
+    if agent.semantic_cache is not None:
+        print(f"semantic cache: {agent.semantic_cache.snapshot()}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run product search over a JSONL file of queries.")
+    parser.add_argument("input", help="JSONL file of queries, or '-' for stdin.")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to.")
+    parser.add_argument("--progress", help="Progress file (default: <output>.progress).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight at once.")
+    parser.add_argument("--rate", type=float, help="Maximum queries started per second.")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent.parent.parent / ".env", override=True)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
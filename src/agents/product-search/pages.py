@@ -0,0 +1,103 @@
+"""Cursors and de-duplication for top-k product search pages.
+
+A top-k search returns up to ``k`` products per page. The ``next_cursor`` of a
+page asks for the next page of the same query. The cursor is self-contained
+(URL-safe base64 JSON): it carries the query, ``k``, the page number and the
+names of the products already returned. Any worker or replica can continue a
+search, and no state is kept between pages.
+
+The names already returned are listed in the prompt for the next page, so the
+model suggests other products. Products the model repeats anyway are dropped,
+compared by ``product_key`` (case-folded, whitespace-collapsed name). Only the
+last ``MAX_SEEN`` names are kept, which bounds both the cursor and the prompt.
+
+A message asks for a page only inside the ``REQUEST_KEY`` envelope,
+``{"product_search": {"query": ..., "top_k": k}}`` or
+``{"product_search": {"cursor": ...}}``. Any other message, JSON or not, is a
+plain query.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+MAX_SEEN = 100
+
+REQUEST_KEY = "product_search"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class PageRequestError(ValueError):
+    """A top-k request that cannot be served; answered with an error page, not raised."""
+
+
+class InvalidCursorError(PageRequestError):
+    """A cursor that was not issued by ``PageCursor.encode``."""
+
+
+def envelope(text: str) -> dict | None:
+    """The request inside a ``{"product_search": {...}}`` message, or ``None`` for a plain query."""
+    if not text.lstrip().startswith("{"):
+        return None
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or set(message) != {REQUEST_KEY}:
+        return None
+    request = message[REQUEST_KEY]
+    if not isinstance(request, dict):
+        raise PageRequestError(f"{REQUEST_KEY} must be an object")
+    return request
+
+
+def product_key(name: str) -> str:
+    """De-duplication key of a product name."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", name).casefold()).strip()
+
+
+@dataclass
+class PageCursor:
+    """Position in a top-k search: the query, page size, page number and products returned so far."""
+
+    query: str
+    k: int
+    page: int = 0
+    seen: list[str] = field(default_factory=list)
+
+    def seen_keys(self) -> set[str]:
+        return {product_key(name) for name in self.seen}
+
+    def next(self, names: list[str]) -> PageCursor:
+        """Cursor of the page after the one that returned ``names``."""
+        return PageCursor(self.query, self.k, self.page + 1, [*self.seen, *names][-MAX_SEEN:])
+
+    def encode(self) -> str:
+        payload = json.dumps({"q": self.query, "k": self.k, "p": self.page, "s": self.seen}, ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str) -> PageCursor:
+        """Parse ``cursor``, raising ``InvalidCursorError`` if it is malformed."""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            query, k, page, seen = payload["q"], payload["k"], payload["p"], payload["s"]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+            raise InvalidCursorError("Invalid product search cursor") from e
+        if not (
+            isinstance(query, str)
+            and type(k) is int
+            and type(page) is int
+            and k >= 1
+            and page >= 0
+            and isinstance(seen, list)
+            and all(isinstance(name, str) for name in seen)
+        ):
+            raise InvalidCursorError("Invalid product search cursor")
+        return cls(query, k, page, seen[-MAX_SEEN:])
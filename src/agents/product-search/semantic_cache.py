@@ -0,0 +1,368 @@
+# Copyright (c) Microsoft. All rights reserved.
+"""Semantic cache of product-search results.
+
+Queries are embedded and stored in a NumPy vector index next to the
+serialized ``ProductSearchOutput`` they produced. A lookup returns the value
+of the most similar stored query when its cosine similarity reaches the
+threshold, so near-duplicates ("wireless headphones" / "bluetooth
+headphones") reuse one LLM answer.
+
+Embedders:
+
+* ``HashingEmbedder``     – local hashed word + character n-gram vectors; no
+  network call, catches spelling and word-order variants.
+* ``AzureOpenAIEmbedder`` – an Azure OpenAI embedding deployment; also
+  catches synonyms.
+
+The index holds at most ``max_entries`` vectors and evicts the least
+recently used one. ``save``/``load`` persist it to a single ``.npz`` file;
+a file written for another embedder or system prompt is ignored.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Embedders
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of ``dimensions``."""
+
+    name: str
+    dimensions: int
+
+    async def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Feature-hashed bag of words and character trigrams.
+
+    Uses ``crc32`` rather than ``hash()`` so that vectors are stable across
+    processes and persisted indexes stay valid after a restart.
+    """
+
+    def __init__(self, dimensions: int = 512) -> None:
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> list[tuple[str, float]]:
+        text = unicodedata.normalize("NFKC", text).casefold()
+        features: list[tuple[str, float]] = []
+        for word in _TOKEN_RE.findall(text):
+            features.append(("w:" + word, 1.0))
+            padded = f"<{word}>"
+            features.extend(("c:" + padded[i : i + 3], 0.5) for i in range(len(padded) - 2))
+        return features
+
+    def embed_sync(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimensions] += sign * weight
+        return _normalize_rows(vectors)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+class AzureOpenAIEmbedder:
+    """Embeddings from an Azure OpenAI deployment via an ``AsyncAzureOpenAI`` client."""
+
+    def __init__(self, client: Any, deployment: str, dimensions: int = 1536) -> None:
+        self._client = client
+        self._deployment = deployment
+        self.dimensions = dimensions
+        self.name = f"azure-openai:{deployment}:{dimensions}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        response = await self._client.embeddings.create(
+            model=self._deployment, input=texts, dimensions=self.dimensions
+        )
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize_rows(vectors)
+
+
+# ---------------------------------------------------------------------------
+# Vector index
+# ---------------------------------------------------------------------------
+
+
+class VectorIndex:
+    """Fixed-capacity matrix of unit vectors with LRU eviction.
+
+    Rows are preallocated, so a lookup is one matrix-vector product over the
+    occupied rows and inserting never reallocates.
+    """
+
+    def __init__(self, dimensions: int, max_entries: int = 4096) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._values: list[str] = []
+        self._clock = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _touch(self, row: int) -> None:
+        self._clock += 1
+        self._last_used[row] = self._clock
+
+    def search(self, vector: np.ndarray) -> tuple[int, float]:
+        """Row and cosine similarity of the nearest stored vector (``-1`` if empty)."""
+        if not self._values:
+            return -1, 0.0
+        scores = self._vectors[: len(self._values)] @ vector
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def get(self, row: int) -> str:
+        self._touch(row)
+        return self._values[row]
+
+    def add(self, vector: np.ndarray, value: str) -> bool:
+        """Store ``value``; returns ``True`` when an entry had to be evicted."""
+        evicted = len(self._values) >= self.max_entries
+        if evicted:
+            row = int(np.argmin(self._last_used))
+            self._values[row] = value
+        else:
+            row = len(self._values)
+            self._values.append(value)
+        self._vectors[row] = vector
+        self._touch(row)
+        return evicted
+
+    def save(self, path: Path, *, metadata: dict[str, str]) -> None:
+        """Write the index atomically to ``path`` (``.npz``)."""
+        self.write(path, self.arrays(), metadata=metadata)
+
+    def arrays(self) -> dict[str, Any]:
+        """Copy of the occupied rows, for ``write`` to save while the index keeps changing."""
+        count = len(self._values)
+        return {
+            "vectors": self._vectors[:count].copy(),
+            "last_used": self._last_used[:count].copy(),
+            "values": list(self._values),
+        }
+
+    @staticmethod
+    def write(path: Path, arrays: dict[str, Any], *, metadata: dict[str, str]) -> None:
+        """Write ``arrays`` (from ``arrays()``) atomically to ``path``."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Per process and thread: forked workers (AGENT_WORKERS) may save the same index
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                vectors=arrays["vectors"],
+                last_used=arrays["last_used"],
+                values=np.array(json.dumps(arrays["values"], ensure_ascii=False)),
+                metadata=np.array(json.dumps(metadata)),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, *, max_entries: int, metadata: dict[str, str]) -> VectorIndex | None:
+        """Read an index written by ``save``; ``None`` if its metadata differs."""
+        with np.load(path, allow_pickle=False) as data:
+            if json.loads(str(data["metadata"])) != metadata:
+                return None
+            vectors = data["vectors"]
+            last_used = data["last_used"]
+            values = json.loads(str(data["values"]))
+        index = cls(vectors.shape[1], max_entries)
+        # Keep the most recently used entries when the bound shrank
+        keep = np.argsort(last_used)[-max_entries:]
+        for row in keep:
+            index.add(vectors[row], values[row])
+        return index
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SemanticCacheStats:
+    """Counters exposed by ``SemanticCache.stats``."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    errors: int = 0
+    lookup_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def avg_lookup_ms(self) -> float:
+        lookups = self.hits + self.misses
+        return self.lookup_seconds * 1000 / lookups if lookups else 0.0
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of serialized results keyed on query embeddings.
+
+    Embedding errors are treated as misses so that the cache never fails a
+    search request. With ``path`` set, the index is loaded on construction
+    and saved every ``save_every`` stores and on ``save()``. The periodic
+    save copies the index on the event loop and writes it in a worker thread,
+    one save at a time.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        *,
+        threshold: float = 0.92,
+        max_entries: int = 4096,
+        path: str | Path | None = None,
+        prompt: str = "",
+        save_every: int = 32,
+    ) -> None:
+        self._embedder = embedder
+        self._threshold = threshold
+        self._path = Path(path) if path else None
+        self._save_every = save_every
+        self._metadata = {"embedder": embedder.name, "prompt": _fingerprint(prompt)}
+        self._dirty = 0
+        self._save_task: asyncio.Task | None = None
+        self.stats = SemanticCacheStats()
+        self.index = self._load(max_entries) or VectorIndex(embedder.dimensions, max_entries)
+        # Vector of the last missed query, reused by the following set()
+        self._pending: tuple[str, np.ndarray] | None = None
+
+    def _load(self, max_entries: int) -> VectorIndex | None:
+        if self._path is None or not self._path.exists():
+            return None
+        try:
+            index = VectorIndex.load(self._path, max_entries=max_entries, metadata=self._metadata)
+        except Exception:
+            logger.warning("Could not load semantic cache from %s", self._path, exc_info=True)
+            return None
+        if index is None:
+            logger.info("Ignoring semantic cache %s written for another embedder or prompt", self._path)
+        return index
+
+    async def _embed(self, query: str) -> np.ndarray:
+        if self._pending is not None and self._pending[0] == query:
+            return self._pending[1]
+        return (await self._embedder.embed([query]))[0]
+
+    async def get(self, query: str) -> str | None:
+        start = time.perf_counter()
+        value = None
+        try:
+            vector = await self._embed(query)
+        except Exception:
+            logger.warning("Query embedding failed", exc_info=True)
+            self.stats.errors += 1
+        else:
+            row, score = self.index.search(vector)
+            if row >= 0 and score >= self._threshold:
+                value = self.index.get(row)
+            else:
+                self._pending = (query, vector)
+        self.stats.lookup_seconds += time.perf_counter() - start
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, query: str, value: str) -> None:
+        try:
+            vector = await self._embed(query)
+        except Exception:
+            logger.warning("Query embedding failed", exc_info=True)
+            self.stats.errors += 1
+            return
+        self._pending = None
+        if self.index.add(vector, value):
+            self.stats.evictions += 1
+        self.stats.stores += 1
+        self._dirty += 1
+        saving = self._save_task is not None and not self._save_task.done()
+        if self._path is not None and self._dirty >= self._save_every and not saving:
+            self._save_task = asyncio.create_task(self._save_in_thread())
+
+    def save(self) -> None:
+        """Persist the index if a path is configured and it changed."""
+        if self._path is None or not self._dirty:
+            return
+        dirty = self._dirty
+        try:
+            self.index.save(self._path, metadata=self._metadata)
+        except Exception:
+            logger.warning("Could not save semantic cache to %s", self._path, exc_info=True)
+            return
+        self._dirty -= dirty
+
+    async def flush(self) -> None:
+        """Wait for a running save, then persist any remaining changes off the event loop."""
+        if self._save_task is not None:
+            await self._save_task
+        if self._path is not None and self._dirty:
+            await self._save_in_thread()
+
+    async def _save_in_thread(self) -> None:
+        dirty = self._dirty
+        arrays = self.index.arrays()
+        try:
+            await asyncio.to_thread(VectorIndex.write, self._path, arrays, metadata=self._metadata)
+        except Exception:
+            logger.warning("Could not save semantic cache to %s", self._path, exc_info=True)
+            return
+        # Stores made during the write stay dirty
+        self._dirty = max(0, self._dirty - dirty)
+
+    def snapshot(self) -> dict[str, float]:
+        """Counters plus hit rate and mean lookup latency, for logging or export."""
+        return {
+            **asdict(self.stats),
+            "entries": len(self.index),
+            "hit_rate": self.stats.hit_rate,
+            "avg_lookup_ms": self.stats.avg_lookup_ms,
+        }
@@ -0,0 +1,6 @@
+"""Runtime helpers shared by the hosted agents.
+
+``scripts/postdeploy.sh`` stages this package into every agent's build
+context, so it is importable as ``common`` both in the containers and when an
+agent is started from the repository.
+"""
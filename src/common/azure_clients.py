@@ -0,0 +1,362 @@
+"""Process-wide Azure credential, token cache and HTTP connection pool.
+
+Every agent in a process shares one ``ClientPool`` (see ``get_client_pool``):
+
+* one ``DefaultAzureCredential``, probed once instead of per agent;
+* a ``TokenProvider`` that refreshes the Cognitive Services token on a
+  background thread before it expires, so the request path only reads a
+  cached string;
+* one ``httpx`` client (sync and async) with keep-alive and HTTP/2 when the
+  ``h2`` package is installed, reused by every Azure OpenAI client.
+
+When ``AZURE_OPENAI_API_KEY`` is set, the key is sent instead of Entra ID
+tokens and no credential is created (e.g. for the mock endpoint used by
+``benchmarks/load_test.py``).
+
+Constructing the pool imports ``azure.identity``; the hosted agents defer it
+to their start-up warm-up (see ``startup.py``), which also fetches the first
+token and opens a connection (``warm_token``, ``warm_connection``).
+
+``ClientPool.metrics()`` reports token refreshes and connection reuse.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import httpx
+
+from common.resilience import ResilientChatClient
+
+logger = logging.getLogger(__name__)
+
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+DEFAULT_API_VERSION = "2024-10-21"
+
+
+# ---------------------------------------------------------------------------
+# Token provider
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class TokenMetrics:
+    """Counters exposed by ``TokenProvider.metrics``."""
+
+    background_refreshes: int = 0
+    inline_refreshes: int = 0
+    refresh_failures: int = 0
+    cache_hits: int = 0
+
+
+class TokenProvider:
+    """Caches one bearer token and refreshes it ahead of expiry.
+
+    ``get_token``/``aget_token`` are the ``azure_ad_token_provider`` callables
+    for LangChain and the OpenAI SDK. They only fetch inline when no valid
+    token is cached (first call before warm-up, or a failed refresh).
+    """
+
+    def __init__(
+        self,
+        credential: Any,
+        scope: str = COGNITIVE_SERVICES_SCOPE,
+        *,
+        refresh_margin: float = 300.0,
+        expiry_skew: float = 60.0,
+        retry_delay: float = 10.0,
+    ) -> None:
+        self._credential = credential
+        self._scope = scope
+        self._refresh_margin = refresh_margin
+        self._expiry_skew = expiry_skew
+        self._retry_delay = retry_delay
+        self._token: Any = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.metrics = TokenMetrics()
+
+    def _valid(self, margin: float = 0.0) -> bool:
+        return self._token is not None and self._token.expires_on - margin > time.time()
+
+    def _margin(self) -> float:
+        # Short-lived tokens are refreshed at half-life at the latest
+        return min(self._refresh_margin, (self._token.expires_on - self._fetched_at) / 2)
+
+    def _refresh(self) -> None:
+        self._fetched_at = time.time()
+        self._token = self._credential.get_token(self._scope)
+
+    def get_token(self) -> str:
+        if self._valid(self._expiry_skew):
+            self.metrics.cache_hits += 1
+            return self._token.token
+        with self._lock:
+            if not self._valid(self._expiry_skew):
+                self._refresh()
+                self.metrics.inline_refreshes += 1
+            return self._token.token
+
+    async def aget_token(self) -> str:
+        if self._valid(self._expiry_skew):
+            self.metrics.cache_hits += 1
+            return self._token.token
+        return await asyncio.to_thread(self.get_token)
+
+    def start(self) -> None:
+        """Fetch the first token and keep it fresh on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._token is None or not self._valid(self._margin()):
+                try:
+                    with self._lock:
+                        self._refresh()
+                    self.metrics.background_refreshes += 1
+                except Exception:
+                    self.metrics.refresh_failures += 1
+                    logger.warning("Background token refresh failed", exc_info=True)
+                    self._stop.wait(self._retry_delay)
+                    continue
+            wait = self._token.expires_on - self._margin() - time.time()
+            self._stop.wait(max(wait, 1.0))
+
+
+# ---------------------------------------------------------------------------
+# HTTP connection pool
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ConnectionMetrics:
+    """Requests sent through the shared clients and TCP connections opened."""
+
+    requests: int = 0
+    connections_opened: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1.0 - self.connections_opened / self.requests)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ClientPool:
+    """Shared credential, token provider and HTTP clients for one process."""
+
+    def __init__(
+        self,
+        credential: Any = None,
+        *,
+        token_provider: TokenProvider | None = None,
+        api_key: str | None = None,
+        http2: bool | None = None,
+        max_connections: int = 100,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 120.0,
+    ) -> None:
+        # An API key (e.g. for a local mock endpoint) replaces Entra ID tokens
+        self.api_key = api_key if api_key is not None else os.getenv("AZURE_OPENAI_API_KEY") or None
+        if credential is None and token_provider is None and self.api_key is None:
+            from azure.identity import DefaultAzureCredential
+
+            credential = DefaultAzureCredential()
+        self.credential = credential
+        self.tokens = token_provider or (TokenProvider(credential) if credential is not None else None)
+        self.connection_metrics = ConnectionMetrics()
+
+        if http2 is None:
+            http2 = os.getenv("AZURE_OPENAI_HTTP2", "on").lower() != "off"
+        if http2 and not _http2_available():
+            logger.info("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1")
+            http2 = False
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http_client = httpx.Client(
+            http2=http2,
+            limits=limits,
+            timeout=timeout,
+            event_hooks={"request": [self._on_request]},
+        )
+        self.async_http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=timeout,
+            event_hooks={"request": [self._on_async_request]},
+        )
+        self._openai_clients: dict[tuple[str, str | None], Any] = {}
+
+    # -- connection accounting ---------------------------------------------
+
+    def _count(self, event: str) -> None:
+        if event.endswith("connect_tcp.complete"):
+            self.connection_metrics.connections_opened += 1
+
+    def _on_request(self, request: httpx.Request) -> None:
+        self.connection_metrics.requests += 1
+        request.extensions["trace"] = lambda event, info: self._count(event)
+
+    async def _on_async_request(self, request: httpx.Request) -> None:
+        self.connection_metrics.requests += 1
+
+        async def trace(event: str, info: dict) -> None:
+            self._count(event)
+
+        request.extensions["trace"] = trace
+
+    # -- clients -------------------------------------------------------------
+
+    def _auth(self) -> dict[str, Any]:
+        if self.api_key is not None:
+            return {"api_key": self.api_key}
+        return {"azure_ad_token_provider": self.tokens.aget_token}
+
+    def chat_model_kwargs(self) -> dict[str, Any]:
+        """Auth and HTTP client arguments for LangChain's ``init_chat_model``."""
+        auth = (
+            {"api_key": self.api_key}
+            if self.api_key is not None
+            else {
+                "azure_ad_token_provider": self.tokens.get_token,
+                "azure_ad_async_token_provider": self.tokens.aget_token,
+            }
+        )
+        return {**auth, "http_client": self.http_client, "http_async_client": self.async_http_client}
+
+    def openai_client(self, *, api_version: str = DEFAULT_API_VERSION, deployment_name: str | None = None) -> Any:
+        """A cached ``AsyncAzureOpenAI`` on the shared pool and token provider."""
+        key = (api_version, deployment_name)
+        client = self._openai_clients.get(key)
+        if client is None:
+            from openai import AsyncAzureOpenAI
+
+            client = AsyncAzureOpenAI(
+                azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+                azure_deployment=deployment_name,
+                api_version=api_version,
+                **self._auth(),
+                http_client=self.async_http_client,
+            )
+            self._openai_clients[key] = client
+        return client
+
+    def chat_client(self, *, api_version: str = DEFAULT_API_VERSION, resilient: bool | None = None) -> Any:
+        """An ``AzureOpenAIChatClient`` sharing this pool's connections and token.
+
+        Unless ``resilient`` is false (default: ``CHAT_RESILIENCE``), the client
+        is wrapped in a ``ResilientChatClient`` (see ``resilience.py``), which
+        takes over retries from the OpenAI SDK.
+        """
+        from agent_framework.azure import AzureOpenAIChatClient
+
+        if resilient is None:
+            resilient = os.getenv("CHAT_RESILIENCE", "on").lower() != "off"
+        deployment_name = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+        async_client = self.openai_client(api_version=api_version, deployment_name=deployment_name)
+        client = AzureOpenAIChatClient(
+            deployment_name=deployment_name,
+            api_version=api_version,
+            async_client=async_client.with_options(max_retries=0) if resilient else async_client,
+        )
+        return ResilientChatClient.from_env(client) if resilient else client
+
+    # -- warm-up ---------------------------------------------------------------
+
+    def warm_token(self) -> None:
+        """Fetch the first token now (no-op with an API key)."""
+        if self.tokens is not None:
+            self.tokens.get_token()
+
+    def _warm_request(self) -> tuple[str, dict[str, str]]:
+        url = f"{os.environ['AZURE_OPENAI_ENDPOINT'].rstrip('/')}/openai/models?api-version={DEFAULT_API_VERSION}"
+        if self.api_key is not None:
+            return url, {"api-key": self.api_key}
+        return url, {"Authorization": f"Bearer {self.tokens.get_token()}"}
+
+    def warm_connection(self) -> None:
+        """Open a keep-alive connection (TCP, TLS) to ``AZURE_OPENAI_ENDPOINT``.
+
+        Any response will do; the status is ignored.
+        """
+        url, headers = self._warm_request()
+        self.http_client.get(url, headers=headers)
+
+    async def awarm_connection(self) -> None:
+        """``warm_connection`` for the async client; run it on the serving loop."""
+        url, headers = await asyncio.to_thread(self._warm_request)
+        await self.async_http_client.get(url, headers=headers)
+
+    def metrics(self) -> dict[str, float]:
+        """Token and connection counters, suitable for logging or export."""
+        return {
+            **(asdict(self.tokens.metrics) if self.tokens is not None else {}),
+            **asdict(self.connection_metrics),
+            "connection_reuse_ratio": self.connection_metrics.reuse_ratio,
+        }
+
+    def close(self) -> None:
+        """Stop token refresh and close the sync HTTP client; see ``aclose`` for both."""
+        if self.tokens is not None:
+            self.tokens.stop()
+        self.http_client.close()
+
+    async def aclose(self) -> None:
+        """Stop token refresh and close the sync and async HTTP clients (and their HTTP/2 connections)."""
+        self.close()
+        await self.async_http_client.aclose()
+
+
+_pool: ClientPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """Return the process-wide pool, creating it and starting token refresh."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ClientPool()
+                if pool.tokens is not None:
+                    pool.tokens.start()
+                _pool = pool
+    return _pool
+
+
+async def aclose_client_pool() -> None:
+    """Close the process-wide pool, if one was created; the next ``get_client_pool`` builds a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
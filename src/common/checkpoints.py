@@ -0,0 +1,275 @@
+"""LangGraph checkpointer on the ``ThreadStore`` database.
+
+``StoreCheckpointer`` persists graph state per ``thread_id`` (the hosted
+adapter passes the conversation id), so a conversation continues across
+requests and restarts. Each checkpoint is stored whole: the checkpoint,
+its channel values and metadata serialized with the graph's serializer
+(msgpack) and zlib-compressed above 1 KiB. Only the ``keep`` newest
+checkpoints of a thread, and their pending writes, are kept; older ones
+are deleted when a new one is saved. Threads are pruned with the rest of
+the store (``THREAD_STORE_IDLE_HOURS``).
+
+The async methods call the sync ones directly, like LangGraph's
+``InMemorySaver``; SQLite calls are short.
+"""
+
+from __future__ import annotations
+
+import os
+import zlib
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from common.thread_store import ThreadStore
+
+_COMPRESS_BYTES = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class StoreCheckpointer(BaseCheckpointSaver[int]):
+    """Checkpointer keeping the ``keep`` newest checkpoints per thread in a ``ThreadStore``."""
+
+    def __init__(self, store: ThreadStore, *, keep: int = 4, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.store = store
+        # At least the latest checkpoint and its parent
+        self.keep = max(2, keep)
+        with store.transaction() as db:
+            for statement in filter(str.strip, _SCHEMA.split(";")):
+                db.execute(statement)
+        store.thread_tables.extend(["checkpoints", "checkpoint_writes"])
+
+    @classmethod
+    def from_env(cls, store: ThreadStore) -> StoreCheckpointer:
+        return cls(store, keep=int(os.getenv("THREAD_STORE_CHECKPOINTS", "4")))
+
+    # -- serialization -------------------------------------------------------
+
+    def _dumps(self, value: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) > _COMPRESS_BYTES:
+            return f"{type_}+zlib", zlib.compress(data, 1)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[: -len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # -- reads ---------------------------------------------------------------
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self.store.query(
+            "SELECT task_id, channel, type, value FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self._loads(type_, checkpoint),
+            metadata=self._loads(metadata_type, metadata),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self._loads(t, value)) for task_id, channel, t, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self.store.query(
+                columns + "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self.store.query(
+                columns + "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        return self._tuple(thread_id, checkpoint_ns, rows[0]) if rows else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        rows = self.store.query(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+            params,
+        )
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            saved = self._tuple(thread_id, checkpoint_ns, tuple(row))
+            if filter and not all(saved.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield saved
+
+    # -- writes --------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self._dumps(checkpoint)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+        with self.store.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                ),
+            )
+            # Drop everything older than the newest `keep` checkpoints
+            stale = db.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep),
+            ).fetchall()
+            for table in ("checkpoints", "checkpoint_writes"):
+                db.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale],
+                )
+        self.store.touch(thread_id)
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dumps(value)
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, data, task_path))
+        with self.store.transaction() as db:
+            # Special writes (errors, interrupts) replace earlier ones; regular writes are stored once
+            db.executemany(
+                "INSERT OR REPLACE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] < 0],
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] >= 0],
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.delete(thread_id)
+
+    # -- async ---------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
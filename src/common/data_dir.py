@@ -0,0 +1,28 @@
+"""Location of the files the agents keep across restarts.
+
+``AGENT_DATA_DIR`` names a directory on persistent storage (in the
+containers, a mounted volume). Stores that keep a file there by default,
+such as the order log, are off while it is unset. Importing an agent, a
+benchmark or a CLI therefore writes nothing to the working directory.
+A store's own path variable always wins over the data directory.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+def data_path(name: str) -> Path | None:
+    """``AGENT_DATA_DIR/<name>``, or ``None`` when no data directory is configured."""
+    directory = os.getenv("AGENT_DATA_DIR")
+    return Path(directory) / name if directory else None
+
+
+def store_path(variable: str, name: str) -> str | None:
+    """Path from ``variable``, else ``data_path(name)``; ``None`` when ``off`` or unconfigured."""
+    path = os.getenv(variable)
+    if path is None:
+        default = data_path(name)
+        return str(default) if default is not None else None
+    return None if path.lower() == "off" else path
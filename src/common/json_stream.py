@@ -0,0 +1,235 @@
+"""Incremental parser for a single streamed JSON object.
+
+Models stream their JSON answer a few characters at a time. The parser is fed
+those chunks and reports each top-level member as soon as its value is
+complete, so callers can act on ``"next_agent"`` or ``"name"`` long before
+the closing brace arrives.
+
+Example::
+
+    parser = JsonObjectStreamParser()
+    for chunk in ['{"name": "Ta', 'ble", "pri', 'ce": "9€"}']:
+        for key, value in parser.feed(chunk):
+            print(key, value)      # name Table, then price 9€
+    parser.close()                 # {"name": "Table", "price": "9€"}
+
+``JsonArrayStreamParser`` also reports the items of one array member (such
+as ``"products"``) one at a time, as each item completes.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+
+# Parser states
+_BEFORE_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_VALUE = 5
+_AFTER_VALUE = 6
+_DONE = 7
+
+
+class JsonObjectStreamParser:
+    """Parses one top-level JSON object from arbitrarily split chunks.
+
+    Leading text before the first ``{`` (such as a markdown fence) and
+    trailing text after the closing ``}`` are ignored. Nested objects and
+    arrays are reported as a whole once their top-level member completes.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, Any] = {}
+        self.text = ""
+        self._state = _BEFORE_OBJECT
+        self._buf: list[str] = []
+        self._key = ""
+        self._kind = ""  # "string" | "container" | "scalar"
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the object has been seen."""
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """Consume ``chunk`` and return the members completed by it, in order."""
+        self.text += chunk
+        completed: list[tuple[str, Any]] = []
+        for ch in chunk:
+            if self._state == _DONE:
+                break
+            member = self._step(ch)
+            if member is not None:
+                completed.append(member)
+        return completed
+
+    def close(self) -> dict[str, Any]:
+        """Return the parsed object, raising ``ValueError`` if it is incomplete."""
+        if self._state != _DONE:
+            raise ValueError(f"Incomplete JSON object: {self.text[:500]!r}")
+        return dict(self.fields)
+
+    # ------------------------------------------------------------------
+    # State machine
+    # ------------------------------------------------------------------
+
+    def _step(self, ch: str) -> tuple[str, Any] | None:
+        state = self._state
+
+        if state == _BEFORE_OBJECT:
+            if ch == "{":
+                self._state = _EXPECT_KEY
+            return None
+
+        if state == _EXPECT_KEY:
+            if ch == '"':
+                self._buf = ['"']
+                self._escaped = False
+                self._state = _IN_KEY
+            elif ch == "}":
+                self._state = _DONE
+            elif ch not in _WHITESPACE and ch != ",":
+                raise ValueError(f"Expected object key, got {ch!r}")
+            return None
+
+        if state == _IN_KEY:
+            self._buf.append(ch)
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._key = json.loads("".join(self._buf))
+                self._state = _EXPECT_COLON
+            return None
+
+        if state == _EXPECT_COLON:
+            if ch == ":":
+                self._state = _EXPECT_VALUE
+            elif ch not in _WHITESPACE:
+                raise ValueError(f"Expected ':' after key {self._key!r}, got {ch!r}")
+            return None
+
+        if state == _EXPECT_VALUE:
+            if ch in _WHITESPACE:
+                return None
+            self._buf = [ch]
+            self._escaped = False
+            if ch == '"':
+                self._kind = "string"
+            elif ch in "{[":
+                self._kind = "container"
+                self._depth = 1
+                self._in_string = False
+            else:
+                self._kind = "scalar"
+            self._state = _IN_VALUE
+            return None
+
+        if state == _IN_VALUE:
+            return self._step_value(ch)
+
+        # _AFTER_VALUE
+        if ch == ",":
+            self._state = _EXPECT_KEY
+        elif ch == "}":
+            self._state = _DONE
+        elif ch not in _WHITESPACE:
+            raise ValueError(f"Expected ',' or '}}' after value of {self._key!r}, got {ch!r}")
+        return None
+
+    def _step_value(self, ch: str) -> tuple[str, Any] | None:
+        if self._kind == "scalar":
+            if ch in _WHITESPACE or ch in ",}":
+                member = self._complete()
+                # The terminator also drives the post-value transition.
+                self._step(ch)
+                return member
+            self._buf.append(ch)
+            return None
+
+        self._buf.append(ch)
+        if self._kind == "string":
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                return self._complete()
+            return None
+
+        # container
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+        elif ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                return self._complete()
+        return None
+
+    def _complete(self) -> tuple[str, Any]:
+        raw = "".join(self._buf)
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid value for {self._key!r}: {raw[:200]!r}") from e
+        self.fields[self._key] = value
+        self._state = _AFTER_VALUE
+        return self._key, value
+
+
+class JsonArrayStreamParser(JsonObjectStreamParser):
+    """``JsonObjectStreamParser`` that also reports the items of the array member ``key``.
+
+    ``feed_items`` returns the object and array items completed by a chunk.
+    Scalar items (strings, numbers) are only part of the whole member.
+    """
+
+    def __init__(self, key: str) -> None:
+        super().__init__()
+        self.key = key
+        self.items: list[Any] = []
+        self._item_start: int | None = None
+        self._completed: list[Any] = []
+
+    def feed_items(self, chunk: str) -> list[Any]:
+        """Consume ``chunk`` and return the items of ``key`` completed by it, in order."""
+        self.feed(chunk)
+        completed, self._completed = self._completed, []
+        return completed
+
+    def _step_value(self, ch: str) -> tuple[str, Any] | None:
+        tracked = self._kind == "container" and self._key == self.key and self._buf[0] == "["
+        in_string = self._in_string
+        member = super()._step_value(ch)
+        if not tracked or in_string or ch == '"':
+            return member
+        if ch in "{[" and self._depth == 2:
+            self._item_start = len(self._buf) - 1
+        elif ch in "}]" and self._depth == 1 and self._item_start is not None:
+            raw = "".join(self._buf[self._item_start :])
+            self._item_start = None
+            try:
+                item = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid item of {self.key!r}: {raw[:200]!r}") from e
+            self.items.append(item)
+            self._completed.append(item)
+        return member
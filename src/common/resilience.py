@@ -0,0 +1,359 @@
+"""Hedging, deadline-aware retries and a circuit breaker for chat calls.
+
+``ResilientChatClient`` wraps an agent-framework chat client
+(``get_response`` / ``get_streaming_response``) and is what
+``ClientPool.chat_client`` returns unless ``CHAT_RESILIENCE=off``:
+
+* **Hedging**: when a call has not finished after the
+  ``CHAT_HEDGE_PERCENTILE`` latency of recent successful calls, a duplicate
+  is sent and whichever finishes first wins; the other is cancelled. Rare
+  slow completions then cost roughly one percentile delay plus a normal
+  completion instead of their full latency. Streams are hedged until their
+  first chunk.
+* **Adaptive timeouts**: each attempt is abandoned after
+  ``CHAT_TIMEOUT_MULTIPLIER`` times the p99 latency (within
+  ``CHAT_TIMEOUT_MIN_SECONDS`` and the remaining deadline).
+* **Retries**: timeouts, connection errors, 429 and 5xx are retried with
+  exponential backoff and full jitter, up to ``CHAT_MAX_ATTEMPTS`` and only
+  while ``CHAT_DEADLINE_SECONDS`` leaves room for another typical call.
+  The OpenAI SDK's own retries are disabled on wrapped clients.
+* **Circuit breaker**: after ``CHAT_BREAKER_FAILURES`` consecutive failed
+  attempts calls fail immediately with ``CircuitOpenError`` for
+  ``CHAT_BREAKER_RESET_SECONDS``; then one probe call decides whether to
+  close it again. Callers map the error to a degraded answer.
+
+``ResilientChatClient.snapshot()`` reports attempts, retries, hedges and
+breaker trips.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterable, Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept for the percentile estimates
+_WINDOW = 256
+# Samples needed before the percentiles replace the configured defaults
+_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while the circuit breaker is open."""
+
+
+# ---------------------------------------------------------------------------
+# Building blocks
+# ---------------------------------------------------------------------------
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = _WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float, default: float) -> float:
+        """Nearest-rank percentile, or ``default`` while there are too few samples."""
+        if len(self._samples) < _MIN_SAMPLES:
+            return default
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trips = 0
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; admits one probe once the timeout has passed."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """End a probe that finished without an outcome (e.g. it was cancelled)."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+            if self._opened_at is None:
+                self.trips += 1
+                logger.warning("Chat circuit breaker opened after %d failures", self._failures)
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+
+def _retriable(error: BaseException) -> bool:
+    """Timeouts, connection errors, 408/429 and 5xx, also when wrapped by the framework."""
+    for _ in range(8):
+        if error is None:
+            break
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int):
+            return status in (408, 429) or status >= 500
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@dataclass
+class ResilienceStats:
+    """Counters exposed by ``ResilientChatClient.stats``."""
+
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    failures: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    short_circuited: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Client wrapper
+# ---------------------------------------------------------------------------
+
+
+class ResilientChatClient:
+    """Chat client wrapper adding hedging, retries and a circuit breaker."""
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        hedge: bool = True,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.25,
+        hedge_default_delay: float = 2.0,
+        timeout_multiplier: float = 4.0,
+        timeout_min: float = 10.0,
+        deadline: float = 60.0,
+        max_attempts: int = 3,
+        retry_base_delay: float = 0.2,
+        retry_max_delay: float = 2.0,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.client = client
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.timeout_multiplier = timeout_multiplier
+        self.timeout_min = timeout_min
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = ResilienceStats()
+        # Completion latency and time to first chunk behave differently
+        self._latency = LatencyTracker()
+        self._first_chunk = LatencyTracker()
+
+    @classmethod
+    def from_env(cls, client: Any) -> ResilientChatClient:
+        """Wrap ``client`` using the ``CHAT_*`` settings."""
+        return cls(
+            client,
+            hedge=os.getenv("CHAT_HEDGE", "on").lower() != "off",
+            hedge_percentile=float(os.getenv("CHAT_HEDGE_PERCENTILE", "95")),
+            hedge_min_delay=float(os.getenv("CHAT_HEDGE_MIN_DELAY_SECONDS", "0.25")),
+            hedge_default_delay=float(os.getenv("CHAT_HEDGE_DEFAULT_DELAY_SECONDS", "2")),
+            timeout_multiplier=float(os.getenv("CHAT_TIMEOUT_MULTIPLIER", "4")),
+            timeout_min=float(os.getenv("CHAT_TIMEOUT_MIN_SECONDS", "10")),
+            deadline=float(os.getenv("CHAT_DEADLINE_SECONDS", "60")),
+            max_attempts=int(os.getenv("CHAT_MAX_ATTEMPTS", "3")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("CHAT_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("CHAT_BREAKER_RESET_SECONDS", "30")),
+            ),
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters, current delays and breaker state, suitable for logging."""
+        return {
+            **asdict(self.stats),
+            "hedge_delay": self._hedge_delay(self._latency),
+            "attempt_timeout": self._attempt_timeout(self._latency),
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+        }
+
+    # -- chat client protocol ----------------------------------------------
+
+    async def get_response(self, messages: Any, **kwargs: Any) -> Any:
+        return await self._with_retries(lambda: self.client.get_response(messages=messages, **kwargs), self._latency)
+
+    async def get_streaming_response(self, messages: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        """Stream with hedging and retries up to the first chunk.
+
+        Once a chunk has been yielded the stream is committed: later errors
+        propagate to the caller.
+        """
+        stream, first = await self._with_retries(
+            lambda: self._open_stream(messages, kwargs), self._first_chunk
+        )
+        try:
+            yield first
+            async for update in stream:
+                yield update
+        finally:
+            await _close(stream)
+
+    # -- internals -----------------------------------------------------------
+
+    async def _open_stream(self, messages: Any, kwargs: dict[str, Any]) -> tuple[Any, Any]:
+        """Start a stream and wait for its first chunk."""
+        stream = self.client.get_streaming_response(messages=messages, **kwargs).__aiter__()
+        try:
+            return stream, await stream.__anext__()
+        except BaseException:
+            await _close(stream)
+            raise
+
+    def _hedge_delay(self, latency: LatencyTracker) -> float:
+        return max(self.hedge_min_delay, latency.percentile(self.hedge_percentile, self.hedge_default_delay))
+
+    def _attempt_timeout(self, latency: LatencyTracker) -> float:
+        return max(self.timeout_min, latency.percentile(99, 0.0) * self.timeout_multiplier)
+
+    async def _with_retries(self, call: Callable[[], Awaitable[Any]], latency: LatencyTracker) -> Any:
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.stats.short_circuited += 1
+            raise CircuitOpenError("Chat completions are failing; circuit breaker is open")
+
+        self.stats.calls += 1
+        try:
+            return await self._attempts(call, latency)
+        finally:
+            # A cancelled probe records no outcome; let the next call probe instead
+            if probe:
+                self.breaker.release_probe()
+
+    async def _attempts(self, call: Callable[[], Awaitable[Any]], latency: LatencyTracker) -> Any:
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    self._hedged(call, latency), min(remaining, self._attempt_timeout(latency))
+                )
+            except asyncio.TimeoutError as e:
+                self.stats.timeouts += 1
+                error: Exception = e
+            except Exception as e:
+                error = e
+            else:
+                self.breaker.record_success()
+                return result
+
+            self.stats.failures += 1
+            self.breaker.record_failure()
+            backoff = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+            # Retry only if a typical call still fits into the deadline
+            needed = backoff + latency.percentile(50, 0.0)
+            if (
+                attempt == self.max_attempts
+                or not _retriable(error)
+                or deadline - time.monotonic() < needed
+                # Retries never become the half-open probe (see _with_retries)
+                or self.breaker.state != "closed"
+            ):
+                raise error
+            self.stats.retries += 1
+            logger.info("Retrying chat call after %s (attempt %d)", type(error).__name__, attempt + 1)
+            await asyncio.sleep(backoff)
+        raise AssertionError("unreachable")
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]], latency: LatencyTracker) -> Any:
+        """Run ``call``; past the hedge delay run a duplicate and keep the first success."""
+
+        async def timed() -> Any:
+            self.stats.attempts += 1
+            started = time.perf_counter()
+            result = await call()
+            latency.record(time.perf_counter() - started)
+            return result
+
+        primary = asyncio.ensure_future(timed())
+        started = [primary]
+        winner: asyncio.Future | None = None
+        try:
+            if self.hedge:
+                done, _ = await asyncio.wait(started, timeout=self._hedge_delay(latency))
+                if not done:
+                    self.stats.hedges += 1
+                    started.append(asyncio.ensure_future(timed()))
+
+            error: BaseException | None = None
+            pending = set(started)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is not primary:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in started:
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(_discard_result)
+
+
+async def _close(stream: Any) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def _discard_result(task: asyncio.Future) -> None:
+    """Close the stream of a losing hedge that had already opened one."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if isinstance(result, tuple) and result:
+        asyncio.ensure_future(_close(result[0]))
@@ -0,0 +1,113 @@
+"""Coalescing of identical concurrent requests (single-flight).
+
+When many users send the same query at once (e.g. during a promotion), only
+the first one calls the model; the others wait for that call and receive
+its result. Keys combine the normalized text with a prompt fingerprint (see
+``flight_key``), so a prompt change never shares a call across versions.
+
+The shared call runs as its own task: cancelling a waiter, even the one that
+started it, does not cancel the call for the others. Once the last waiter
+is cancelled nobody needs the result, so the call is cancelled too (and
+the next request for the key starts a new one). Errors are delivered to
+every waiter, and nothing is kept once the call finishes (caching is the
+job of the routing and product caches).
+
+``SingleFlight.snapshot()`` reports upstream calls, coalesced requests and
+the coalescing ratio; ``agent.single_flight.requests`` counts both by role.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import unicodedata
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Generic, TypeVar
+
+from common.telemetry import Telemetry, get_telemetry
+
+T = TypeVar("T")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def flight_key(text: str, prompt: str) -> str:
+    """Key of a request: prompt fingerprint plus case-folded, whitespace-collapsed text."""
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16] + ":" + normalized
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters exposed by ``SingleFlight.stats``."""
+
+    calls: int = 0
+    coalesced: int = 0
+    cancelled_waiters: int = 0
+    cancelled_calls: int = 0
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """Share of requests served by another request's call."""
+        requests = self.calls + self.coalesced
+        return self.coalesced / requests if requests else 0.0
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one call per key at a time and shares its result."""
+
+    def __init__(self, *, agent: str, telemetry: Telemetry | None = None) -> None:
+        self.agent = agent
+        self.stats = SingleFlightStats()
+        self._inflight: dict[str, asyncio.Future[T]] = {}
+        self._waiters: dict[asyncio.Future[T], int] = {}
+        self._telemetry = telemetry or get_telemetry()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``call()``, or of the in-flight call for ``key``."""
+        future = self._inflight.get(key)
+        if future is None:
+            self.stats.calls += 1
+            role = "leader"
+            future = asyncio.ensure_future(call())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.stats.coalesced += 1
+            role = "follower"
+        self._telemetry.record_single_flight(self.agent, role)
+
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # shield: a cancelled waiter leaves the shared call running for the others
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                self.stats.cancelled_waiters += 1
+            if not future.done() and self._waiters.get(future) == 1:
+                # The last waiter left; new requests must not join the dying call
+                self.stats.cancelled_calls += 1
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                future.cancel()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters[future] -= 1
+
+    def snapshot(self) -> dict[str, float]:
+        """Counters plus coalescing ratio, suitable for logging or metrics export."""
+        return {**asdict(self.stats), "coalescing_ratio": self.stats.coalescing_ratio, "in_flight": len(self)}
+
+    def _finished(self, key: str, future: asyncio.Future[T]) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        self._waiters.pop(future, None)
+        # Mark the error as retrieved when every waiter has gone away
+        if not future.cancelled():
+            future.exception()
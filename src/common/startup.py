@@ -0,0 +1,276 @@
+"""Deferred client construction and warm-up readiness for the hosted agents.
+
+Importing and constructing an agent only wires it together. The expensive
+parts are ``Lazy`` values, built on first use:
+
+* the chat clients (``agent_framework.azure``, ``openai`` and LangChain
+  imports), as ``Lazy`` / ``LazyClient``;
+* the shared ``ClientPool`` (``azure.identity``, the credential and the HTTP
+  clients);
+* the telemetry exporter (``configure_telemetry(..., deferred=True)``).
+
+``serve`` runs the hosted adapter together with a ``Warmup``. The warm-up
+sets up the exporter, fetches the first token, builds every
+``Lazy(..., warm=True)`` value and opens a connection to Azure OpenAI.
+``AGENT_STARTUP`` selects when it runs:
+
+* ``background`` (default): the server listens at once (``/liveness``) and
+  warms up on its event loop. ``/readiness`` answers 503 until every step
+  has succeeded, so traffic only reaches warm replicas.
+* ``eager``: warm-up completes before the server starts listening.
+
+Failed steps are retried every ``AGENT_WARMUP_RETRY_SECONDS``. The readiness
+body (``Warmup.snapshot()``) reports each step's duration and attempts.
+``benchmarks/bench_startup.py`` measures import time per module and time to
+readiness.
+
+On shutdown ``serve`` closes the process-wide ``ClientPool``: token refresh
+and the sync and async HTTP clients.
+
+With ``AGENT_WORKERS`` above 1, ``serve`` imports the warm-up's ``preload``
+modules, then forks the worker processes (see ``workers.py``); each worker
+runs the warm-up and serves as described above.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any, Generic, TypeVar
+
+from common.azure_clients import aclose_client_pool, get_client_pool
+from common.telemetry import export_telemetry
+from common.workers import serve_workers, worker_count
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lazy values created with warm=True, built by the "clients" warm-up step
+_warm_values: weakref.WeakSet[Lazy[Any]] = weakref.WeakSet()
+
+
+class Lazy(Generic[T]):
+    """Value built by ``factory`` on first ``get()``, once per instance.
+
+    A failed build is not cached; the next use tries again. ``warm=True``
+    has the start-up warm-up build it ahead of the first request.
+    """
+
+    def __init__(self, factory: Callable[[], T], *, warm: bool = False) -> None:
+        self._factory = factory
+        self._value: T | None = None
+        self._built = False
+        self._lock = threading.Lock()
+        if warm:
+            _warm_values.add(self)
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def get(self) -> T:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._value = self._factory()
+                    self._built = True
+        return self._value
+
+
+class LazyClient(Lazy[T]):
+    """``Lazy`` that forwards attribute access to the value.
+
+    A deferred SDK client can then be handed to code that expects the client
+    itself (``get_response``, ``embeddings.create``, ...). Not for values
+    captured by LangGraph nodes: compiling a graph probes their attributes,
+    which would build them.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+# ---------------------------------------------------------------------------
+# Warm-up
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class WarmupStep:
+    """Progress of one step, as reported by ``Warmup.snapshot``."""
+
+    name: str
+    seconds: float = 0.0
+    attempts: int = 0
+    done: bool = False
+    error: str | None = None
+
+
+class Warmup:
+    """Ordered start-up steps, run once on the serving event loop.
+
+    Each step runs in a worker thread; if it returns an awaitable, that is
+    awaited on the loop (e.g. to open connections of the async HTTP pool).
+    ``preload`` names modules that the steps import; a multi-process server
+    imports them once before forking.
+    """
+
+    def __init__(self, *, retry_delay: float | None = None, preload: tuple[str, ...] = ()) -> None:
+        if retry_delay is None:
+            retry_delay = float(os.getenv("AGENT_WARMUP_RETRY_SECONDS", "5"))
+        self.retry_delay = retry_delay
+        self.preload_modules = preload
+        self.steps: list[WarmupStep] = []
+        self._calls: list[Callable[[], Any]] = []
+        self._ready = threading.Event()
+        self._task: asyncio.Task | None = None
+        self._started_at: float | None = None
+        self.seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def add(self, name: str, step: Callable[[], Any]) -> Warmup:
+        self.steps.append(WarmupStep(name))
+        self._calls.append(step)
+        return self
+
+    async def run(self) -> None:
+        """Run every step in order, retrying failed ones until they succeed."""
+        self._started_at = time.perf_counter()
+        for step, call in zip(self.steps, self._calls):
+            while not step.done:
+                step.attempts += 1
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.to_thread(call)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    step.error = f"{type(e).__name__}: {e}"
+                    logger.warning(
+                        "Warm-up step %s failed (attempt %d): %s",
+                        step.name,
+                        step.attempts,
+                        step.error,
+                        exc_info=step.attempts == 1,
+                    )
+                    await asyncio.sleep(self.retry_delay)
+                else:
+                    step.done, step.error = True, None
+                finally:
+                    step.seconds += time.perf_counter() - started
+        self.seconds = time.perf_counter() - self._started_at
+        self._ready.set()
+        logger.info("Warm-up done in %.2fs: %s", self.seconds, {s.name: round(s.seconds, 3) for s in self.steps})
+
+    def preload(self) -> None:
+        """Import the ``preload`` modules without building anything."""
+        for name in self.preload_modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning("Could not preload %s: %s", name, e)
+
+    def start(self) -> asyncio.Task:
+        """Run the warm-up as a task on the current loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    def snapshot(self) -> dict[str, Any]:
+        """Status plus per-step progress, suitable for the readiness body."""
+        return {
+            "status": "ready" if self.ready else "warming",
+            "seconds": self.seconds,
+            "steps": [asdict(step) for step in self.steps],
+        }
+
+    async def readiness(self, request: Any = None) -> Any:
+        """Readiness handler for the hosted adapter: 503 until warm."""
+        if self.ready:
+            return self.snapshot()
+        from starlette.responses import JSONResponse
+
+        return JSONResponse(self.snapshot(), status_code=503)
+
+
+def azure_openai_warmup(*, sync_connection: bool = False, preload: tuple[str, ...] = ()) -> Warmup:
+    """Warm-up for agents calling Azure OpenAI through the shared ``ClientPool``.
+
+    ``sync_connection`` warms the pool's sync HTTP client (LangChain's
+    ``invoke``) instead of the async one. ``preload`` adds the modules of
+    the agent's chat client to those of the pool.
+    """
+
+    def connection() -> Any:
+        pool = get_client_pool()
+        return pool.warm_connection() if sync_connection else pool.awarm_connection()
+
+    pool_modules = ("openai",) if os.getenv("AZURE_OPENAI_API_KEY") else ("openai", "azure.identity")
+    return (
+        Warmup(preload=pool_modules + preload)
+        .add("telemetry", export_telemetry)
+        .add("credential", lambda: get_client_pool().warm_token())
+        .add("clients", lambda: [value.get() for value in list(_warm_values)])
+        .add("connection", connection)
+    )
+
+
+def startup_mode() -> str:
+    mode = os.getenv("AGENT_STARTUP", "background").lower()
+    if mode not in ("background", "eager"):
+        logger.warning("Unknown AGENT_STARTUP %r; using background", mode)
+        return "background"
+    return mode
+
+
+def serve(adapter: Any, warmup: Warmup, *, max_workers: int | None = None) -> None:
+    """Run the hosted ``adapter`` with ``warmup`` per ``AGENT_STARTUP``, from
+    one process or ``AGENT_WORKERS`` forked ones.
+
+    ``max_workers`` caps ``AGENT_WORKERS`` for agents whose state must stay
+    in one process.
+    """
+    adapter.agent_readiness = warmup.readiness
+
+    if startup_mode() == "eager":
+        # Startup handlers finish before uvicorn binds the port
+        async def start_warmup() -> None:
+            await warmup.run()
+    else:
+
+        async def start_warmup() -> None:
+            warmup.start()
+
+    adapter.app.add_event_handler("startup", start_warmup)
+    # Token refresh and the pooled HTTP(/2) connections, per worker process
+    adapter.app.add_event_handler("shutdown", aclose_client_pool)
+    workers = worker_count()
+    if max_workers is not None and workers > max_workers:
+        logger.error("AGENT_WORKERS=%d is not supported by this agent; serving from %d", workers, max_workers)
+        workers = max_workers
+    if workers == 1:
+        adapter.run()
+        return
+
+    def serve_socket(sock: Any) -> None:
+        import uvicorn
+
+        adapter.init_tracing()
+        uvicorn.Server(uvicorn.Config(adapter.app, loop="asyncio")).run(sockets=[sock])
+
+    warmup.preload()
+    serve_workers(serve_socket, workers, int(os.environ.get("DEFAULT_AD_PORT", 8088)))
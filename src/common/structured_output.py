@@ -0,0 +1,227 @@
+"""Schema-constrained model output with a single repair attempt.
+
+The agents ask the model for one JSON object matching a pydantic model. With
+``STRUCTURED_OUTPUT=schema`` (the default) the model class is passed as the
+request's ``response_format``, so Azure OpenAI constrains decoding to its
+JSON schema; ``prompt`` leaves the request unchanged for deployments without
+structured-output support.
+
+Either way the text is checked with one ``model_validate_json`` call, which
+parses and validates in a single pass. Malformed output gets one repair
+attempt instead of failing the request:
+
+1. locally, by cutting the outermost ``{...}`` out of surrounding text such
+   as markdown fences;
+2. otherwise (unless ``STRUCTURED_OUTPUT_REPAIR=off``) with one short LLM
+   call that receives only the schema, the validation errors and the broken
+   output, not the original conversation.
+
+``StructuredOutputStats`` counts first-pass failures and repairs, so the
+share of wasted calls can be measured; the same events are recorded as
+``agent.parse.failures`` and ``agent.parse.repairs`` metrics.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from agent_framework import ChatMessage, Role
+
+from common.telemetry import Telemetry, get_telemetry, usage_counts
+
+T = TypeVar("T", bound=BaseModel)
+
+_REPAIR_PROMPT = """\
+You fix malformed JSON. Return ONLY the corrected JSON object (no markdown,
+no extra text) matching this JSON schema, keeping the original values where
+they are valid:
+"""
+
+# Broken output passed to the repair call is cut to this many characters
+_MAX_REPAIR_INPUT_CHARS = 4000
+_DEFAULT_REPAIR_MAX_TOKENS = 512
+
+
+class StructuredOutputError(ValueError):
+    """Model output that still did not match the schema after the repair attempt."""
+
+    def __init__(self, message: str, raw: str) -> None:
+        super().__init__(message)
+        self.raw = raw
+
+
+@dataclass
+class StructuredOutputStats:
+    """Counters exposed by ``StructuredOutput.stats``.
+
+    ``failures`` are outputs that failed the first parse; each ends up in
+    ``local_repairs``, ``llm_repairs`` (when the repair call fixed it) or
+    ``failed``. ``repair_calls`` counts the extra LLM calls made.
+    """
+
+    parsed: int = 0
+    failures: int = 0
+    local_repairs: int = 0
+    llm_repairs: int = 0
+    repair_calls: int = 0
+    failed: int = 0
+
+    @property
+    def failure_rate(self) -> float:
+        """Share of outputs that failed the first parse."""
+        return self.failures / self.parsed if self.parsed else 0.0
+
+    @property
+    def wasted_rate(self) -> float:
+        """Share of LLM calls whose output was unusable even after repair."""
+        return self.failed / self.parsed if self.parsed else 0.0
+
+
+class StructuredOutput(Generic[T]):
+    """Request options and parsing for model output following ``schema``."""
+
+    def __init__(
+        self,
+        schema: type[T],
+        chat_client: Any,
+        *,
+        agent: str,
+        constrain: bool = True,
+        repair: bool = True,
+        repair_max_tokens: int = _DEFAULT_REPAIR_MAX_TOKENS,
+        failure_label: str | None = None,
+        telemetry: Telemetry | None = None,
+    ) -> None:
+        self.schema = schema
+        self.agent = agent
+        self.constrain = constrain
+        self.repair = repair
+        self.repair_max_tokens = repair_max_tokens
+        # Field whose raw value labels failure metrics (e.g. "next_agent")
+        self.failure_label = failure_label
+        self.stats = StructuredOutputStats()
+        self._chat_client = chat_client
+        self._telemetry = telemetry or get_telemetry()
+        self._repair_prompt = _REPAIR_PROMPT + json.dumps(schema.model_json_schema(), separators=(",", ":"))
+
+    @classmethod
+    def from_env(cls, schema: type[T], chat_client: Any, **kwargs: Any) -> StructuredOutput[T]:
+        """Build from the ``STRUCTURED_OUTPUT*`` settings."""
+        return cls(
+            schema,
+            chat_client,
+            constrain=os.getenv("STRUCTURED_OUTPUT", "schema").lower() != "prompt",
+            repair=os.getenv("STRUCTURED_OUTPUT_REPAIR", "on").lower() != "off",
+            repair_max_tokens=int(os.getenv("STRUCTURED_OUTPUT_REPAIR_MAX_TOKENS", _DEFAULT_REPAIR_MAX_TOKENS)),
+            **kwargs,
+        )
+
+    def request_options(self) -> dict[str, Any]:
+        """Keyword arguments for ``get_response`` / ``get_streaming_response``."""
+        return {"response_format": self.schema} if self.constrain else {}
+
+    def snapshot(self) -> dict[str, float]:
+        """Counters plus rates, suitable for logging or metrics export."""
+        return {
+            **asdict(self.stats),
+            "failure_rate": self.stats.failure_rate,
+            "wasted_rate": self.stats.wasted_rate,
+        }
+
+    async def parse(self, raw: str) -> T:
+        """Validate ``raw``, repairing it once if needed.
+
+        Raises ``StructuredOutputError`` when the output is still invalid.
+        """
+        self.stats.parsed += 1
+        try:
+            with self._telemetry.span("parse_json"):
+                return self.schema.model_validate_json(raw)
+        except ValidationError as e:
+            error = e
+
+        self.stats.failures += 1
+        self._telemetry.record_parse_failure(self.agent, self._stage(raw, error), self._label(raw))
+
+        candidate = _outermost_object(raw)
+        if candidate is not None and candidate != raw:
+            try:
+                value = self.schema.model_validate_json(candidate)
+            except ValidationError as e:
+                error, raw = e, candidate
+            else:
+                self.stats.local_repairs += 1
+                self._telemetry.record_repair(self.agent, "local")
+                return value
+
+        # An empty answer has nothing to repair
+        if self.repair and raw.strip():
+            value = await self._repair_with_llm(raw, error)
+            if value is not None:
+                self.stats.llm_repairs += 1
+                self._telemetry.record_repair(self.agent, "llm")
+                return value
+
+        self.stats.failed += 1
+        self._telemetry.record_repair(self.agent, "failed")
+        if not raw.strip():
+            raise StructuredOutputError("LLM returned empty response", raw)
+        raise StructuredOutputError(f"{self.schema.__name__} validation failed: {_summary(error)}", raw)
+
+    async def _repair_with_llm(self, raw: str, error: ValidationError) -> T | None:
+        self.stats.repair_calls += 1
+        messages = [
+            ChatMessage(role=Role.SYSTEM, text=self._repair_prompt),
+            ChatMessage(
+                role=Role.USER,
+                text=f"Errors: {_summary(error)}\n\nOutput:\n{raw[:_MAX_REPAIR_INPUT_CHARS]}",
+            ),
+        ]
+        with self._telemetry.llm_call(self.agent, repair=True) as span:
+            response = await self._chat_client.get_response(
+                messages=messages, max_tokens=self.repair_max_tokens, **self.request_options()
+            )
+            self._telemetry.record_usage(self.agent, *usage_counts(response), span=span)
+        text = response.messages[-1].text if getattr(response, "messages", None) else str(response)
+        for candidate in (text or "", _outermost_object(text or "")):
+            if candidate is None:
+                continue
+            try:
+                return self.schema.model_validate_json(candidate)
+            except ValidationError:
+                continue
+        return None
+
+    @staticmethod
+    def _stage(raw: str, error: ValidationError) -> str:
+        if not raw.strip():
+            return "empty"
+        return "json" if any(item["type"] == "json_invalid" for item in error.errors()) else "validation"
+
+    def _label(self, raw: str) -> str | None:
+        if self.failure_label is None:
+            return None
+        candidate = _outermost_object(raw)
+        try:
+            value = json.loads(candidate).get(self.failure_label) if candidate else None
+        except ValueError:
+            return None
+        return value if isinstance(value, str) else None
+
+
+def _outermost_object(text: str) -> str | None:
+    """Text from the first ``{`` to the last ``}``, if any."""
+    start, end = text.find("{"), text.rfind("}")
+    return text[start : end + 1] if 0 <= start < end else None
+
+
+def _summary(error: ValidationError) -> str:
+    """Compact, model-readable list of validation errors."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or '<root>'}: {item['msg']}" for item in error.errors()
+    )
@@ -0,0 +1,236 @@
+"""OpenTelemetry spans and metrics for the agents' hot paths.
+
+Every agent records through one process-wide ``Telemetry`` (see
+``get_telemetry``):
+
+* spans: ``llm_call``, ``parse_json``, ``validate``, ``tool.<name>`` and
+  ``thread_notify`` (plus ``route`` in the orchestrator), nested under the
+  hosted adapter's request span;
+* histograms: ``agent.routing.duration`` (seconds, by ``next_agent`` and
+  routing ``tier``), ``agent.llm.duration`` and ``agent.llm.tokens`` (by
+  ``agent`` and token ``kind``);
+* counters: ``agent.parse.failures`` (by ``agent``, ``stage`` and
+  ``next_agent``), ``agent.parse.repairs`` (by ``agent`` and ``outcome``,
+  see ``structured_output.py``) and ``agent.single_flight.requests`` (by
+  ``agent`` and ``role``, see ``single_flight.py``).
+
+Export is set up once per process by ``configure_telemetry`` from
+``AGENT_TELEMETRY_EXPORTER``: ``azure`` (Azure Monitor, the default when
+``APPLICATIONINSIGHTS_CONNECTION_STRING`` is set), ``otlp`` (HTTP to
+``OTEL_EXPORTER_OTLP_ENDPOINT``), ``console`` or ``none`` (record into
+whatever provider the host installs, e.g. the adapter's OTLP exporter).
+
+The hosted agents defer the exporter (and its imports) to their start-up
+warm-up (``configure_telemetry(..., deferred=True)``, see ``startup.py``).
+
+``AGENT_TELEMETRY=off`` turns every helper into a no-op, so the cost of the
+instrumentation can be measured (``benchmarks/bench_telemetry.py``).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from opentelemetry import metrics, trace
+
+logger = logging.getLogger(__name__)
+
+_INSTRUMENTATION_NAME = "mf-samples.agents"
+
+
+class Telemetry:
+    """Tracer and instruments used by the agents; inert when ``enabled`` is false."""
+
+    def __init__(self, *, enabled: bool = True, tracer_provider: Any = None, meter_provider: Any = None) -> None:
+        self.enabled = enabled
+        if not enabled:
+            return
+        tracer_provider = tracer_provider or trace.get_tracer_provider()
+        meter_provider = meter_provider or metrics.get_meter_provider()
+        self._tracer = tracer_provider.get_tracer(_INSTRUMENTATION_NAME)
+        meter = meter_provider.get_meter(_INSTRUMENTATION_NAME)
+        self._routing = meter.create_histogram(
+            "agent.routing.duration", unit="s", description="Time to a routing decision"
+        )
+        self._llm = meter.create_histogram("agent.llm.duration", unit="s", description="Chat completion latency")
+        self._tokens = meter.create_histogram("agent.llm.tokens", unit="{token}", description="Tokens per LLM call")
+        self._parse_failures = meter.create_counter(
+            "agent.parse.failures", description="Model outputs that failed JSON parsing or validation"
+        )
+        self._repairs = meter.create_counter(
+            "agent.parse.repairs", description="Repair attempts on invalid model outputs, by outcome"
+        )
+        self._single_flight = meter.create_counter(
+            "agent.single_flight.requests", description="LLM-bound requests that led or joined a shared call"
+        )
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Child span of the current context; yields ``None`` when disabled."""
+        if not self.enabled:
+            yield None
+            return
+        with self._tracer.start_as_current_span(
+            name, attributes={k: v for k, v in attributes.items() if v is not None}
+        ) as span:
+            yield span
+
+    def start_span(self, name: str, **attributes: Any) -> Any:
+        """Span that is not made current, for use across ``yield`` in async
+        generators; the caller must ``end()`` it."""
+        if not self.enabled:
+            return trace.INVALID_SPAN
+        return self._tracer.start_span(name, attributes={k: v for k, v in attributes.items() if v is not None})
+
+    @contextlib.contextmanager
+    def llm_call(self, agent: str, **attributes: Any) -> Iterator[Any]:
+        """``llm_call`` span that also records ``agent.llm.duration``."""
+        if not self.enabled:
+            yield None
+            return
+        started = time.perf_counter()
+        with self.span("llm_call", **{"gen_ai.agent.name": agent, **attributes}) as span:
+            try:
+                yield span
+            finally:
+                self.record_llm(agent, time.perf_counter() - started)
+
+    def record_llm(self, agent: str, seconds: float) -> None:
+        if self.enabled:
+            self._llm.record(seconds, {"agent": agent})
+
+    def record_routing(self, seconds: float, next_agent: str, tier: str) -> None:
+        if self.enabled:
+            self._routing.record(seconds, {"next_agent": next_agent, "tier": tier})
+
+    def record_usage(self, agent: str, input_tokens: int | None, output_tokens: int | None, span: Any = None) -> None:
+        """Token histogram plus ``gen_ai.usage.*`` attributes on ``span``."""
+        if not self.enabled:
+            return
+        for kind, count in (("input", input_tokens), ("output", output_tokens)):
+            if count is None:
+                continue
+            self._tokens.record(count, {"agent": agent, "kind": kind})
+            if span is not None:
+                span.set_attribute(f"gen_ai.usage.{kind}_tokens", count)
+
+    def record_parse_failure(self, agent: str, stage: str, next_agent: str | None = None) -> None:
+        if self.enabled:
+            self._parse_failures.add(1, {"agent": agent, "stage": stage, "next_agent": next_agent or "none"})
+
+    def record_repair(self, agent: str, outcome: str) -> None:
+        if self.enabled:
+            self._repairs.add(1, {"agent": agent, "outcome": outcome})
+
+    def record_single_flight(self, agent: str, role: str) -> None:
+        if self.enabled:
+            self._single_flight.add(1, {"agent": agent, "role": role})
+
+
+def usage_counts(response: Any) -> tuple[int | None, int | None]:
+    """``(input, output)`` tokens of an agent-framework response or LangChain message."""
+    details = getattr(response, "usage_details", None)
+    if details is not None:
+        return details.input_token_count, details.output_token_count
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        return metadata.get("input_tokens"), metadata.get("output_tokens")
+    return None, None
+
+
+# ---------------------------------------------------------------------------
+# Process-wide setup
+# ---------------------------------------------------------------------------
+
+
+def _configure_exporter(service_name: str) -> None:
+    exporter = os.getenv("AGENT_TELEMETRY_EXPORTER")
+    if exporter is None:
+        exporter = "azure" if os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING") else "none"
+    exporter = exporter.lower()
+    if exporter == "none":
+        return
+    if exporter == "azure":
+        from azure.monitor.opentelemetry import configure_azure_monitor
+
+        configure_azure_monitor(enable_live_metrics=True, logger_name="__main__")
+        return
+
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning(
+                "AGENT_TELEMETRY_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; not exporting"
+            )
+            return
+
+        span_exporter, metric_exporter = OTLPSpanExporter(), OTLPMetricExporter()
+    elif exporter == "console":
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+    else:
+        logger.warning("Unknown AGENT_TELEMETRY_EXPORTER %r; not exporting", exporter)
+        return
+
+    resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(
+        MeterProvider(resource=resource, metric_readers=[PeriodicExportingMetricReader(metric_exporter)])
+    )
+
+
+_telemetry: Telemetry | None = None
+_pending_export: str | None = None
+_lock = threading.Lock()
+
+
+def configure_telemetry(service_name: str, *, deferred: bool = False) -> Telemetry:
+    """Set up exporters once per process and return the shared ``Telemetry``.
+
+    With ``deferred`` the exporter is set up later by ``export_telemetry``
+    (the start-up warm-up, see ``startup.py``); instruments created before
+    then record through the OpenTelemetry proxy providers.
+    """
+    global _telemetry, _pending_export
+    if _telemetry is None:
+        with _lock:
+            if _telemetry is None:
+                enabled = os.getenv("AGENT_TELEMETRY", "on").lower() != "off"
+                if enabled and deferred:
+                    _pending_export = service_name
+                elif enabled:
+                    _configure_exporter(service_name)
+                _telemetry = Telemetry(enabled=enabled)
+    return _telemetry
+
+
+def export_telemetry() -> None:
+    """Set up the exporter deferred by ``configure_telemetry``, if any."""
+    global _pending_export
+    with _lock:
+        service_name, _pending_export = _pending_export, None
+    if service_name is not None:
+        _configure_exporter(service_name)
+
+
+def get_telemetry() -> Telemetry:
+    """The shared ``Telemetry``, configured for a generic service name if needed."""
+    return _telemetry or configure_telemetry("agents")
@@ -0,0 +1,452 @@
+"""Persistent, bounded conversation threads for the hosted agents.
+
+``ThreadStore`` keeps conversation state in one SQLite database instead of
+process memory:
+
+* the messages of ``agent_framework`` threads (``StoredMessages``, the
+  ``ChatMessageStoreProtocol`` given to threads by ``ensure_stored``);
+* the LangGraph checkpoints of the order agent (``checkpoints.py``).
+
+A restart with the same ``THREAD_STORE_PATH`` resumes every conversation. The
+default is ``threads.db`` in ``AGENT_DATA_DIR`` (see ``data_dir.py``); with
+neither set, agents keep the framework's in-memory threads.
+``:memory:`` keeps the database in process memory (no persistence, still
+bounded). File databases use WAL with ``synchronous=NORMAL`` (a crash can
+lose the last commits, not corrupt the file) and are read through
+``mmap`` (``THREAD_STORE_MMAP_MB``).
+
+Memory and disk stay bounded:
+
+* messages are stored as compact JSON (``[role, text]`` for plain text
+  messages, larger payloads zlib-compressed), not ``ChatMessage.to_dict()``;
+* only the ``THREAD_STORE_CACHED_THREADS`` most recently used threads keep
+  decoded messages in memory; idle threads are evicted (LRU) and reloaded
+  from the database on their next turn;
+* a thread keeps its last ``THREAD_STORE_MAX_MESSAGES`` messages (older ones
+  are deleted on append), the order agent its last ``THREAD_STORE_CHECKPOINTS``
+  checkpoints;
+* threads idle for ``THREAD_STORE_IDLE_HOURS`` are deleted, checked at most
+  every ``prune_interval`` seconds on writes.
+
+Several processes can share one database file (``AGENT_WORKERS``, see
+``workers.py``): a cached thread is used only while its sequence number
+matches the database, and forked workers open their own connection.
+
+Database calls are short and run inline, under one lock.
+``benchmarks/bench_thread_store.py`` measures memory at 10k threads.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from common.data_dir import store_path
+
+logger = logging.getLogger(__name__)
+
+# Payloads above this size are zlib-compressed (stored as BLOB instead of TEXT)
+_COMPRESS_BYTES = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    first_seq INTEGER NOT NULL DEFAULT 0,
+    next_seq INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS threads_updated ON threads (updated);
+CREATE TABLE IF NOT EXISTS messages (
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data NOT NULL,
+    PRIMARY KEY (thread_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+# ---------------------------------------------------------------------------
+# Message encoding
+# ---------------------------------------------------------------------------
+
+
+def pack(payload: str) -> str | bytes:
+    """Store short payloads as text, compress longer ones."""
+    if len(payload) <= _COMPRESS_BYTES:
+        return payload
+    return zlib.compress(payload.encode(), 1)
+
+
+def unpack(data: str | bytes) -> str:
+    return zlib.decompress(data).decode() if isinstance(data, bytes) else data
+
+
+def encode_message(message: Any) -> str | bytes:
+    """Compact encoding of a ``ChatMessage``.
+
+    Text-only messages become ``[role, text]`` (plus the message id, author
+    and additional properties when set); anything else falls back to
+    ``to_dict()``.
+    """
+    contents = message.contents
+    if len(contents) == 1 and getattr(contents[0], "type", None) == "text" and not contents[0].annotations:
+        role = message.role.value if hasattr(message.role, "value") else str(message.role)
+        record: list[Any] = [role, contents[0].text]
+        extras = {
+            key: value
+            for key, value in (
+                ("id", message.message_id),
+                ("author", message.author_name),
+                ("props", message.additional_properties or None),
+            )
+            if value is not None
+        }
+        if extras:
+            record.append(extras)
+        payload = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+    else:
+        payload = json.dumps(message.to_dict(), ensure_ascii=False, separators=(",", ":"), default=str)
+    return pack(payload)
+
+
+def decode_message(data: str | bytes) -> Any:
+    from agent_framework import ChatMessage
+
+    record = json.loads(unpack(data))
+    if isinstance(record, dict):
+        return ChatMessage.from_dict(record)
+    role, text, *rest = record
+    extras = rest[0] if rest else {}
+    return ChatMessage(
+        role=role,
+        text=text,
+        message_id=extras.get("id"),
+        author_name=extras.get("author"),
+        additional_properties=extras.get("props"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ThreadStoreStats:
+    """Counters exposed by ``ThreadStore.snapshot``."""
+
+    cache_hits: int = 0
+    cache_misses: int = 0
+    evictions: int = 0
+    messages_written: int = 0
+    messages_compacted: int = 0
+    threads_pruned: int = 0
+
+
+class ThreadStore:
+    """SQLite-backed conversation threads with an LRU of decoded messages.
+
+    ``max_messages=0`` keeps every message; ``idle_seconds=0`` never prunes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = ":memory:",
+        *,
+        max_cached_threads: int = 1024,
+        max_messages: int = 200,
+        idle_seconds: float = 7 * 24 * 3600,
+        prune_interval: float = 300.0,
+        mmap_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.path = str(path)
+        self.max_cached_threads = max_cached_threads
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.prune_interval = prune_interval
+        self.stats = ThreadStoreStats()
+        # Tables holding per-thread rows, deleted with the thread on prune
+        self.thread_tables = ["messages"]
+        # thread_id -> (next_seq when cached, decoded messages)
+        self._cache: OrderedDict[str, tuple[int, list[Any]]] = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_prune = time.time()
+        self._mmap_bytes = mmap_bytes
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        _stores.add(self)
+
+    @classmethod
+    def from_env(cls, path: str | Path) -> ThreadStore:
+        return cls(
+            path,
+            max_cached_threads=int(os.getenv("THREAD_STORE_CACHED_THREADS", "1024")),
+            max_messages=int(os.getenv("THREAD_STORE_MAX_MESSAGES", "200")),
+            idle_seconds=float(os.getenv("THREAD_STORE_IDLE_HOURS", "168")) * 3600,
+            mmap_bytes=int(os.getenv("THREAD_STORE_MMAP_MB", "64")) * 1024 * 1024,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA mmap_size={int(self._mmap_bytes)}")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _after_fork(self) -> None:
+        """In a forked child: a fresh lock and, for files, a connection of its own."""
+        self._lock = threading.RLock()
+        if self.path != ":memory:":
+            # Closing the inherited connection could release the parent's locks; keep it
+            self._inherited_db = self._db
+            self._db = self._connect()
+
+    def thread_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """The connection, inside one write transaction (for ``checkpoints.py``)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -- messages ------------------------------------------------------------
+
+    def message_store(self, thread_id: str | None = None) -> StoredMessages:
+        """A ``ChatMessageStoreProtocol`` for one thread (new id by default)."""
+        return StoredMessages(self, thread_id or uuid.uuid4().hex)
+
+    def load(self, thread_id: str) -> list[Any]:
+        """Messages of a thread, oldest first."""
+        with self._lock:
+            # Another process sharing the database may have appended since
+            row = self._db.execute("SELECT next_seq FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            seq = row[0] if row is not None else 0
+            cached = self._cache.get(thread_id)
+            if cached is not None and cached[0] == seq:
+                self.stats.cache_hits += 1
+                self._cache.move_to_end(thread_id)
+                return list(cached[1])
+            self.stats.cache_misses += 1
+            rows = self._db.execute(
+                "SELECT data FROM messages WHERE thread_id = ? ORDER BY seq", (thread_id,)
+            ).fetchall()
+            messages = [decode_message(data) for (data,) in rows]
+            self._remember(thread_id, seq, messages)
+            return list(messages)
+
+    def append(self, thread_id: str, messages: Sequence[Any]) -> None:
+        """Append messages, dropping the oldest beyond ``max_messages``."""
+        if not messages:
+            return
+        encoded = [encode_message(message) for message in messages]
+        with self.transaction() as db:
+            row = db.execute("SELECT first_seq, next_seq FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            first, seq = row if row is not None else (0, 0)
+            previous = seq
+            db.executemany(
+                "INSERT INTO messages (thread_id, seq, data) VALUES (?, ?, ?)",
+                [(thread_id, seq + i, data) for i, data in enumerate(encoded)],
+            )
+            seq += len(encoded)
+            if self.max_messages and seq - first > self.max_messages:
+                first = seq - self.max_messages
+                dropped = db.execute("DELETE FROM messages WHERE thread_id = ? AND seq < ?", (thread_id, first)).rowcount
+                self.stats.messages_compacted += dropped
+            db.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, updated, first_seq, next_seq) VALUES (?, ?, ?, ?)",
+                (thread_id, time.time(), first, seq),
+            )
+            self.stats.messages_written += len(encoded)
+
+            cached = self._cache.get(thread_id)
+            if cached is not None and cached[0] == previous:
+                cached[1].extend(messages)
+                if self.max_messages:
+                    del cached[1][: -self.max_messages]
+                self._remember(thread_id, seq, cached[1])
+            elif row is None:
+                # A new thread; nothing older to load later
+                self._remember(thread_id, seq, list(messages))
+            else:
+                # Stale (appended by another process): reload on next use
+                self._cache.pop(thread_id, None)
+        self._maybe_prune()
+
+    def _remember(self, thread_id: str, seq: int, messages: list[Any]) -> None:
+        self._cache[thread_id] = (seq, messages)
+        self._cache.move_to_end(thread_id)
+        while len(self._cache) > self.max_cached_threads:
+            self._cache.popitem(last=False)
+            self.stats.evictions += 1
+
+    # -- thread lifecycle ----------------------------------------------------
+
+    def touch(self, thread_id: str) -> None:
+        """Mark a thread as active (for tables other than ``messages``)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO threads (thread_id, updated) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET updated = excluded.updated",
+                (thread_id, time.time()),
+            )
+        self._maybe_prune()
+
+    def delete(self, thread_id: str) -> None:
+        with self.transaction() as db:
+            for table in self.thread_tables:
+                db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            db.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            self._cache.pop(thread_id, None)
+
+    def prune(self, now: float | None = None) -> int:
+        """Delete threads idle for longer than ``idle_seconds``; returns how many."""
+        if not self.idle_seconds:
+            return 0
+        cutoff = (now or time.time()) - self.idle_seconds
+        with self.transaction() as db:
+            idle = [thread_id for (thread_id,) in db.execute("SELECT thread_id FROM threads WHERE updated < ?", (cutoff,))]
+            for table in self.thread_tables:
+                db.execute(
+                    f"DELETE FROM {table} WHERE thread_id IN (SELECT thread_id FROM threads WHERE updated < ?)",
+                    (cutoff,),
+                )
+            db.execute("DELETE FROM threads WHERE updated < ?", (cutoff,))
+            for thread_id in idle:
+                self._cache.pop(thread_id, None)
+            self.stats.threads_pruned += len(idle)
+        if idle:
+            logger.info("Pruned %d idle threads from %s", len(idle), self.path)
+        return len(idle)
+
+    def _maybe_prune(self) -> None:
+        now = time.time()
+        if self.idle_seconds and now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.prune(now)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters plus thread and cache sizes, suitable for logging or export."""
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "threads": self.thread_count(),
+                "cached_threads": len(self._cache),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class StoredMessages:
+    """``ChatMessageStoreProtocol`` implementation backed by a ``ThreadStore``."""
+
+    def __init__(self, store: ThreadStore, thread_id: str) -> None:
+        self.store = store
+        self.thread_id = thread_id
+
+    async def list_messages(self) -> list[Any]:
+        return self.store.load(self.thread_id)
+
+    async def add_messages(self, messages: Sequence[Any]) -> None:
+        self.store.append(self.thread_id, list(messages))
+
+    @classmethod
+    async def deserialize(cls, serialized_store_state: Any, *, store: ThreadStore | None = None, **kwargs: Any) -> StoredMessages:
+        if store is None:
+            store = get_thread_store()
+        stored = cls(store, serialized_store_state.get("thread_id") or uuid.uuid4().hex)
+        await stored.update_from_state(serialized_store_state)
+        return stored
+
+    async def update_from_state(self, serialized_store_state: Any, **kwargs: Any) -> None:
+        if not serialized_store_state:
+            return
+        thread_id = serialized_store_state.get("thread_id")
+        if thread_id and self.store.query("SELECT 1 FROM threads WHERE thread_id = ?", (thread_id,)):
+            self.thread_id = thread_id
+            return
+        from agent_framework._threads import ChatMessageStoreState
+
+        state = ChatMessageStoreState.from_dict(serialized_store_state)
+        await self.add_messages(state.messages)
+
+    async def serialize(self, **kwargs: Any) -> dict[str, Any]:
+        """The messages, like ``ChatMessageStore``, plus the thread id."""
+        from agent_framework._threads import ChatMessageStoreState
+
+        state = ChatMessageStoreState(messages=await self.list_messages()).to_dict()
+        return {**state, "thread_id": self.thread_id}
+
+
+def ensure_stored(thread: Any, store: ThreadStore | None = None) -> None:
+    """Give a local ``AgentThread`` without a message store a stored one.
+
+    Threads managed by the service (``service_thread_id``) are left alone.
+    """
+    if thread.message_store is not None or thread.service_thread_id is not None:
+        return
+    if store is None:
+        store = get_thread_store()
+    if store is not None:
+        thread.message_store = store.message_store()
+
+
+# Every open store, for reopening connections in forked worker processes
+_stores: weakref.WeakSet[ThreadStore] = weakref.WeakSet()
+
+
+def _after_fork() -> None:
+    for store in list(_stores):
+        store._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+_store: ThreadStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_thread_store() -> ThreadStore | None:
+    """The process-wide store at ``THREAD_STORE_PATH`` (default: ``threads.db`` in
+    ``AGENT_DATA_DIR``), or ``None`` when it is ``off`` or neither is set."""
+    global _store
+    path = store_path("THREAD_STORE_PATH", "threads.db")
+    if path is None:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ThreadStore.from_env(path)
+    return _store
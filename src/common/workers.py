@@ -0,0 +1,200 @@
+"""Multi-process serving for the hosted agents (``AGENT_WORKERS``).
+
+The hosted adapter serves every request on one event loop in one process,
+so the agents' CPU work (JSON and pydantic parsing, graph steps, the order
+agent's sync LLM calls and their parsing) shares one GIL. With
+``AGENT_WORKERS`` above 1 (``auto``: one per available CPU), ``serve``
+pre-forks instead:
+
+* the parent imports and constructs the agent once, imports the modules of
+  the deferred clients (``Warmup.preload``), binds the port (8088) and
+  freezes the garbage collector; the workers share these pages
+  copy-on-write instead of each importing and loading them again;
+* each worker accepts connections on the inherited listening socket (the
+  kernel hands every connection to one worker) and has its own event loop,
+  warm-up, token, HTTP connections and ``/readiness``;
+* a worker that exits unexpectedly is replaced, at most once per
+  ``AGENT_WORKER_RESTART_SECONDS`` per slot;
+* SIGTERM / SIGINT are forwarded to the workers, which stop accepting,
+  finish in-flight requests and exit (uvicorn's graceful shutdown); workers
+  still running after ``AGENT_WORKER_SHUTDOWN_SECONDS`` are killed. A second
+  signal kills them at once.
+
+Resources that must not cross a fork (SQLite connections, threads) are
+reopened in each worker with ``os.register_at_fork``. ``worker_id()`` numbers
+the workers ``0..N-1``, stable across restarts. Agents with state that must
+stay in one process (the order agent's stock and order log) pass
+``max_workers=1`` to ``serve``. ``benchmarks/bench_workers.py`` measures
+throughput per worker count.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+# Slot of this process while it serves as a worker; None in the parent or
+# when serving from a single process
+_worker_id: int | None = None
+
+
+def worker_id() -> int | None:
+    """Index of this worker process, ``None`` outside multi-process serving."""
+    return _worker_id
+
+
+def worker_count() -> int:
+    """Worker processes per ``AGENT_WORKERS`` (default 1: serve in-process)."""
+    value = os.getenv("AGENT_WORKERS", "1").strip().lower()
+    if value == "auto":
+        return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning("Invalid AGENT_WORKERS %r; serving from one process", value)
+        return 1
+
+
+def listen(port: int, host: str = "0.0.0.0", backlog: int = 2048) -> socket.socket:
+    """Listening socket shared by the workers."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Forks ``workers`` processes running ``serve_socket(sock)`` and keeps them running."""
+
+    def __init__(
+        self,
+        serve_socket: Callable[[socket.socket], None],
+        sock: socket.socket,
+        workers: int,
+        *,
+        shutdown_timeout: float | None = None,
+        restart_delay: float | None = None,
+    ) -> None:
+        if shutdown_timeout is None:
+            shutdown_timeout = float(os.getenv("AGENT_WORKER_SHUTDOWN_SECONDS", "30"))
+        if restart_delay is None:
+            restart_delay = float(os.getenv("AGENT_WORKER_RESTART_SECONDS", "1"))
+        self.serve_socket = serve_socket
+        self.sock = sock
+        self.workers = workers
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_delay = restart_delay
+        self.restarts = 0
+        self._pids: dict[int, int] = {}  # pid -> slot
+        self._started: dict[int, float] = {}  # slot -> start time
+        self._due: dict[int, float] = {}  # slot -> restart time
+        self._signals = 0
+
+    def _spawn(self, slot: int) -> None:
+        global _worker_id
+        # Set before forking so that fork hooks in the child see the slot
+        _worker_id = slot
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self.serve_socket(self.sock)
+                code = 0
+            except BaseException:
+                logger.exception("Worker %d failed", slot)
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        _worker_id = None
+        self._pids[pid] = slot
+        self._started[slot] = time.monotonic()
+        logger.info("Started worker %d (pid %d)", slot, pid)
+
+    def _on_signal(self, signum: int, frame: object) -> None:
+        self._signals += 1
+        if self._signals > 1:
+            self._kill(signal.SIGKILL)
+
+    def _kill(self, signum: int) -> None:
+        for pid in list(self._pids):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> list[tuple[int, int]]:
+        """``(slot, exit code)`` of the workers that exited since the last call."""
+        exited = []
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            slot = self._pids.pop(pid, None)
+            if slot is not None:
+                exited.append((slot, os.waitstatus_to_exitcode(status)))
+        return exited
+
+    def run(self) -> None:
+        """Serve until SIGTERM / SIGINT, then shut the workers down."""
+        previous = {s: signal.signal(s, self._on_signal) for s in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for slot in range(self.workers):
+                self._spawn(slot)
+            while not self._signals:
+                now = time.monotonic()
+                for slot, code in self._reap():
+                    uptime = now - self._started[slot]
+                    logger.warning("Worker %d exited with code %d after %.1fs; restarting", slot, code, uptime)
+                    self._due[slot] = now + max(0.0, self.restart_delay - uptime)
+                for slot, due in list(self._due.items()):
+                    if due <= now:
+                        del self._due[slot]
+                        self.restarts += 1
+                        self._spawn(slot)
+                time.sleep(0.1)
+            self._shutdown()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def _shutdown(self) -> None:
+        logger.info("Stopping %d workers", len(self._pids))
+        self._kill(signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self._pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        if self._pids:
+            logger.warning("Killing %d workers still running after %.0fs", len(self._pids), self.shutdown_timeout)
+            self._kill(signal.SIGKILL)
+            while self._pids:
+                pid, _ = os.waitpid(-1, 0)
+                self._pids.pop(pid, None)
+        self.sock.close()
+
+
+def serve_workers(serve_socket: Callable[[socket.socket], None], workers: int, port: int) -> None:
+    """Bind ``port`` and serve it from ``workers`` forked processes."""
+    if not hasattr(os, "fork"):
+        raise RuntimeError("AGENT_WORKERS > 1 needs os.fork (Linux, macOS)")
+    sock = listen(port)
+    # Objects created so far (modules, the agent, the catalog) stay shared:
+    # collections in the workers would otherwise touch and copy their pages
+    gc.collect()
+    gc.freeze()
+    logger.info("Serving on port %d from %d workers", port, workers)
+    Supervisor(serve_socket, sock, workers).run()
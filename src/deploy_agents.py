@@ -1,12 +1,41 @@
+"""Create or update the hosted agents for the images listed in ``.env``.
+
+Every ``<NAME>_IMAGE`` variable becomes a hosted agent ``<name>`` (e.g.
+``ORDER_ORCHESTRATOR_IMAGE`` -> ``order-orchestrator``). Data shared by all
+agents (the Bing connection, endpoints, protocol versions) is fetched once.
+Each agent's latest version is then compared with the desired image, CPU,
+memory and environment, and new versions are created only for the agents
+that differ, concurrently on a bounded thread pool (``--max-workers`` /
+``DEPLOY_CONCURRENCY``). A timing summary is printed at the end.
+
+``deploy`` takes the project client as an argument, so the engine can run
+against a local fake (see ``benchmarks/bench_deploy.py``).
+
+Usage::
+
+    python deploy_agents.py [--force] [--dry-run] [--max-workers 4]
+"""
+
+import argparse
 import os
+import sys
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
 from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import ImageBasedHostedAgentDefinition, ProtocolVersionRecord, AgentProtocol, BingCustomSearchAgentTool, BingCustomSearchToolParameters, BingCustomSearchConfiguration
 from azure.identity import DefaultAzureCredential
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_CPU = "1"
+DEFAULT_MEMORY = "2Gi"
+
+
 def get_env(name: str, required: bool = True, default: str | None = None) -> str:
   value = os.getenv(name, default)
   if required and not value:
@@ -14,66 +43,209 @@ def get_env(name: str, required: bool = True, default: str | None = None) -> str
   return value
 
 
-def main() -> None:
-  # These come from azd / Bicep outputs and the container images we built
-  project_endpoint = get_env("AZURE_AI_PROJECT_ENDPOINT", required=True)
-  model_deployment_name = get_env("AZURE_AI_MODEL_DEPLOYMENT_NAME", required=True, default="o4-mini")
-  aoai_endpoint = get_env("AZURE_OPENAI_ENDPOINT", required=True)
-  openai_api_version = get_env("OPENAI_API_VERSION", required=True, default="2024-05-01-preview")
+# ---------------------------------------------------------------------------
+# Desired state
+# ---------------------------------------------------------------------------
 
-  credential = DefaultAzureCredential()
 
-  client = AIProjectClient(
-      endpoint=project_endpoint,
-      credential=credential,
+@dataclass(frozen=True)
+class AgentSpec:
+  """Desired configuration of one hosted agent."""
+
+  name: str
+  image: str
+  cpu: str = DEFAULT_CPU
+  memory: str = DEFAULT_MEMORY
+  environment: Mapping[str, str] = field(default_factory=dict)
+
+
+def desired_agents(environ: Mapping[str, str], environment: Mapping[str, str]) -> list[AgentSpec]:
+  """One spec per non-empty ``<NAME>_IMAGE`` variable.
+
+  ``<NAME>_CPU`` / ``<NAME>_MEMORY`` override ``AGENT_CPU`` / ``AGENT_MEMORY``
+  (defaults 1 CPU, 2Gi).
+  """
+  specs = []
+  for key, image in sorted(environ.items()):
+      if not key.endswith("_IMAGE") or not image:
+          continue
+      # PRODUCT_AGENT_IMAGE -> product-agent
+      base_name = key[:-len("_IMAGE")]
+      specs.append(
+          AgentSpec(
+              name=base_name.lower().replace("_", "-"),
+              image=image,
+              cpu=environ.get(f"{base_name}_CPU") or environ.get("AGENT_CPU") or DEFAULT_CPU,
+              memory=environ.get(f"{base_name}_MEMORY") or environ.get("AGENT_MEMORY") or DEFAULT_MEMORY,
+              environment=dict(environment),
+          )
+      )
+  return specs
+
+
+def is_current(spec: AgentSpec, definition: Any) -> bool:
+  """Whether a deployed definition already matches ``spec``."""
+  if definition is None:
+      return False
+  return (
+      getattr(definition, "image", None) == spec.image
+      and str(getattr(definition, "cpu", "")) == spec.cpu
+      and str(getattr(definition, "memory", "")) == spec.memory
+      and dict(getattr(definition, "environment_variables", None) or {}) == dict(spec.environment)
+  )
+
+
+def latest_definition(client: Any, agent_name: str) -> Any:
+  """Definition of the agent's latest version, or ``None`` if it does not exist."""
+  from azure.core.exceptions import ResourceNotFoundError
+
+  try:
+      agent = client.agents.get(agent_name)
+  except ResourceNotFoundError:
+      return None
+  latest = getattr(getattr(agent, "versions", None), "latest", None)
+  return getattr(latest, "definition", None)
+
+
+# ---------------------------------------------------------------------------
+# Deployment engine
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class DeployResult:
+  """Outcome of one agent: ``created``, ``unchanged``, ``planned`` or ``failed``."""
+
+  name: str
+  action: str
+  seconds: float
+  detail: str = ""
+
+
+def deploy(
+    client: Any,
+    specs: list[AgentSpec],
+    definition_for: Callable[[AgentSpec], Any],
+    *,
+    max_workers: int = 4,
+    force: bool = False,
+    dry_run: bool = False,
+) -> list[DeployResult]:
+  """Create versions for the specs that differ from what is deployed, concurrently."""
+
+  def deploy_one(spec: AgentSpec) -> DeployResult:
+      started = time.perf_counter()
+      try:
+          if not force and is_current(spec, latest_definition(client, spec.name)):
+              return DeployResult(spec.name, "unchanged", time.perf_counter() - started, spec.image)
+          if dry_run:
+              return DeployResult(spec.name, "planned", time.perf_counter() - started, spec.image)
+          agent = client.agents.create_version(
+              agent_name=spec.name,
+              description=f"Hosted agent for {spec.name}",
+              definition=definition_for(spec),
+          )
+          return DeployResult(spec.name, "created", time.perf_counter() - started, agent.id)
+      except Exception as e:
+          return DeployResult(spec.name, "failed", time.perf_counter() - started, f"{type(e).__name__}: {e}")
+
+  if not specs:
+      return []
+  with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs))), thread_name_prefix="deploy") as pool:
+      return list(pool.map(deploy_one, specs))
+
+
+def print_summary(results: list[DeployResult], total_seconds: float) -> None:
+  width = max((len(r.name) for r in results), default=5)
+  for r in results:
+      print(f"  {r.name:<{width}}  {r.action:<9}  {r.seconds:6.2f}s  {r.detail}")
+  counts = {action: sum(r.action == action for r in results) for action in ("created", "unchanged", "planned", "failed")}
+  summary = ", ".join(f"{count} {action}" for action, count in counts.items() if count)
+  serial = sum(r.seconds for r in results)
+  print(f"Checked {len(results)} agents in {total_seconds:.2f}s ({serial:.2f}s of agent work): {summary or 'nothing to do'}")
+
+
+# ---------------------------------------------------------------------------
+# Hosted agent definition
+# ---------------------------------------------------------------------------
+
+
+def hosted_definition_factory(bing_connection_id: str) -> Callable[[AgentSpec], Any]:
+  """Build image-based hosted agent definitions sharing one Bing tool."""
+  # Imported here so the engine above can be used without the preview models
+  from azure.ai.projects.models import (
+      AgentProtocol,
+      BingCustomSearchAgentTool,
+      BingCustomSearchConfiguration,
+      BingCustomSearchToolParameters,
+      ImageBasedHostedAgentDefinition,
+      ProtocolVersionRecord,
   )
 
   # Shared container protocol versions for hosted agents
   protocols = [ProtocolVersionRecord(protocol=AgentProtocol.RESPONSES, version="v2")]
+  tools = [BingCustomSearchAgentTool(
+      bing_custom_search_preview=BingCustomSearchToolParameters(
+          search_configurations=[BingCustomSearchConfiguration(project_connection_id=bing_connection_id)]
+      )
+  )]
 
-  # Automatically discover all *_IMAGE variables in the environment
-  # and create/update a hosted agent for each.
-  for key, value in os.environ.items():
-      if not key.endswith("_IMAGE"):
-          continue
+  def definition_for(spec: AgentSpec) -> Any:
+      return ImageBasedHostedAgentDefinition(
+          container_protocol_versions=protocols,
+          cpu=spec.cpu,
+          memory=spec.memory,
+          image=spec.image,
+          environment_variables=dict(spec.environment),
+          tools=tools,
+      )
 
-      image_tag = value
-      if not image_tag:
-          continue
+  return definition_for
 
-      # Derive agent name from variable name, e.g.
-      # PRODUCT_AGENT_IMAGE -> product-agent
-      base_name = key[:-len("_IMAGE")]  # strip suffix
-      # Replace _ with - and lowercase
-      agent_name = base_name.lower().replace("_", "-")
-
-      bing_conn_id = client.connections.get(os.environ["BING_CUSTOM_GROUNDING_CONNECTION_NAME"]).id
-
-      agent = client.agents.create_version(
-          agent_name=agent_name,
-          description=f"Hosted agent for {agent_name}",
-          definition=ImageBasedHostedAgentDefinition(
-              container_protocol_versions=protocols,
-              cpu="1",
-              memory="2Gi",
-              image=image_tag,
-              environment_variables={
-                  "AZURE_AI_PROJECT_ENDPOINT": project_endpoint,
-                  "AZURE_AI_MODEL_DEPLOYMENT_NAME": model_deployment_name,
-                  "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": model_deployment_name,
-                  "AZURE_OPENAI_ENDPOINT": aoai_endpoint,
-                  "OPENAI_API_VERSION": openai_api_version,
-              },
-              tools=[BingCustomSearchAgentTool(
-                 bing_custom_search_preview=BingCustomSearchToolParameters(
-                    search_configurations=[BingCustomSearchConfiguration(
-                        project_connection_id=bing_conn_id)]
-                 )
-              )],
-          ),
-      )
-      print(f"Agent '{agent_name}' created: {agent.id}")
+
+def main(argv: list[str] | None = None) -> None:
+  parser = argparse.ArgumentParser(description="Create or update hosted agents for the *_IMAGE variables.")
+  parser.add_argument("--force", action="store_true", help="Create new versions even for unchanged agents.")
+  parser.add_argument("--dry-run", action="store_true", help="Only report which agents would be updated.")
+  parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_CONCURRENCY", "4")))
+  args = parser.parse_args(argv)
+
+  # These come from azd / Bicep outputs and the container images we built
+  project_endpoint = get_env("AZURE_AI_PROJECT_ENDPOINT", required=True)
+  model_deployment_name = get_env("AZURE_AI_MODEL_DEPLOYMENT_NAME", required=True, default="o4-mini")
+  aoai_endpoint = get_env("AZURE_OPENAI_ENDPOINT", required=True)
+  openai_api_version = get_env("OPENAI_API_VERSION", required=True, default="2024-10-21")
+
+  client = AIProjectClient(
+      endpoint=project_endpoint,
+      credential=DefaultAzureCredential(),
+  )
+
+  started = time.perf_counter()
+  # Shared by every agent, so fetched once
+  bing_conn_id = client.connections.get(get_env("BING_CUSTOM_GROUNDING_CONNECTION_NAME")).id
+  specs = desired_agents(
+      os.environ,
+      {
+          "AZURE_AI_PROJECT_ENDPOINT": project_endpoint,
+          "AZURE_AI_MODEL_DEPLOYMENT_NAME": model_deployment_name,
+          "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": model_deployment_name,
+          "AZURE_OPENAI_ENDPOINT": aoai_endpoint,
+          "OPENAI_API_VERSION": openai_api_version,
+      },
+  )
+  results = deploy(
+      client,
+      specs,
+      hosted_definition_factory(bing_conn_id),
+      max_workers=args.max_workers,
+      force=args.force,
+      dry_run=args.dry_run,
+  )
+  print_summary(results, time.perf_counter() - started)
+  if any(r.action == "failed" for r in results):
+      sys.exit(1)
 
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  main()
@@ -0,0 +1,472 @@
+"""Run workflow definitions (``src/workflows/*.yaml``) in-process.
+
+The hosted service executes these workflows by calling each agent over
+HTTP. This runner interprets the same YAML locally and calls the agents as
+Python objects, so the whole multi-agent path can be debugged, profiled and
+benchmarked (with mock chat clients) without a deployment.
+
+Supported actions: ``InvokeAzureAgent``, ``ConditionGroup`` and
+``SetVariable``. Expressions (values starting with ``=``) support the
+subset of Power Fx used by the workflows: ``System.*``/``Local.*`` paths,
+string/number/boolean literals, ``= <> < <= > >=``, ``&`` concatenation,
+``And``/``Or``/``Not`` (also ``&&``/``||``/``!``) and the functions ``If``,
+``Text``, ``Lower``, ``Upper``, ``IsBlank`` and ``Blank``.
+
+Every action is timed; ``WorkflowRun.timings`` lists them in execution order.
+
+Usage::
+
+    cd src/workflows
+    python local_runner.py sample.yaml "I need an oak dining table"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import re
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+import yaml
+from dotenv import load_dotenv
+
+from agent_framework import ChatMessage, Role
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+
+
+class WorkflowError(Exception):
+    """Invalid workflow definition or expression."""
+
+
+# ---------------------------------------------------------------------------
+# Expressions
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"]|"")*")
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<name>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)
+      | (?P<op><>|<=|>=|&&|\|\||[=<>&(),!])
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+def _tokenize(source: str) -> list[tuple[str, str]]:
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = _TOKEN.match(source, position)
+        if match is None or match.end() == position:
+            raise WorkflowError(f"Unexpected character in expression at {position}: {source!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def text(value: Any) -> str:
+    """Power Fx ``Text()``: blank is ``""``, messages are their text, records JSON."""
+    if value is None:
+        return ""
+    if isinstance(value, ChatMessage):
+        return value.text or ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if isinstance(left, ChatMessage) or isinstance(right, ChatMessage):
+        left, right = text(left), text(right)
+    if op == "=":
+        return left == right
+    if op == "<>":
+        return left != right
+    if left is None or right is None:
+        return False
+    return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+
+_FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "Text": text,
+    "Lower": lambda value: text(value).lower(),
+    "Upper": lambda value: text(value).upper(),
+    "IsBlank": lambda value: value is None or value == "",
+    "Blank": lambda: None,
+    "Not": lambda value: not value,
+    "And": lambda *values: all(values),
+    "Or": lambda *values: any(values),
+}
+
+
+class Expression:
+    """Parsed Power Fx subset, evaluated against the workflow scopes."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._tokens = _tokenize(source)
+        self._position = 0
+        self._tree = self._or()
+        if self._position != len(self._tokens):
+            raise WorkflowError(f"Unexpected {self._tokens[self._position][1]!r} in {source!r}")
+
+    # -- parser (builds closures over the scopes dict) -------------------------
+
+    def _peek(self) -> str | None:
+        return self._tokens[self._position][1] if self._position < len(self._tokens) else None
+
+    def _take(self, expected: str | None = None) -> tuple[str, str]:
+        if self._position >= len(self._tokens):
+            raise WorkflowError(f"Unexpected end of expression {self.source!r}")
+        token = self._tokens[self._position]
+        if expected is not None and token[1] != expected:
+            raise WorkflowError(f"Expected {expected!r}, got {token[1]!r} in {self.source!r}")
+        self._position += 1
+        return token
+
+    def _binary(self, operand: Callable, operators: tuple[str, ...], combine: Callable) -> Callable:
+        node = operand()
+        while self._peek() in operators:
+            op = self._take()[1]
+            right = operand()
+            node = (lambda left, right, op: lambda scopes: combine(op, left(scopes), right(scopes)))(node, right, op)
+        return node
+
+    def _or(self) -> Callable:
+        return self._binary(self._and, ("||", "Or"), lambda _, a, b: bool(a) or bool(b))
+
+    def _and(self) -> Callable:
+        return self._binary(self._comparison, ("&&", "And"), lambda _, a, b: bool(a) and bool(b))
+
+    def _comparison(self) -> Callable:
+        return self._binary(self._concat, ("=", "<>", "<", "<=", ">", ">="), _compare)
+
+    def _concat(self) -> Callable:
+        return self._binary(self._unary, ("&",), lambda _, a, b: text(a) + text(b))
+
+    def _unary(self) -> Callable:
+        if self._peek() == "!":
+            self._take()
+            operand = self._unary()
+            return lambda scopes: not operand(scopes)
+        return self._primary()
+
+    def _primary(self) -> Callable:
+        kind, value = self._take()
+        if kind == "string":
+            literal = value[1:-1].replace('""', '"')
+            return lambda scopes: literal
+        if kind == "number":
+            number = float(value) if "." in value else int(value)
+            return lambda scopes: number
+        if value == "(":
+            node = self._or()
+            self._take(")")
+            return node
+        if kind != "name":
+            raise WorkflowError(f"Unexpected {value!r} in {self.source!r}")
+        if value in ("true", "false"):
+            return lambda scopes: value == "true"
+        if self._peek() == "(":
+            return self._call(value)
+        path = value.split(".")
+        return lambda scopes: resolve(scopes, path)
+
+    def _call(self, name: str) -> Callable:
+        self._take("(")
+        args: list[Callable] = []
+        while self._peek() != ")":
+            args.append(self._or())
+            if self._peek() != ")":
+                self._take(",")
+        self._take(")")
+        if name == "If":
+            # If(cond1, value1, [cond2, value2, ...], [else]) evaluates lazily
+            if len(args) < 2:
+                raise WorkflowError(f"If() needs at least two arguments in {self.source!r}")
+
+            def if_(scopes: dict) -> Any:
+                for i in range(0, len(args) - 1, 2):
+                    if args[i](scopes):
+                        return args[i + 1](scopes)
+                return args[-1](scopes) if len(args) % 2 else None
+
+            return if_
+        function = _FUNCTIONS.get(name)
+        if function is None:
+            raise WorkflowError(f"Unsupported function {name}() in {self.source!r}")
+        return lambda scopes: function(*(arg(scopes) for arg in args))
+
+    def evaluate(self, scopes: dict[str, dict[str, Any]]) -> Any:
+        return self._tree(scopes)
+
+
+def resolve(scopes: dict[str, dict[str, Any]], path: list[str]) -> Any:
+    """Value at ``Scope.name.field...``; missing members are blank (``None``)."""
+    if path[0] not in scopes:
+        raise WorkflowError(f"Unknown scope {path[0]!r} (expected one of {sorted(scopes)})")
+    value: Any = scopes[path[0]]
+    for part in path[1:]:
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+        if value is None:
+            return None
+    return value
+
+
+def evaluate(value: Any, scopes: dict[str, dict[str, Any]], cache: dict[str, Expression]) -> Any:
+    """Evaluate ``value`` if it is an ``=expression``; other values are literals."""
+    if not isinstance(value, str) or not value.startswith("="):
+        return value
+    expression = cache.get(value)
+    if expression is None:
+        expression = cache[value] = Expression(value[1:])
+    return expression.evaluate(scopes)
+
+
+# ---------------------------------------------------------------------------
+# Agents
+# ---------------------------------------------------------------------------
+
+
+def _load_agent_module(name: str) -> ModuleType:
+    """Import ``src/agents/<name>/agent.py`` as ``<name>_agent``."""
+    module_name = name.replace("-", "_") + "_agent"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    folder = AGENTS_DIR / name
+    if not (folder / "agent.py").exists():
+        raise WorkflowError(f"No local agent {name!r} in {AGENTS_DIR}")
+    sys.path.insert(0, str(folder))
+    spec = importlib.util.spec_from_file_location(module_name, folder / "agent.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# How each hosted agent is constructed from its module, keyed by agent name
+_FACTORIES: dict[str, Callable[[ModuleType], Any]] = {
+    "order-orchestrator": lambda module: module.OrderOrchestratorAgent(name="order-orchestrator"),
+    "product-search": lambda module: module.ProductSearchAgent(),
+    "order": lambda module: module.build_async_agent(),
+    "order-router": lambda module: module.OrderRouterAgent(),
+}
+
+
+class AgentRegistry:
+    """Agents by hosted name; unknown names are built from ``src/agents`` on first use."""
+
+    def __init__(self, agents: dict[str, Any] | None = None) -> None:
+        self._agents = dict(agents or {})
+
+    def get(self, name: str) -> Any:
+        agent = self._agents.get(name)
+        if agent is None:
+            factory = _FACTORIES.get(name)
+            if factory is None:
+                raise WorkflowError(f"Agent {name!r} is neither registered nor known locally")
+            agent = self._agents[name] = factory(_load_agent_module(name))
+        return agent
+
+
+async def invoke_agent(agent: Any, messages: list[ChatMessage], conversation_id: str) -> list[ChatMessage]:
+    """Run an agent-framework agent or a compiled LangGraph graph."""
+    if hasattr(agent, "ainvoke"):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        state = await agent.ainvoke(
+            {
+                "messages": [
+                    AIMessage(content=m.text or "") if m.role == Role.ASSISTANT else HumanMessage(content=m.text or "")
+                    for m in messages
+                ]
+            },
+            config={"configurable": {"thread_id": conversation_id}},
+        )
+        return [ChatMessage(role=Role.ASSISTANT, text=str(state["messages"][-1].content))]
+    response = await agent.run(messages)
+    return list(response.messages)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ActionTiming:
+    """Wall time of one executed action; ``depth`` is its nesting level."""
+
+    action_id: str
+    kind: str
+    seconds: float
+    depth: int = 0
+    agent: str | None = None
+
+
+@dataclass
+class WorkflowRun:
+    """Result of one workflow execution."""
+
+    messages: list[ChatMessage] = field(default_factory=list)
+    variables: dict[str, Any] = field(default_factory=dict)
+    timings: list[ActionTiming] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def agent_seconds(self) -> float:
+        return sum(t.seconds for t in self.timings if t.kind == "InvokeAzureAgent")
+
+    def format_timings(self) -> str:
+        lines = [
+            f"{'  ' * t.depth}{t.kind:<18} {t.action_id:<28} {t.agent or '':<20} {t.seconds * 1000:9.1f}ms"
+            for t in self.timings
+        ]
+        lines.append(f"{'total':<48} {'':<20} {self.seconds * 1000:9.1f}ms")
+        return "\n".join(lines)
+
+
+class WorkflowRunner:
+    """Interprets one workflow definition against an ``AgentRegistry``."""
+
+    def __init__(self, definition: dict[str, Any], registry: AgentRegistry | None = None) -> None:
+        if definition.get("kind") != "workflow":
+            raise WorkflowError(f"Expected kind: workflow, got {definition.get('kind')!r}")
+        self.definition = definition
+        self.registry = registry or AgentRegistry()
+        self._expressions: dict[str, Expression] = {}
+
+    @classmethod
+    def from_file(cls, path: str | Path, registry: AgentRegistry | None = None) -> WorkflowRunner:
+        with open(path, encoding="utf-8") as f:
+            return cls(yaml.safe_load(f), registry)
+
+    async def run(
+        self,
+        messages: str | ChatMessage | list[ChatMessage],
+        *,
+        conversation_id: str | None = None,
+    ) -> WorkflowRun:
+        """Execute the trigger's actions for a new conversation."""
+        if isinstance(messages, str):
+            messages = [ChatMessage(role=Role.USER, text=messages)]
+        elif isinstance(messages, ChatMessage):
+            messages = [messages]
+        conversation_id = conversation_id or uuid.uuid4().hex
+        run = WorkflowRun()
+        scopes = {
+            "System": {
+                "LastMessage": messages[-1] if messages else None,
+                "ConversationId": conversation_id,
+                "Conversation": {"Id": conversation_id, "Messages": messages},
+            },
+            "Local": run.variables,
+        }
+        started = time.perf_counter()
+        await self._execute(self.definition.get("trigger", {}).get("actions", []), scopes, run, depth=0)
+        run.seconds = time.perf_counter() - started
+        return run
+
+    async def _execute(self, actions: list[dict], scopes: dict, run: WorkflowRun, *, depth: int) -> None:
+        for action in actions or []:
+            kind = action.get("kind")
+            handler = getattr(self, f"_action_{kind}", None)
+            if handler is None:
+                raise WorkflowError(f"Unsupported action kind {kind!r} ({action.get('id')})")
+            timing = ActionTiming(action_id=action.get("id", ""), kind=kind, seconds=0.0, depth=depth)
+            run.timings.append(timing)
+            started = time.perf_counter()
+            await handler(action, scopes, run, timing, depth)
+            timing.seconds = time.perf_counter() - started
+
+    def _assign(self, scopes: dict, target: str, value: Any) -> None:
+        path = target.lstrip("=").split(".")
+        if len(path) < 2 or path[0] != "Local":
+            raise WorkflowError(f"Can only assign to Local.* variables, got {target!r}")
+        container = scopes["Local"]
+        for part in path[1:-1]:
+            container = container.setdefault(part, {})
+        container[path[-1]] = value
+
+    async def _action_InvokeAzureAgent(
+        self, action: dict, scopes: dict, run: WorkflowRun, timing: ActionTiming, depth: int
+    ) -> None:
+        name = action.get("agent", {}).get("name")
+        timing.agent = name
+        agent = self.registry.get(name)
+        value = evaluate(action.get("input", {}).get("messages", "=System.LastMessage"), scopes, self._expressions)
+        if isinstance(value, str):
+            value = [ChatMessage(role=Role.USER, text=value)]
+        elif isinstance(value, ChatMessage):
+            value = [value]
+
+        response = await invoke_agent(agent, list(value or []), scopes["System"]["ConversationId"])
+
+        output = action.get("output", {})
+        if output.get("autoSend"):
+            run.messages.extend(response)
+        if output.get("messages"):
+            self._assign(scopes, output["messages"], response)
+        if output.get("responseObject"):
+            raw = response[0].text if response else ""
+            try:
+                parsed = json.loads(raw) if raw else None
+            except json.JSONDecodeError:
+                parsed = None
+            self._assign(scopes, output["responseObject"], parsed)
+
+    async def _action_ConditionGroup(
+        self, action: dict, scopes: dict, run: WorkflowRun, timing: ActionTiming, depth: int
+    ) -> None:
+        for condition in action.get("conditions", []):
+            if evaluate(condition.get("condition"), scopes, self._expressions):
+                await self._execute(condition.get("actions", []), scopes, run, depth=depth + 1)
+                return
+        await self._execute(action.get("elseActions", []), scopes, run, depth=depth + 1)
+
+    async def _action_SetVariable(
+        self, action: dict, scopes: dict, run: WorkflowRun, timing: ActionTiming, depth: int
+    ) -> None:
+        self._assign(scopes, action["variable"], evaluate(action.get("value"), scopes, self._expressions))
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a workflow YAML locally with in-process agents.")
+    parser.add_argument("workflow", help="Workflow YAML file, e.g. sample.yaml")
+    parser.add_argument("message", help="User message that starts the conversation")
+    args = parser.parse_args()
+
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent.parent / ".env", override=True)
+    run = await WorkflowRunner.from_file(args.workflow).run(args.message)
+    for message in run.messages:
+        print(message.text)
+    print(run.format_timings(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())